@@ -1,72 +1,252 @@
 """
 Модуль кэширования Redis для оптимизации производительности
+
+Два уровня: in-process LRU с коротким TTL (горячие ключи отдаются из памяти
+без сетевого запроса) и Redis. Записи и удаления рассылаются другим воркерам
+через pub/sub, и те выбрасывают свои локальные копии.
+
+Инвалидация — по тегам: запись при set регистрируется в множествах
+tag:match:{id}, tag:user:{id}, tag:court:{id}..., а invalidate_tags удаляет
+все их ключи пачкой. Сервисы помечают теги в сессии (invalidate_on_commit),
+удаление выполняется после commit.
+
+Каждая инвалидация увеличивает поколение тега — в Redis (gen:{tag}, INCR в
+одной транзакции со SMEMBERS) и в памяти процесса. cache_key запоминает
+поколения до чтения из БД, а запись кладёт Lua-скриптом, который сверяет их
+с текущими: если тег сбросили, пока шло вычисление (в любом воркере), значение
+не записывается — иначе прочитанное до commit пережило бы инвалидацию.
+Инвалидация после записи найдёт ключ в множестве тега и удалит его.
 """
+import asyncio
+import fnmatch
+import hashlib
+import inspect
 import json
 import logging
-from typing import Any, Optional, Union
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Iterable, Optional, Union
 
-import aioredis
+import redis.asyncio as aioredis
 from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.cache_codec import CacheCodec
+from backend.config import get_settings
+from backend.monitoring import metrics
 
 logger = logging.getLogger(__name__)
 
+INVALIDATION_CHANNEL = "cache:invalidate"
+TAG_PREFIX = "tag:"
+GENERATION_PREFIX = "gen:"
+_GENERATION_TTL = 24 * 3600  # дольше любого вычисления; пропавший счётчик лишь отменит запись
+_DELETE_BATCH = 500
+_RECONNECT_DELAY = 5.0  # секунды без попыток подключения после ошибки
+_GENERATION_SLOTS = 4096  # поколения тегов по хэшу: память не растёт с числом тегов
+
+
+def match_tag(match_id) -> str:
+    return f"match:{match_id}"
+
+
+def court_tag(court_id) -> str:
+    return f"court:{court_id}"
+
+
+def user_tag(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def telegram_tag(telegram_id) -> str:
+    """Записи, зависящие от поиска пользователя по telegram_id"""
+    return f"telegram:{telegram_id}"
+
+_MISSING = object()
+
+# SETEX + регистрация в тегах, только если поколения тегов не изменились.
+# KEYS: ключ, n счётчиков gen:{tag}, множества tag:{tag}; ARGV: ttl, значение, n, поколения
+_SET_IF_CURRENT = """
+local n = tonumber(ARGV[3])
+for i = 1, n do
+    if (redis.call('GET', KEYS[1 + i]) or '') ~= ARGV[3 + i] then
+        return 0
+    end
+end
+redis.call('SETEX', KEYS[1], ARGV[1], ARGV[2])
+for i = 2 + n, #KEYS do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    redis.call('EXPIRE', KEYS[i], ARGV[1], 'NX')
+    redis.call('EXPIRE', KEYS[i], ARGV[1], 'GT')
+end
+return 1
+"""
+
+
+class LocalCache:
+    """In-process LRU с TTL — первый уровень перед Redis.
+
+    Значения хранятся как есть (без копирования): вызывающий код не должен их менять.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any:
+        """Значение или _MISSING, если ключа нет или он истёк"""
+        item = self._data.get(key)
+        if item is None:
+            return _MISSING
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def delete_pattern(self, pattern: str) -> None:
+        for key in [k for k in self._data if fnmatch.fnmatchcase(k, pattern)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
 class RedisCache:
     """Класс для работы с Redis кэшем"""
     
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379",
+        local_maxsize: int = 1024,
+        local_ttl: float = 30.0,
+        codec: Optional[CacheCodec] = None,
+    ):
         self.redis_url = redis_url
+        self.codec = codec or CacheCodec()
         self.redis: Optional[aioredis.Redis] = None
+        self.local = LocalCache(local_maxsize, local_ttl)
+        self._instance_id = uuid.uuid4().hex  # свои сообщения об инвалидации не обрабатываем
+        self._listener: Optional[asyncio.Task] = None
+        self._pending: set[asyncio.Task] = set()
+        self._retry_after = 0.0
+        self._generations = [0] * _GENERATION_SLOTS
+        self._set_if_current = None
     
     async def connect(self) -> None:
         """Установка соединения с Redis"""
+        if time.monotonic() < self._retry_after:
+            raise HTTPException(status_code=500, detail="Сервис кэширования недоступен")
         try:
-            self.redis = await aioredis.from_url(self.redis_url)
+            self.redis = aioredis.from_url(self.redis_url)
             await self.redis.ping()
+            self._listener = asyncio.create_task(self._listen())
             logger.info("✅ Redis подключен успешно")
         except Exception as e:
+            self.redis = None
+            self._retry_after = time.monotonic() + _RECONNECT_DELAY
             logger.error(f"❌ Ошибка подключения Redis: {e}")
             raise HTTPException(status_code=500, detail="Сервис кэширования недоступен")
     
     async def disconnect(self) -> None:
         """Закрытие соединения с Redis"""
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
         if self.redis:
-            await self.redis.close()
+            await self.redis.aclose()
+            self.redis = None
+        self._set_if_current = None
+        self.local.clear()
     
     async def get(self, key: str) -> Optional[Any]:
-        """Получение значения из кэша"""
+        """Получение значения из кэша: сначала память процесса, затем Redis"""
+        value = self.local.get(key)
+        if value is not _MISSING:
+            metrics.record_cache_hit("local")
+            return value
         try:
             if not self.redis:
                 await self.connect()
             
             value = await self.redis.get(key)
             if value:
-                return json.loads(value)
+                value = self.codec.loads(value)
+                self.local.set(key, value)
+                metrics.record_cache_hit("redis")
+                return value
+            metrics.record_cache_miss()
             return None
         except Exception as e:
             logger.error(f"❌ Ошибка получения из кэша {key}: {e}")
             return None
     
-    async def set(self, key: str, value: Any, expire: int = 3600) -> bool:
-        """Установка значения в кэш с истечением"""
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        expire: int = 3600,
+        tags: Iterable[str] = (),
+        versions: Optional[tuple] = None,
+    ) -> bool:
+        """Установка значения в кэш с истечением; tags — для invalidate_tags.
+
+        versions — поколения тегов из tag_versions: запись не выполняется (False),
+        если с тех пор теги инвалидировали.
+        """
+        tags = list(tags)
         try:
             if not self.redis:
                 await self.connect()
             
-            serialized_value = json.dumps(value, default=str)
-            await self.redis.setex(key, expire, serialized_value)
+            serialized_value = self.codec.dumps(value)
+            pipe = self.redis.pipeline(transaction=False)
+            if not versions:
+                self._queue_set(pipe, key, serialized_value, expire, tags)
+            else:
+                await self._queue_set_if_current(pipe, key, serialized_value, expire, tags, versions)
+            pipe.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys=[key]))
+            written = await pipe.execute()
+            if versions and not written[0]:
+                logger.debug(f"⏭ Кэш не записан, теги сброшены во время чтения: {key}")
+                return False
+            self.local.set(key, self.codec.loads(serialized_value), expire)
             logger.debug(f"✅ Кэш установлен: {key} (TTL: {expire}s)")
             return True
         except Exception as e:
+            self.local.delete(key)
             logger.error(f"❌ Ошибка установки кэша {key}: {e}")
             return False
     
     async def delete(self, key: str) -> bool:
         """Удаление значения из кэша"""
+        self.local.delete(key)
         try:
             if not self.redis:
                 await self.connect()
             
-            result = await self.redis.delete(key)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(key)
+            pipe.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys=[key]))
+            result, _ = await pipe.execute()
             if result:
                 logger.debug(f"✅ Кэш удален: {key}")
             return bool(result)
@@ -74,45 +254,416 @@ class RedisCache:
             logger.error(f"❌ Ошибка удаления кэша {key}: {e}")
             return False
     
+    async def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """Несколько значений за один MGET (найденные в памяти процесса — без Redis)"""
+        found: dict[str, Any] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self.local.get(key)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                metrics.record_cache_hit("local")
+                found[key] = value
+        if not missing:
+            return found
+        try:
+            if not self.redis:
+                await self.connect()
+            
+            for key, raw in zip(missing, await self.redis.mget(missing)):
+                if raw:
+                    value = self.codec.loads(raw)
+                    self.local.set(key, value)
+                    metrics.record_cache_hit("redis")
+                    found[key] = value
+                else:
+                    metrics.record_cache_miss()
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения из кэша {len(missing)} ключей: {e}")
+        return found
+
+    async def set_many(self, entries: Iterable[tuple]) -> int:
+        """Несколько значений одним pipeline: entries — (ключ, значение, expire, tags, versions).
+
+        versions — как у set: запись с изменившимися поколениями тегов пропускается.
+        Возвращает число записанных ключей.
+        """
+        entries = [(key, self.codec.dumps(value), expire, list(tags), versions)
+                   for key, value, expire, tags, versions in entries]
+        if not entries:
+            return 0
+        try:
+            if not self.redis:
+                await self.connect()
+            
+            pipe = self.redis.pipeline(transaction=False)
+            for key, payload, expire, tags, versions in entries:
+                if versions:
+                    await self._queue_set_if_current(pipe, key, payload, expire, tags, versions)
+                else:
+                    self._queue_set(pipe, key, payload, expire, tags)
+            pipe.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys=[entry[0] for entry in entries]))
+            results = await pipe.execute()
+            # У _queue_set в ответе SETEX, SADD и EXPIRE по каждому тегу, у скрипта — один флаг
+            written = 0
+            pos = 0
+            for key, payload, expire, tags, versions in entries:
+                if versions:
+                    ok = bool(results[pos])
+                    pos += 1
+                else:
+                    ok = True
+                    pos += 1 + 3 * len(tags)
+                if ok:
+                    self.local.set(key, self.codec.loads(payload), expire)
+                    written += 1
+            logger.debug(f"✅ Кэш установлен: {written} из {len(entries)} ключей")
+            return written
+        except Exception as e:
+            for entry in entries:
+                self.local.delete(entry[0])
+            logger.error(f"❌ Ошибка установки кэша {len(entries)} ключей: {e}")
+            return 0
+
+    @staticmethod
+    def _queue_set(pipe, key: str, payload: bytes, expire: int, tags: Iterable[str]) -> None:
+        pipe.setex(key, expire, payload)
+        for tag in tags:
+            tag_key = TAG_PREFIX + tag
+            pipe.sadd(tag_key, key)
+            # Множество тега живёт не меньше самого долгого своего ключа
+            pipe.expire(tag_key, expire, nx=True)
+            pipe.expire(tag_key, expire, gt=True)
+
+    async def _queue_set_if_current(
+        self, pipe, key: str, payload: bytes, expire: int, tags: list, versions: tuple
+    ) -> None:
+        if self._set_if_current is None:
+            self._set_if_current = self.redis.register_script(_SET_IF_CURRENT)
+        keys = [key, *(GENERATION_PREFIX + tag for tag in tags), *(TAG_PREFIX + tag for tag in tags)]
+        # С pipeline скрипт только ставится в очередь (EVALSHA, загрузка — при execute)
+        await self._set_if_current(keys=keys, args=[expire, payload, len(tags), *versions], client=pipe)
+
+    async def tag_versions(self, tags: Iterable[str]) -> Optional[tuple]:
+        """Поколения тегов в Redis для set(versions=...); None — Redis недоступен"""
+        tags = list(tags)
+        if not tags:
+            return ()
+        try:
+            if not self.redis:
+                await self.connect()
+            
+            values = await self.redis.mget([GENERATION_PREFIX + tag for tag in tags])
+            return tuple((value or b"").decode() for value in values)
+        except Exception as e:
+            logger.error(f"❌ Ошибка чтения поколений тегов {tags}: {e}")
+            return None
+
     async def clear_pattern(self, pattern: str) -> int:
-        """Очистка кэша по паттерну"""
+        """Очистка кэша по паттерну (SCAN, не блокирует Redis в отличие от KEYS)"""
+        self.local.delete_pattern(pattern)
         try:
             if not self.redis:
                 await self.connect()
             
-            keys = await self.redis.keys(pattern)
-            if keys:
-                deleted = await self.redis.delete(*keys)
+            deleted = 0
+            batch = []
+            async for key in self.redis.scan_iter(match=pattern, count=_DELETE_BATCH):
+                batch.append(key)
+                if len(batch) >= _DELETE_BATCH:
+                    deleted += await self.redis.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.redis.unlink(*batch)
+            await self._publish_invalidation(pattern=pattern)
+            if deleted:
                 logger.info(f"✅ Очищено {deleted} ключей по паттерну: {pattern}")
-                return deleted
-            return 0
+            return deleted
         except Exception as e:
             logger.error(f"❌ Ошибка очистки кэша {pattern}: {e}")
             return 0
 
+    def tag_generations(self, tags: Iterable[str]) -> tuple:
+        """Поколения тегов: изменились — значит, между двумя вызовами была инвалидация"""
+        return tuple(self._generations[hash(tag) % _GENERATION_SLOTS] for tag in tags)
+
+    def _bump_generations(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self._generations[hash(tag) % _GENERATION_SLOTS] += 1
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Удалить все ключи, зарегистрированные в тегах, и сами множества тегов"""
+        if not tags:
+            return 0
+        # До сетевых запросов: идущие сейчас вычисления не должны записать старое значение
+        self._bump_generations(tags)
+        try:
+            if not self.redis:
+                await self.connect()
+            
+            tag_keys = [TAG_PREFIX + tag for tag in tags]
+            # MULTI: после INCR ни одна запись с прежним поколением не попадёт в множество
+            pipe = self.redis.pipeline(transaction=True)
+            for tag in tags:
+                pipe.incr(GENERATION_PREFIX + tag)
+                pipe.expire(GENERATION_PREFIX + tag, _GENERATION_TTL)
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            members = (await pipe.execute())[2 * len(tags):]
+            keys = sorted({key.decode() for group in members for key in group})
+            for key in keys:
+                self.local.delete(key)
+
+            pipe = self.redis.pipeline(transaction=False)
+            for i in range(0, len(keys), _DELETE_BATCH):
+                pipe.unlink(*keys[i:i + _DELETE_BATCH])
+            pipe.unlink(*tag_keys)
+            pipe.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys=keys, tags=tags))
+            await pipe.execute()
+            logger.debug(f"✅ Инвалидированы теги {', '.join(tags)}: {len(keys)} ключей")
+            return len(keys)
+        except Exception as e:
+            logger.error(f"❌ Ошибка инвалидации тегов {tags}: {e}")
+            return 0
+
+    def invalidate_tags_soon(self, *tags: str) -> None:
+        """Инвалидация в фоне — не задерживает ответ на запись"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.invalidate_tags(*tags))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    # --- Инвалидация локального уровня в других воркерах ---
+
+    def _invalidation_message(
+        self, keys: Iterable[str] = (), pattern: Optional[str] = None, tags: Iterable[str] = ()
+    ) -> str:
+        return json.dumps({"src": self._instance_id, "keys": list(keys), "pattern": pattern, "tags": list(tags)})
+
+    async def _publish_invalidation(self, keys: Iterable[str] = (), pattern: Optional[str] = None) -> None:
+        await self.redis.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys, pattern))
+
+    def _apply_invalidation(self, data: Union[bytes, str]) -> None:
+        message = json.loads(data)
+        if message.get("src") == self._instance_id:
+            return
+        self._bump_generations(message.get("tags", ()))
+        for key in message.get("keys", ()):
+            self.local.delete(key)
+        if message.get("pattern"):
+            self.local.delete_pattern(message["pattern"])
+
+    async def _listen(self) -> None:
+        """Фоновая подписка на инвалидации; после обрыва локальный уровень сбрасывается"""
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    # Сообщения, пропущенные без подписки, не восстановить
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Подписка на инвалидацию кэша прервана: {e}")
+                self.local.clear()
+                await asyncio.sleep(1)
+
+_settings = get_settings()
+
 # Глобальный экземпляр кэша
-cache = RedisCache()
+cache = RedisCache(
+    _settings.redis_url,
+    _settings.cache_local_maxsize,
+    _settings.cache_local_ttl,
+    CacheCodec(_settings.cache_serializer, _settings.cache_compression, _settings.cache_compress_min_bytes),
+)
+
+# --- Инвалидация после commit сессии ---
+
+_SESSION_TAGS = "cache_tags"
+
+
+def invalidate_on_commit(session, *tags: str) -> None:
+    """Инвалидировать теги, когда сессия (Session или AsyncSession) закоммитит изменения.
+
+    До commit читатели ещё видят старые строки и могли бы снова положить их в кэш.
+    """
+    session.info.setdefault(_SESSION_TAGS, set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    tags = session.info.pop(_SESSION_TAGS, None)
+    if tags:
+        cache.invalidate_tags_soon(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_tags_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_TAGS, None)
 
 # Декоратор для кэширования функций
-def cache_key(prefix: str, expire: int = 3600):
-    """Декоратор для автоматического кэширования результатов функций"""
+
+def _bind(signature: inspect.Signature, args, kwargs) -> dict:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+def _make_key(prefix: str, func, values: dict) -> str:
+    """Стабильный ключ: хэш значений параметров, а не repr аргументов"""
+    raw = json.dumps(values, sort_keys=True, default=str)
+    return f"{prefix}:{func.__name__}:{hashlib.sha1(raw.encode()).hexdigest()[:16]}"
+
+
+def _log_refresh_error(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"❌ Ошибка фонового обновления кэша: {future.exception()}")
+
+
+def cache_key(
+    prefix: str,
+    expire: int = 3600,
+    key_params: Optional[Iterable[str]] = None,
+    tags: Iterable[str] = (),
+    stale_ttl: int = 0,
+    negative_ttl: int = 0,
+):
+    """Декоратор для автоматического кэширования результатов функций
+
+    key_params — параметры, из которых строится ключ (по умолчанию все);
+    tags — шаблоны тегов по параметрам, например "match:{match_id}";
+    stale_ttl — сколько секунд после expire отдавать устаревшее значение,
+    пока одно фоновое обновление пересчитывает его;
+    negative_ttl — сколько секунд помнить результат None («записи нет»).
+
+    Одновременные промахи по одному ключу в процессе ждут одно вычисление.
+    Фоновое обновление переживает запрос, поэтому функция должна сама брать
+    соединение с БД, а не принимать сессию запроса. None кэшируется только
+    при negative_ttl — такие записи нужно сбрасывать тегами при создании.
+    """
+    tags = tuple(tags)
+
     def decorator(func):
-        async def wrapper(*args, **kwargs):
-            # Создаем ключ кэша на основе имени функции и параметров
-            key_data = f"{prefix}:{func.__name__}:{str(args)}:{str(kwargs)}"
-            key = key_data.replace(" ", "_").replace("'", "").replace('"', "")
-            
-            # Пробуем получить из кэша
-            cached_result = await cache.get(key)
-            if cached_result is not None:
-                logger.debug(f"🎯 Кэш hit: {key}")
-                return cached_result
-            
-            # Выполняем функцию и кэшируем результат
+        signature = inspect.signature(func)
+        names = list(key_params) if key_params is not None else list(signature.parameters)
+        inflight: dict[str, asyncio.Future] = {}
+
+        def entry_for(result) -> Optional[tuple]:
+            """(запись, TTL в Redis) для результата; None — результат не кэшируется"""
+            if result is not None:
+                return {"v": result, "exp": time.time() + expire}, expire + stale_ttl
+            if negative_ttl:
+                return {"v": None, "exp": time.time() + negative_ttl}, negative_ttl
+            return None
+
+        def tags_for(arguments: dict) -> list:
+            return [tag.format(**arguments) for tag in tags]
+
+        async def compute(key: str, arguments: dict, args, kwargs) -> Any:
+            entry_tags = tags_for(arguments)
+            generations = cache.tag_generations(entry_tags)
+            versions = await cache.tag_versions(entry_tags)
             result = await func(*args, **kwargs)
-            await cache.set(key, result, expire)
-            logger.debug(f"💾 Кэш set: {key}")
-            
+            entry = entry_for(result)
+            if versions is None or cache.tag_generations(entry_tags) != generations:
+                logger.debug(f"⏭ Кэш не записан, теги сброшены во время чтения: {key}")
+            elif entry is not None:
+                if await cache.set(key, entry[0], entry[1], tags=entry_tags, versions=versions):
+                    logger.debug(f"💾 Кэш set: {key}")
             return result
+
+        def single_flight(key: str, arguments: dict, args, kwargs) -> asyncio.Future:
+            future = inflight.get(key)
+            if future is None:
+                future = asyncio.ensure_future(compute(key, arguments, args, kwargs))
+                inflight[key] = future
+                future.add_done_callback(lambda _: inflight.pop(key, None))
+            return future
+
+        def key_for(arguments: dict) -> str:
+            return _make_key(prefix, func, {name: arguments[name] for name in names})
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            arguments = _bind(signature, args, kwargs)
+            key = key_for(arguments)
+
+            entry = await cache.get(key)
+            if isinstance(entry, dict) and "exp" in entry:
+                if entry["exp"] > time.time():
+                    logger.debug(f"🎯 Кэш hit: {key}")
+                    return entry["v"]
+                if key not in inflight:
+                    single_flight(key, arguments, args, kwargs).add_done_callback(_log_refresh_error)
+                logger.debug(f"🕰 Кэш stale: {key}")
+                return entry["v"]
+
+            # shield: отмена одного ожидающего не прерывает общее вычисление
+            return await asyncio.shield(single_flight(key, arguments, args, kwargs))
+
+        # Ключ для тех же аргументов — чтобы сервисы могли удалить/обновить запись
+        wrapper.cache_key_for = lambda *args, **kwargs: key_for(_bind(signature, args, kwargs))
+        # Для cached_many: теги записи и сама запись — без повторного GET в wrapper
+        wrapper.cache_tags_for = lambda *args, **kwargs: tags_for(_bind(signature, args, kwargs))
+        wrapper.cache_entry_for = entry_for
         return wrapper
     return decorator
+
+
+
+async def cached_many(*calls: tuple) -> list:
+    """Несколько функций с cache_key за один MGET: calls — кортежи (функция, *аргументы).
+
+    Свежие записи берутся из ответа MGET. Промахи вычисляются исходными
+    функциями (func.__wrapped__, параллельно, без повторного GET на ключ) и
+    записываются одним pipeline (set_many) с той же проверкой поколений тегов,
+    что и в cache_key. Устаревшие записи отдаются сразу, а пересчитываются так
+    же, но в фоне.
+    """
+    keys = [func.cache_key_for(*args) for func, *args in calls]
+    entries = await cache.get_many(keys)
+    now = time.time()
+    results: list = [None] * len(calls)
+    misses, stale = [], []
+    for i, (call, key) in enumerate(zip(calls, keys)):
+        entry = entries.get(key)
+        if isinstance(entry, dict) and "exp" in entry:
+            results[i] = entry["v"]
+            if entry["exp"] <= now:
+                stale.append((call, key))
+        else:
+            misses.append(i)
+    if stale:
+        asyncio.ensure_future(_load_many(stale)).add_done_callback(_log_refresh_error)
+    if misses:
+        loaded = await _load_many([(calls[i], keys[i]) for i in misses])
+        for i, value in zip(misses, loaded):
+            results[i] = value
+    return results
+
+
+async def _load_many(calls: list) -> list:
+    """Вычислить (функция, *аргументы) без кэша и записать результаты одним pipeline"""
+    entry_tags = [func.cache_tags_for(*args) for (func, *args), _ in calls]
+    generations = [cache.tag_generations(tags) for tags in entry_tags]
+    all_tags = list(dict.fromkeys(tag for tags in entry_tags for tag in tags))
+    versions = await cache.tag_versions(all_tags)
+    values = await asyncio.gather(*(func.__wrapped__(*args) for (func, *args), _ in calls))
+    if versions is None:
+        return list(values)
+    version_of = dict(zip(all_tags, versions))
+    writes = []
+    for ((func, *_), key), value, tags, before in zip(calls, values, entry_tags, generations):
+        entry = func.cache_entry_for(value)
+        if entry is not None and cache.tag_generations(tags) == before:
+            writes.append((key, entry[0], entry[1], tags, tuple(version_of[tag] for tag in tags)))
+    await cache.set_many(writes)
+    return list(values)
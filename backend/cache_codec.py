@@ -0,0 +1,101 @@
+"""
+Сериализация значений кэша: json / orjson / msgpack + сжатие zlib / lz4
+
+Формат значения: байт заголовка 0x80 | (сериализатор << 2) | сжатие, затем
+данные. Заголовок не может начинать JSON-текст, поэтому старые записи без
+заголовка (json.dumps) читаются как раньше. Читатель определяет формат по
+заголовку, а не по настройкам — смена CACHE_SERIALIZER не ломает кэш.
+"""
+import json
+import logging
+import zlib
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - необязательная зависимость
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - необязательная зависимость
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - необязательная зависимость
+    lz4_frame = None
+
+_HEADER = 0x80
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=str).encode()
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=str, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+# id -> (имя, dumps, loads, модуль доступен)
+_SERIALIZERS: dict[int, tuple[str, Callable, Callable, bool]] = {
+    0: ("json", _json_dumps, json.loads, True),
+    1: ("orjson", _orjson_dumps, orjson.loads if orjson else None, orjson is not None),
+    2: ("msgpack", _msgpack_dumps, _msgpack_loads, msgpack is not None),
+}
+_COMPRESSIONS: dict[int, tuple[str, Callable, Callable, bool]] = {
+    0: ("none", bytes, bytes, True),
+    1: ("zlib", lambda data: zlib.compress(data, 1), zlib.decompress, True),
+    2: (
+        "lz4",
+        lz4_frame.compress if lz4_frame else None,
+        lz4_frame.decompress if lz4_frame else None,
+        lz4_frame is not None,
+    ),
+}
+
+
+def _find(table: dict, name: str, kind: str) -> int:
+    for id_, (table_name, _, _, available) in table.items():
+        if table_name == name:
+            if available:
+                return id_
+            logger.warning(f"⚠️ {kind} {name} не установлен, кэш использует {table[0][0]}")
+            return 0
+    raise ValueError(f"Unknown cache {kind}: {name}")
+
+
+class CacheCodec:
+    """Упаковка значений кэша в bytes и обратно"""
+
+    def __init__(self, serializer: str = "json", compression: str = "none", min_compress_size: int = 1024):
+        self.serializer = _find(_SERIALIZERS, serializer, "serializer")
+        self.compression = _find(_COMPRESSIONS, compression, "compression")
+        self.min_compress_size = min_compress_size
+
+    def dumps(self, value: Any) -> bytes:
+        data = _SERIALIZERS[self.serializer][1](value)
+        compression = self.compression if len(data) >= self.min_compress_size else 0
+        if compression:
+            data = _COMPRESSIONS[compression][1](data)
+        return bytes([_HEADER | self.serializer << 2 | compression]) + data
+
+    def loads(self, data: bytes) -> Any:
+        if not data or not data[0] & _HEADER:
+            return json.loads(data)  # запись без заголовка (старый формат)
+        header = data[0]
+        payload = data[1:]
+        compression = header & 0b11
+        if compression:
+            payload = _COMPRESSIONS[compression][2](payload)
+        return _SERIALIZERS[header >> 2 & 0b111][2](payload)
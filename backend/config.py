@@ -16,6 +16,43 @@ class Settings(BaseSettings):
     court_name: str = "Корт 1"
     club_name: str = "PadelClub"
     bot_internal_url: str = ""  # optional: URL to trigger bot notifications
+    redis_url: str = "redis://localhost:6379"
+    # Локальный (in-process) уровень кэша перед Redis
+    cache_local_maxsize: int = 1024
+    cache_local_ttl: float = 30.0  # секунды; ограничивает устаревание при обрыве pub/sub
+    # Формат значений в Redis: json | orjson | msgpack; сжатие none | zlib | lz4 для больших значений
+    cache_serializer: str = "orjson"
+    cache_compression: str = "zlib"
+    cache_compress_min_bytes: int = 1024
+    # Сколько секунд помнить, что telegram_id не зарегистрирован (сброс — при регистрации)
+    user_absent_ttl: int = 300
+    # Логи: файл (JSON, ротация 10 МБ × 5) и доля запросов, попадающих в access-лог
+    log_file: str = "padelsense.log"
+    access_log_sample_rate: float = 0.1
+    access_log_slow_seconds: float = 1.0  # медленнее — логируются всегда, как и 5xx
+    # Каталог mmap-файлов метрик при нескольких воркерах (/metrics суммирует по хосту);
+    # пусто — метрики процесса. Каталог очищать перед запуском сервера
+    metrics_multiproc_dir: str = ""
+    # Трассировка запросов: JSONL со span'ами (пусто — без файла), сколько медленных trace держать для /debug/traces
+    trace_file: str = ""
+    trace_keep_slowest: int = 50
+    trace_max_spans: int = 500
+    # Токен для /debug/* (профилировщик); пусто — эндпоинты отключены
+    debug_token: str = ""
+    # Замер задержки event loop: период и порог, выше которого пишется стек блокирующего кода
+    loop_lag_interval: float = 0.1
+    loop_lag_warn_seconds: float = 0.25
+    # Предупреждать о HTTP-запросах, сделавших больше запросов к БД (N+1)
+    db_queries_warn_threshold: int = 10
+    # Реестр live-матчей в памяти (только один воркер / sticky-роутинг корта)
+    live_registry_enabled: bool = False
+    live_flush_interval: float = 0.5  # секунды между пачками записи в БД
+    live_flush_max_attempts: int = 20  # после стольких неудачных записей матч отбрасывается из памяти
+    # Партиции match_events/highlights: сколько месяцев хранить в БД и куда выгружать старые
+    events_retention_months: int = 12
+    events_archive_dir: str = "archive"
+    # Упаковывать события завершённого матча в matches.event_log и удалять строки match_events
+    compact_finished_events: bool = True
 
     class Config:
         env_file = _env_path()
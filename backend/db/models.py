@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import DateTime, ForeignKey, String
+from sqlalchemy import DateTime, ForeignKey, Index, LargeBinary, String, Text
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -40,30 +40,56 @@ class Match(Base):
     team_b_player_ids: Mapped[list] = mapped_column(ARRAY(UUID(as_uuid=True)), nullable=False)
     score: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
     full_video_url: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
+    # Event-sourcing: последний seq в match_events, лог эффективных очков и снапшоты счёта
+    last_seq: Mapped[int] = mapped_column(default=0)
+    point_log: Mapped[str] = mapped_column(Text, nullable=False, default="")
+    snapshots: Mapped[list] = mapped_column(JSONB, nullable=False, default=list)
+    last_client_seq: Mapped[int] = mapped_column(default=0)  # последний seq из офлайн-очереди планшета
+    # Оптимистичная блокировка: UPDATE ... WHERE version = :v, при конфликте — StaleDataError
+    version: Mapped[int] = mapped_column(nullable=False, default=1)
+    # Упакованный лог событий завершённого матча (backend/services/event_codec.py)
+    event_log: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
 
     events: Mapped[list["MatchEvent"]] = relationship("MatchEvent", back_populates="match")
     highlights: Mapped[list["Highlight"]] = relationship("Highlight", back_populates="match")
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class MatchEvent(Base):
     __tablename__ = "match_events"
+    # Помесячные партиции по created_at (см. backend/db/partitions.py)
+    __table_args__ = (
+        Index("idx_match_events_match_seq", "match_id", "seq"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     match_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("matches.id"), nullable=False)
+    seq: Mapped[int] = mapped_column(nullable=False, default=0)  # порядковый номер события в матче
+    client_seq: Mapped[Optional[int]] = mapped_column(nullable=True)  # seq планшета (batch-загрузка)
     kind: Mapped[str] = mapped_column(String(32), nullable=False)  # point, undo, highlight, side_change, end
     payload: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, default=datetime.utcnow
+    )
 
     match: Mapped["Match"] = relationship("Match", back_populates="events")
 
 
 class Highlight(Base):
     __tablename__ = "highlights"
+    __table_args__ = (
+        Index("idx_highlights_match_id", "match_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     match_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("matches.id"), nullable=False)
     timestamp_sec: Mapped[float] = mapped_column(nullable=False)
     url: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, default=datetime.utcnow
+    )
 
     match: Mapped["Match"] = relationship("Match", back_populates="highlights")
@@ -0,0 +1,153 @@
+"""Помесячные партиции match_events и highlights + архивирование старых.
+
+Таблицы секционированы RANGE (created_at). Партиции на текущий и следующие
+месяцы создаются заранее (init_db и фоновая задача), DEFAULT-партиция ловит
+всё, что не попало в диапазоны. Старые партиции выгружаются в CSV.gz,
+отсоединяются и удаляются — хвост таблиц не растёт, vacuum работает по
+горячим месяцам.
+"""
+import asyncio
+import gzip
+import logging
+import re
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("match_events", "highlights")
+_PARTITION_RE = re.compile(r"^(?P<table>\w+)_(?P<year>\d{4})_(?P<month>\d{2})$")
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, months: int) -> date:
+    total = d.year * 12 + d.month - 1 + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+
+async def _is_partitioned(conn: asyncpg.Connection, table: str) -> bool:
+    kind = await conn.fetchval("SELECT relkind::text FROM pg_class WHERE relname = $1", table)
+    return kind == "p"
+
+
+async def ensure_partitions(
+    conn: asyncpg.Connection,
+    months_ahead: int = 2,
+    today: date | None = None,
+) -> list[str]:
+    """Создать партиции с текущего месяца на months_ahead вперёд. Возвращает созданные."""
+    month = _month_start(today or datetime.now(timezone.utc).date())
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not await _is_partitioned(conn, table):
+            logger.warning("%s не секционирована — примените миграцию 005_partitioning.sql", table)
+            continue
+        await conn.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+        for i in range(months_ahead + 1):
+            start = _add_months(month, i)
+            name = partition_name(table, start)
+            exists = await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", name)
+            if exists:
+                continue
+            await conn.execute(
+                f"CREATE TABLE {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start} 00:00+00') TO ('{_add_months(start, 1)} 00:00+00')"
+            )
+            created.append(name)
+    return created
+
+
+async def list_partitions(conn: asyncpg.Connection, table: str) -> list[tuple[str, date]]:
+    """Помесячные партиции таблицы: [(имя, первый день месяца)] по возрастанию."""
+    rows = await conn.fetch(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = $1
+        """,
+        table,
+    )
+    result = []
+    for row in rows:
+        m = _PARTITION_RE.match(row["relname"])
+        if m and m.group("table") == table:
+            result.append((row["relname"], date(int(m.group("year")), int(m.group("month")), 1)))
+    return sorted(result, key=lambda item: item[1])
+
+
+async def _export(conn: asyncpg.Connection, name: str, path: Path) -> None:
+    """COPY партиции в CSV.gz. Ошибку записи в файл не отдаём в asyncpg —
+    исключение из output-колбэка подвешивает COPY, — а бросаем после него."""
+    errors: list[BaseException] = []
+    with gzip.open(path, "wb") as f:
+
+        async def _write(chunk: bytes) -> None:
+            if errors:
+                return
+            try:
+                await asyncio.to_thread(f.write, chunk)
+            except Exception as e:
+                errors.append(e)
+
+        await conn.copy_from_table(name, output=_write, format="csv", header=True)
+    if errors:
+        raise errors[0]
+
+
+async def archive_old_partitions(
+    conn: asyncpg.Connection,
+    keep_months: int,
+    archive_dir: Path,
+    today: date | None = None,
+) -> list[Path]:
+    """Выгрузить партиции старше keep_months в CSV.gz, отсоединить и удалить.
+
+    Выгрузка, DETACH и DROP идут одной транзакцией под блокировкой записи в
+    партицию: при ошибке она остаётся присоединённой и попадёт в следующий
+    запуск. Файл пишется во временный и переименовывается после commit.
+    """
+    cutoff = _add_months(_month_start(today or datetime.now(timezone.utc).date()), -keep_months)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    archived = []
+    for table in PARTITIONED_TABLES:
+        for name, month in await list_partitions(conn, table):
+            if month >= cutoff:
+                continue
+            path = archive_dir / f"{name}.csv.gz"
+            partial = path.with_name(path.name + ".part")
+            try:
+                async with conn.transaction():
+                    await conn.execute(f"LOCK TABLE {name} IN SHARE MODE")
+                    await _export(conn, name, partial)
+                    await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                    await conn.execute(f"DROP TABLE {name}")
+            except BaseException:
+                partial.unlink(missing_ok=True)
+                raise
+            partial.replace(path)
+            logger.info("📦 Партиция %s выгружена в %s", name, path)
+            archived.append(path)
+    return archived
+
+
+async def partition_maintenance_loop(pool: asyncpg.Pool, interval: float = 6 * 3600) -> None:
+    """Фоновая задача: заранее создаёт партиции на следующие месяцы."""
+    while True:
+        try:
+            async with pool.acquire() as conn:
+                created = await ensure_partitions(conn)
+            if created:
+                logger.info("🗂 Созданы партиции: %s", ", ".join(created))
+        except Exception as e:
+            logger.error(f"❌ Ошибка обслуживания партиций: {e}")
+        await asyncio.sleep(interval)
@@ -1,13 +1,18 @@
 """Async database session. init_db и user-роуты — только asyncpg (без greenlet)."""
+import json
+import time
 from collections.abc import AsyncGenerator
 from urllib.parse import urlparse
 
 import asyncpg
-from sqlalchemy.schema import CreateTable
+from sqlalchemy import event
+from sqlalchemy.schema import CreateIndex, CreateTable
 from sqlalchemy.dialects.postgresql import dialect as pg_dialect
 
 from backend.config import get_settings
 from backend.db.models import Base
+from backend.db.partitions import ensure_partitions
+from backend.monitoring import record_query
 
 # SQLAlchemy engine — используется только в других роутерах (matches, videos и т.д.).
 # При первом обращении к get_session() загрузится greenlet — на твоей системе может быть заблокирован.
@@ -24,6 +29,7 @@ def _get_engine():
         if url.startswith("postgresql://"):
             url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
         _engine = create_async_engine(url, echo=False)
+        _instrument_engine(_engine)
         _async_session_maker = async_sessionmaker(
             _engine,
             class_=AsyncSession,
@@ -47,15 +53,70 @@ def _parse_pg_url(url: str) -> dict:
     return {"host": host, "port": port, "user": user, "password": password, "database": database}
 
 
+# --- Замер каждого запроса к БД (backend.monitoring.record_query) ---
+
+def _instrument_engine(engine) -> None:
+    """События SQLAlchemy: время выполнения каждого statement"""
+
+    # Начало храним в контексте выполнения, а не в conn.info: у упавшего
+    # statement after_cursor_execute не вызывается, и стек на соединении
+    # сдвигал бы замеры следующих запросов
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_start", None)
+        if started is not None:
+            record_query(statement, time.perf_counter() - started)
+
+
+def _timed(method):
+    async def wrapper(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(self, query, *args, **kwargs)
+        finally:
+            record_query(query, time.perf_counter() - started)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+class InstrumentedConnection(asyncpg.Connection):
+    """asyncpg-соединение пула: замеряет execute/executemany/fetch*"""
+
+    execute = _timed(asyncpg.Connection.execute)
+    executemany = _timed(asyncpg.Connection.executemany)
+    fetch = _timed(asyncpg.Connection.fetch)
+    fetchrow = _timed(asyncpg.Connection.fetchrow)
+    fetchval = _timed(asyncpg.Connection.fetchval)
+
+
 # Пул asyncpg — для init_db и user-роутов (без greenlet).
 _pg_pool: asyncpg.Pool | None = None
 
 
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """JSON/JSONB <-> dict/list, как в SQLAlchemy-моделях."""
+    for typename in ("json", "jsonb"):
+        await conn.set_type_codec(
+            typename, schema="pg_catalog", encoder=json.dumps, decoder=json.loads
+        )
+
+
 async def _get_pg_pool() -> asyncpg.Pool:
     global _pg_pool
     if _pg_pool is None:
         kwargs = _parse_pg_url(get_settings().database_url)
-        _pg_pool = await asyncpg.create_pool(min_size=1, max_size=5, **kwargs)
+        _pg_pool = await asyncpg.create_pool(
+            min_size=1,
+            max_size=5,
+            init=_init_connection,
+            connection_class=InstrumentedConnection,
+            **kwargs,
+        )
     return _pg_pool
 
 
@@ -66,6 +127,26 @@ async def get_db_connection() -> AsyncGenerator[asyncpg.Connection, None]:
         yield conn
 
 
+USER_REGISTERED_CHANNEL = "user_registered"
+
+# То же, что infrastructure/migrations/007_user_registered_notify.sql
+_USER_NOTIFY_DDL = f"""
+CREATE OR REPLACE FUNCTION notify_user_registered() RETURNS trigger AS $$
+BEGIN
+    IF NEW.telegram_id IS NOT NULL THEN
+        PERFORM pg_notify('{USER_REGISTERED_CHANNEL}', NEW.telegram_id::text);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_registered_notify ON users;
+CREATE TRIGGER users_registered_notify
+    AFTER INSERT OR UPDATE OF telegram_id ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_user_registered();
+"""
+
+
 async def init_db() -> None:
     """Создание таблиц через asyncpg — без SQLAlchemy engine и greenlet."""
     pool = await _get_pg_pool()
@@ -73,6 +154,11 @@ async def init_db() -> None:
         for table in Base.metadata.sorted_tables:
             ddl = CreateTable(table, if_not_exists=True).compile(dialect=pg_dialect())
             await conn.execute(str(ddl))
+            for index in table.indexes:
+                ddl = CreateIndex(index, if_not_exists=True).compile(dialect=pg_dialect())
+                await conn.execute(str(ddl))
+        await conn.execute(_USER_NOTIFY_DDL)
+        await ensure_partitions(conn)
 
 
 def __getattr__(name: str):
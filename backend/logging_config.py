@@ -0,0 +1,133 @@
+"""
+Неблокирующее логирование: очередь + фоновый поток записи
+
+Обработчик на корневом логгере только кладёт запись в ограниченную очередь;
+форматирование, запись в файл и ротация идут в потоке QueueListener, поэтому
+медленный диск не останавливает event loop. В файл пишется JSON (одна запись
+на строку), в консоль — привычный текст. При переполнении очереди записи
+отбрасываются и считаются (dropped), а не блокируют запрос; счётчик виден в
+/metrics, а как только место в очереди появляется, в лог уходит предупреждение
+о потерянных записях.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Стандартные атрибуты LogRecord — всё остальное пришло через extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога -> одна строка JSON; поля из extra= попадают в объект"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler, который не ждёт при полной очереди, а считает потерянные записи"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Копия, как в QueueHandler.prepare: запись видят и другие обработчики логгера.
+        # Аргументы подставляем сразу (объекты могут измениться), остальное — в потоке
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # traceback держит кадры живыми — в очередь кладём уже текст
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped > self._reported:
+            self._report_dropped()
+
+    def _report_dropped(self) -> None:
+        lost = self.dropped - self._reported
+        warning = logging.makeLogRecord({
+            "name": __name__,
+            "levelno": logging.WARNING,
+            "levelname": "WARNING",
+            "msg": f"⚠️ Очередь логов была переполнена: потеряно записей — {lost}",
+            "dropped": lost,
+        })
+        try:
+            self.queue.put_nowait(warning)
+        except queue.Full:
+            return
+        self._reported += lost
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def setup_logging(
+    log_file: str = "padelsense.log",
+    level: int = logging.INFO,
+    queue_size: int = 10_000,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+) -> None:
+    """Настроить корневой логгер (повторный вызов ничего не делает)"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_handler)
+
+
+def stop_logging() -> None:
+    """Дописать очередь и остановить поток записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """Сколько записей этот процесс потерял из-за полной очереди"""
+    return _handler.dropped if _handler else 0
@@ -1,27 +1,44 @@
 """PadelSense Backend API."""
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from backend.db.session import init_db
+from backend.cache import cache
+from backend.config import get_settings
+from backend.db.partitions import partition_maintenance_loop
+from backend.db.session import _get_pg_pool, init_db
+from backend.logging_config import dropped_records
 from backend.monitoring import (
-    monitoring_middleware, 
+    MonitoringMiddleware,
     global_exception_handler, 
     health_check,
     init_sentry,
     EventLogger,
-    metrics
+    LoopLagMonitor,
+    PROMETHEUS_CONTENT_TYPE,
+    collect_metrics,
+    render_prometheus,
 )
-from backend.routers import users, matches, videos, analytics, subscriptions
+from backend.routers import users, matches, videos, analytics, subscriptions, debug
+from backend.services import live_registry
+from backend.services.match_service import MatchWriteConflict
+from backend.services.user_service import registration_listener
 
 logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    maintenance = None
+    registrations = None
+    settings = get_settings()
+    loop_monitor = asyncio.create_task(
+        LoopLagMonitor(settings.loop_lag_interval, settings.loop_lag_warn_seconds).run()
+    )
     try:
         # Инициализация Sentry (если DSN указан в .env)
         import os
@@ -30,6 +47,11 @@ async def lifespan(app: FastAPI):
         
         # Инициализация базы данных
         await init_db()
+        maintenance = asyncio.create_task(partition_maintenance_loop(await _get_pg_pool()))
+        registrations = asyncio.create_task(registration_listener())
+
+        if live_registry.enabled:
+            live_registry.registry.start()
         
         EventLogger.system_event("Backend started", {
             "version": "1.0",
@@ -50,6 +72,18 @@ async def lifespan(app: FastAPI):
     try:
         yield
     finally:
+        loop_monitor.cancel()
+        if maintenance is not None:
+            maintenance.cancel()
+        if registrations is not None:
+            registrations.cancel()
+        if live_registry.enabled:
+            try:
+                # Записать в БД накопленные события live-матчей
+                await live_registry.registry.stop()
+            except Exception as e:
+                logger.error(f"❌ Не удалось записать live-матчи при остановке: {e}")
+        await cache.disconnect()
         EventLogger.system_event("Backend stopped")
         logger.info("🔚 Backend остановлен")
 
@@ -76,7 +110,7 @@ ALLOWED_ORIGINS = [
 ]
 
 # Middleware
-app.middleware("http")(monitoring_middleware)
+app.add_middleware(MonitoringMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
@@ -86,6 +120,11 @@ app.add_middleware(
 )
 
 # Обработчики исключений
+async def match_conflict_handler(request, exc: MatchWriteConflict):
+    return JSONResponse(status_code=409, content={"detail": "Match was modified concurrently, retry"})
+
+
+app.add_exception_handler(MatchWriteConflict, match_conflict_handler)
 app.add_exception_handler(Exception, global_exception_handler)
 
 # Подключаем роутеры
@@ -94,6 +133,7 @@ app.include_router(matches.router)
 app.include_router(videos.router)
 app.include_router(analytics.router)
 app.include_router(subscriptions.router)
+app.include_router(debug.router)
 
 # Health check endpoint
 @app.get("/health", tags=["monitoring"])
@@ -103,11 +143,20 @@ async def health():
 
 # Metrics endpoint
 @app.get("/metrics", tags=["monitoring"])
-async def get_metrics():
-    """Получение метрик производительности"""
+async def get_metrics(request: Request, format: str | None = None):
+    """Получение метрик производительности: JSON или Prometheus (?format=prometheus / Accept: text/plain)"""
+    accept = request.headers.get("accept", "")
+    view = collect_metrics()
+    if format == "prometheus" or (format is None and ("text/plain" in accept or "openmetrics" in accept)):
+        return PlainTextResponse(render_prometheus(view), media_type=PROMETHEUS_CONTENT_TYPE)
     return {
-        "metrics": metrics.get_stats(),
-        "timestamp": metrics.metrics.get("errors", [])[-5:] if metrics.metrics.get("errors") else []
+        "metrics": view.get_stats(),
+        "latency": view.latency_stats(),
+        "cache": {**view.cache_stats(), "local_entries": len(cache.local)},
+        "db": {"queries": view.metrics["db_queries"], "slowest": view.queries.slowest()},
+        "event_loop": view.loop_lag_stats(),
+        "errors": view.errors.summary(10),
+        "logging": {"dropped_records": dropped_records()},
     }
 
 # Подключение роутеров
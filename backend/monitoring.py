@@ -1,9 +1,17 @@
 """
 Модуль мониторинга и логирования для PadelSense Backend
 """
+import asyncio
+import hashlib
 import logging
+import random
+import re
+import sys
+import threading
 import time
 import traceback
+from bisect import bisect_left
+from contextvars import ContextVar
 from typing import Dict, Any, Optional
 from functools import wraps
 from datetime import datetime
@@ -12,21 +20,226 @@ import sentry_sdk
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('padelsense.log'),
-        logging.StreamHandler()
-    ]
-)
+from backend.config import get_settings
+from backend.logging_config import dropped_records, setup_logging
+from backend.shared_metrics import MmapMetrics, read_directory
+from backend.tracing import end_trace, record_span, start_trace
+
+_settings = get_settings()
+
+# Настройка логирования: запись в файл/консоль — в фоновом потоке
+setup_logging(_settings.log_file)
 
 logger = logging.getLogger(__name__)
+# Access-лог: одна JSON-запись на запрос, с выборкой (access_log_sample_rate)
+access_logger = logging.getLogger("backend.access")
+
+# Логарифмические корзины латентности: 0.5 мс … ~16 с, каждая следующая ×2
+LATENCY_BUCKETS = tuple(0.0005 * 2 ** i for i in range(16))
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (последняя — +Inf)"""
+    __slots__ = ("buckets", "counts", "sum", "count", "shared", "key")
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS, shared: Optional[MmapMetrics] = None, key: tuple = ()):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        # Копия в общей памяти воркеров: ключи key + (номер корзины,) и key + ("sum",)
+        self.shared = shared
+        self.key = key
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+        if self.shared is not None:
+            self.shared.inc(self.key + (i,))
+            self.shared.inc(self.key + ("sum",), value)
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля: линейная интерполяция внутри корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+# --- Запросы к БД: агрегаты по нормализованному SQL и счётчик на HTTP-запрос ---
+
+_SQL_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\$\d+|\b\d+(?:\.\d+)?\b")
+_SQL_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SQL_SPACE_RE = re.compile(r"\s+")
+_MAX_SQL_KEYS = 1000
+_sql_cache: Dict[str, str] = {}
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL без литералов и параметров: одинаковые запросы — один ряд статистики"""
+    normalized = _sql_cache.get(sql)
+    if normalized is None:
+        normalized = _SQL_SPACE_RE.sub(" ", sql).strip()
+        normalized = _SQL_LITERAL_RE.sub("?", normalized)
+        normalized = _SQL_IN_LIST_RE.sub("(...)", normalized)[:500]
+        if len(_sql_cache) < _MAX_SQL_KEYS:
+            _sql_cache[sql] = normalized
+    return normalized
+
+
+class QueryStats:
+    """count / total / max по нормализованному SQL (не больше _MAX_SQL_KEYS рядов)"""
+
+    def __init__(self):
+        self.by_sql: Dict[str, list] = {}
+
+    def add(self, sql: str, seconds: float):
+        stat = self.by_sql.get(sql)
+        if stat is None:
+            if len(self.by_sql) >= _MAX_SQL_KEYS:
+                sql = "<other>"
+                stat = self.by_sql.setdefault(sql, [0, 0.0, 0.0])
+            else:
+                stat = self.by_sql[sql] = [0, 0.0, 0.0]
+        stat[0] += 1
+        stat[1] += seconds
+        stat[2] = max(stat[2], seconds)
+
+    def slowest(self, limit: int = 10) -> list:
+        rows = sorted(self.by_sql.items(), key=lambda item: item[1][1] / item[1][0], reverse=True)
+        return [
+            {'sql': sql, 'count': n, 'total': round(total, 4), 'avg': round(total / n, 5), 'max': round(worst, 4)}
+            for sql, (n, total, worst) in rows[:limit]
+        ]
+
+
+class RequestQueries:
+    """Запросы к БД в рамках одного HTTP-запроса (для поиска N+1)"""
+    __slots__ = ("count", "seconds", "by_sql")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.by_sql: Dict[str, int] = {}
+
+
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def record_query(sql: str, seconds: float):
+    """Вызывается инструментированными asyncpg-соединениями и событиями SQLAlchemy"""
+    normalized = normalize_sql(sql)
+    metrics.record_db_query()
+    metrics.queries.add(normalized, seconds)
+    record_span("db", seconds, sql=normalized)
+    current = _request_queries.get()
+    if current is not None:
+        current.count += 1
+        current.seconds += seconds
+        current.by_sql[normalized] = current.by_sql.get(normalized, 0) + 1
+
+
+# --- Ошибки: группировка по отпечатку вместо traceback на каждую ---
+
+_MAX_ERROR_GROUPS = 200
+_FINGERPRINT_FRAMES = 12
+
+
+def _frame_location(code) -> str:
+    path = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{'/'.join(path[-2:])}:{code.co_qualname}"
+
+
+def error_fingerprint(error: BaseException) -> tuple:
+    """Тип исключения + места в коде (файл:функция, без номеров строк) — внутренние кадры"""
+    locations = [_frame_location(frame.f_code) for frame, _ in traceback.walk_tb(error.__traceback__)]
+    return (type(error).__qualname__, *locations[-_FINGERPRINT_FRAMES:])
+
+
+class ErrorStats:
+    """
+    Ошибки по отпечатку: счётчик, первое/последнее появление и один пример.
+
+    Повтор известной ошибки — обход кадров и инкремент, без форматирования
+    traceback. Новые группы форматируются не чаще samples_per_second в секунду:
+    во время сбоя (например, недоступна БД) ошибки не замедляют воркер ещё больше;
+    группа без примера получит его при следующем появлении.
+    """
+
+    def __init__(self, samples_per_second: float = 5.0):
+        self.groups: Dict[tuple, dict] = {}
+        self.samples_per_second = samples_per_second
+        self._tokens = samples_per_second
+        self._refilled = time.monotonic()
+
+    def _may_format(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(
+            self.samples_per_second, self._tokens + (now - self._refilled) * self.samples_per_second
+        )
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def record(self, error: BaseException, context: str = ""):
+        key = error_fingerprint(error)
+        group = self.groups.get(key)
+        now = time.time()
+        if group is None:
+            if len(self.groups) >= _MAX_ERROR_GROUPS:
+                key = ("<other>",)
+                group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = {
+                    'fingerprint': hashlib.sha1(repr(key).encode()).hexdigest()[:12],
+                    'type': key[0],
+                    'context': context,
+                    'count': 0,
+                    'first_seen': now,
+                    'message': None,
+                    'traceback': None,
+                }
+        group['count'] += 1
+        group['last_seen'] = now
+        if group['traceback'] is None and self._may_format():
+            group['message'] = str(error)[:500]
+            group['traceback'] = "".join(
+                traceback.format_exception(type(error), error, error.__traceback__)
+            )
+
+    def summary(self, limit: int = 20) -> list:
+        """Группы ошибок, последние сверху"""
+        rows = sorted(self.groups.values(), key=lambda g: g['last_seen'], reverse=True)[:limit]
+        return [
+            {
+                **row,
+                'first_seen': datetime.fromtimestamp(row['first_seen']).isoformat(),
+                'last_seen': datetime.fromtimestamp(row['last_seen']).isoformat(),
+            }
+            for row in rows
+        ]
+
 
 # Метрики производительности
 class PerformanceMetrics:
-    def __init__(self):
+    """
+    Метрики воркера. С shared (MmapMetrics) счётчики и гистограммы дублируются
+    в mmap-файл воркера, а /metrics собирает сумму по хосту (collect_metrics).
+    """
+
+    def __init__(self, shared: Optional[MmapMetrics] = None):
+        self.shared = shared
         self.metrics = {
             'requests_total': 0,
             'requests_success': 0,
@@ -34,45 +247,107 @@ class PerformanceMetrics:
             'response_time_sum': 0.0,
             'cache_hits': 0,
             'cache_misses': 0,
+            'cache_tier_hits': {'local': 0, 'redis': 0},
             'db_queries': 0,
-            'errors': []
+            'write_conflicts': 0,
+            'loop_stalls': 0,
+            'errors_total': 0,
         }
+        # (method, шаблон маршрута, класс статуса) -> гистограмма латентности
+        self.latency: Dict[tuple, Histogram] = {}
+        self.queries = QueryStats()
+        self.errors = ErrorStats()
+        # Задержка пробуждения event loop (LoopLagMonitor)
+        self.loop_lag = Histogram(shared=shared, key=("h", "loop_lag"))
     
-    def record_request(self, success: bool, response_time: float):
-        """Запись метрик запроса"""
-        self.metrics['requests_total'] += 1
-        self.metrics['response_time_sum'] += response_time
+    def record_request(
+        self,
+        success: bool,
+        response_time: float,
+        method: str = "",
+        route: str = "",
+        status: int = 0,
+    ):
+        """Запись метрик запроса; route — шаблон (/matches/{match_id}/point), не путь"""
+        self._add('requests_total')
+        self._add('response_time_sum', response_time)
+        if route:
+            key = (method, route, f"{status // 100}xx" if status else "5xx")
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(shared=self.shared, key=("h", "latency", *key))
+            histogram.observe(response_time)
         
-        if success:
-            self.metrics['requests_success'] += 1
-        else:
-            self.metrics['requests_error'] += 1
+        self._add('requests_success' if success else 'requests_error')
     
-    def record_cache_hit(self):
-        """Запись кэш хита"""
-        self.metrics['cache_hits'] += 1
+    def record_cache_hit(self, tier: str = "redis"):
+        """Запись кэш хита на уровне tier (local — память процесса, redis)"""
+        self._add('cache_hits')
+        self.metrics['cache_tier_hits'][tier] += 1
+        if self.shared is not None:
+            self.shared.inc(("c", "cache_tier_hits", tier))
     
     def record_cache_miss(self):
-        """Запись кэш мисса"""
-        self.metrics['cache_misses'] += 1
+        """Запись кэш мисса (значения нет ни на одном уровне)"""
+        self._add('cache_misses')
+    
+    def latency_stats(self) -> list:
+        """p50/p95/p99 по маршрутам (для JSON-вида /metrics)"""
+        return [
+            {
+                'method': method,
+                'route': route,
+                'status': status,
+                'count': h.count,
+                'p50': round(h.quantile(0.5), 4),
+                'p95': round(h.quantile(0.95), 4),
+                'p99': round(h.quantile(0.99), 4),
+            }
+            for (method, route, status), h in sorted(self.latency.items())
+        ]
+    
+    def loop_lag_stats(self) -> Dict[str, Any]:
+        """Задержка event loop: квантили и число зависаний выше порога"""
+        h = self.loop_lag
+        return {
+            'samples': h.count,
+            'p50': round(h.quantile(0.5), 4),
+            'p99': round(h.quantile(0.99), 4),
+            'stalls': self.metrics['loop_stalls'],
+        }
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Доля попаданий в кэш, всего и по уровням"""
+        hits = self.metrics['cache_hits']
+        total = hits + self.metrics['cache_misses']
+        return {
+            'hits': hits,
+            'misses': self.metrics['cache_misses'],
+            'hit_ratio': round(hits / total, 4) if total else 0.0,
+            'tier_hits': dict(self.metrics['cache_tier_hits']),
+        }
     
     def record_db_query(self):
         """Запись запроса к БД"""
-        self.metrics['db_queries'] += 1
+        self._add('db_queries')
+    
+    def record_write_conflict(self):
+        """Запись конфликта оптимистичной блокировки (повтор записи матча)"""
+        self._add('write_conflicts')
+    
+    def record_loop_stall(self):
+        """Запись зависания event loop выше порога"""
+        self._add('loop_stalls')
+    
+    def _add(self, name: str, amount: float = 1):
+        self.metrics[name] += amount
+        if self.shared is not None:
+            self.shared.inc(("c", name), amount)
     
     def record_error(self, error: Exception, context: str = ""):
-        """Запись ошибки"""
-        error_data = {
-            'timestamp': datetime.now().isoformat(),
-            'error': str(error),
-            'context': context,
-            'traceback': traceback.format_exc()
-        }
-        self.metrics['errors'].append(error_data)
-        
-        # Ограничиваем количество ошибок в памяти
-        if len(self.metrics['errors']) > 100:
-            self.metrics['errors'] = self.metrics['errors'][-50:]
+        """Запись ошибки в группу по отпечатку"""
+        self._add('errors_total')
+        self.errors.record(error, context)
     
     def get_stats(self) -> Dict[str, Any]:
         """Получение статистики"""
@@ -90,8 +365,49 @@ class PerformanceMetrics:
             ) * 100 if (self.metrics['cache_hits'] + self.metrics['cache_misses']) > 0 else 0
         }
 
-# Глобальный экземпляр метрик
-metrics = PerformanceMetrics()
+def aggregate_metrics(values: Dict[tuple, float], local: PerformanceMetrics) -> PerformanceMetrics:
+    """
+    PerformanceMetrics из суммы mmap-файлов всех воркеров (read_directory).
+    Счётчики и гистограммы — по хосту; статистика SQL и группы ошибок — только этого воркера.
+    """
+    view = PerformanceMetrics()
+    view.queries = local.queries
+    view.errors = local.errors
+    for key, value in values.items():
+        if key[0] == "c":
+            if len(key) == 3:
+                view.metrics[key[1]][key[2]] = int(value)
+            elif key[1] in view.metrics:
+                view.metrics[key[1]] = value if key[1] == 'response_time_sum' else int(value)
+            continue
+        if key[1] == "loop_lag":
+            histogram = view.loop_lag
+        else:
+            labels = tuple(key[2:-1])
+            histogram = view.latency.get(labels)
+            if histogram is None:
+                histogram = view.latency[labels] = Histogram()
+        field = key[-1]
+        if field == "sum":
+            histogram.sum = value
+        else:
+            histogram.counts[field] = int(value)
+    for histogram in (view.loop_lag, *view.latency.values()):
+        histogram.count = sum(histogram.counts)
+    return view
+
+
+# Глобальный экземпляр метрик; с metrics_multiproc_dir — общий для воркеров хоста
+metrics = PerformanceMetrics(
+    MmapMetrics(_settings.metrics_multiproc_dir) if _settings.metrics_multiproc_dir else None
+)
+
+
+def collect_metrics() -> PerformanceMetrics:
+    """Метрики для /metrics: сумма по воркерам хоста или метрики этого процесса"""
+    if metrics.shared is None:
+        return metrics
+    return aggregate_metrics(read_directory(_settings.metrics_multiproc_dir), metrics)
 
 # Декоратор для мониторинга функций
 def monitor_performance(func_name: Optional[str] = None):
@@ -119,35 +435,204 @@ def monitor_performance(func_name: Optional[str] = None):
         return wrapper
     return decorator
 
+def _route_template(scope: dict) -> str:
+    """Шаблон маршрута вместо пути: ограниченное число рядов метрик"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+def _check_request_queries(endpoint: str, queries: RequestQueries):
+    """Много запросов к БД на один HTTP-запрос — вероятно N+1 или лишние flush/refresh"""
+    threshold = _settings.db_queries_warn_threshold
+    if queries.count <= threshold:
+        return
+    EventLogger.performance_warning(endpoint, "db_queries", queries.count, threshold)
+    repeated = sorted(queries.by_sql.items(), key=lambda item: item[1], reverse=True)[:3]
+    logger.warning(
+        f"🐢 {queries.count} запросов к БД за {queries.seconds:.3f}s, чаще всего: "
+        + "; ".join(f"{n}× {sql[:120]}" for sql, n in repeated)
+    )
+
+
+def _log_access(method: str, path: str, route: str, status: int, response_time: float):
+    """Access-лог с выборкой; ошибки и медленные запросы пишутся всегда"""
+    if status < 500 and response_time < _settings.access_log_slow_seconds:
+        if random.random() >= _settings.access_log_sample_rate:
+            return
+    access_logger.info(
+        f"📤 {method} {path} - {status} ({response_time:.3f}s)",
+        extra={
+            "method": method,
+            "path": path,
+            "route": route,
+            "status": status,
+            "duration": round(response_time, 6),
+        },
+    )
+
+
 # Middleware для мониторинга запросов
-async def monitoring_middleware(request: Request, call_next):
-    """Middleware для мониторинга всех запросов"""
-    start_time = time.time()
-    
-    # Логирование запроса
-    logger.info(f"📥 {request.method} {request.url.path}")
-    
-    try:
-        response = await call_next(request)
-        
-        # Запись успешного запроса
-        response_time = time.time() - start_time
-        metrics.record_request(True, response_time)
-        
-        # Добавление метрик в заголовки ответа
-        response.headers["X-Response-Time"] = f"{response_time:.3f}"
-        
-        logger.info(f"📤 {request.method} {request.url.path} - {response.status_code} ({response_time:.3f}s)")
-        return response
-        
-    except Exception as e:
-        # Запись ошибки
-        response_time = time.time() - start_time
-        metrics.record_request(False, response_time)
-        metrics.record_error(e, f"{request.method} {request.url.path}")
-        
-        logger.error(f"❌ {request.method} {request.url.path} - {str(e)}")
-        raise
+class MonitoringMiddleware:
+    """
+    ASGI-middleware мониторинга всех запросов.
+
+    В отличие от app.middleware("http") (BaseHTTPMiddleware) не запускает
+    приложение в отдельной задаче и не оборачивает тело ответа: перехватывается
+    только http.response.start (статус + X-Response-Time), поэтому SSE и
+    большие ответы идут без буферизации. X-Response-Time — время до заголовков;
+    в метрики попадает полное время, включая отдачу тела.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method, path = scope["method"], scope["path"]
+        status = 500
+        queries = RequestQueries()
+        token = _request_queries.set(queries)
+        root = start_trace(f"{method} {path}", path=path)
+        error = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message.get("headers", ())):
+                    root.attrs["stream"] = True
+                header = (b"x-response-time", f"{time.perf_counter() - start_time:.3f}".encode())
+                message = {**message, "headers": [*message.get("headers", ()), header]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception as e:
+            # Запись ошибки
+            error = e
+            response_time = time.perf_counter() - start_time
+            metrics.record_request(False, response_time, method, _route_template(scope), 500)
+            metrics.record_error(e, f"{method} {path}")
+
+            logger.error(f"❌ {method} {path} - {str(e)}")
+            raise
+        else:
+            response_time = time.perf_counter() - start_time
+            route = _route_template(scope)
+            _check_request_queries(f"{method} {route}", queries)
+            metrics.record_request(status < 500, response_time, method, route, status)
+            _log_access(method, path, route, status, response_time)
+        finally:
+            root.name = f"{method} {_route_template(scope)}"
+            root.attrs["status"] = status
+            end_trace(root, error)
+            _request_queries.reset(token)
+
+# --- Задержка event loop ---
+
+class LoopLagMonitor:
+    """
+    Замер задержки event loop и поиск блокирующего кода.
+
+    Задача в loop засыпает на interval и меряет, насколько позже проснулась
+    (lag -> metrics.loop_lag). Сторожевой поток следит за «пульсом» задачи:
+    если loop не просыпается дольше interval + threshold, значит его держит
+    синхронный код — поток снимает стек потока loop через sys._current_frames.
+    Когда loop освободится, задача пишет предупреждение со стеком через
+    EventLogger.performance_warning.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25):
+        self.interval = interval
+        self.threshold = threshold
+        self._beat = time.perf_counter()
+        self._stack: Optional[str] = None
+        self._stopped = threading.Event()
+
+    def _watch(self, loop_thread_id: int):
+        while not self._stopped.wait(self.interval):
+            if self._stack is not None:
+                continue
+            if time.perf_counter() - self._beat > self.interval + self.threshold:
+                frame = sys._current_frames().get(loop_thread_id)
+                if frame is not None:
+                    self._stack = "".join(traceback.format_stack(frame, limit=20))
+
+    async def run(self):
+        watchdog = threading.Thread(
+            target=self._watch, args=(threading.get_ident(),), name="loop-lag-watchdog", daemon=True
+        )
+        watchdog.start()
+        try:
+            while True:
+                started = self._beat = time.perf_counter()
+                await asyncio.sleep(self.interval)
+                self._beat = now = time.perf_counter()
+                lag = max(0.0, now - started - self.interval)
+                metrics.loop_lag.observe(lag)
+                stack, self._stack = self._stack, None
+                if lag > self.threshold:
+                    metrics.record_loop_stall()
+                    EventLogger.performance_warning("event_loop", "lag", round(lag, 3), self.threshold, stack)
+        finally:
+            self._stopped.set()
+
+
+# Экспорт в формате Prometheus (text exposition 0.0.4)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(m: "PerformanceMetrics") -> str:
+    """Счётчики и гистограммы латентности по маршрутам в текстовом формате Prometheus"""
+    lines = []
+    counters = [
+        ("padelsense_requests_total", "Обработано запросов", m.metrics['requests_total']),
+        ("padelsense_requests_error_total", "Запросов с ошибкой", m.metrics['requests_error']),
+        ("padelsense_cache_hits_total", "Попаданий в кэш", m.metrics['cache_hits']),
+        ("padelsense_cache_misses_total", "Промахов кэша", m.metrics['cache_misses']),
+        ("padelsense_db_queries_total", "Запросов к БД", m.metrics['db_queries']),
+        ("padelsense_write_conflicts_total", "Конфликтов записи матча", m.metrics['write_conflicts']),
+        ("padelsense_errors_total", "Необработанных исключений", m.metrics['errors_total']),
+        ("padelsense_event_loop_stalls_total", "Зависаний event loop выше порога", m.metrics['loop_stalls']),
+        # Очередь логов своя у каждого процесса — счётчик этого воркера, не суммы по хосту
+        ("padelsense_log_records_dropped_total", "Потеряно записей лога (очередь переполнена)", dropped_records()),
+    ]
+    for name, help_text, value in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value}"]
+
+    name = "padelsense_http_request_duration_seconds"
+    lines += [f"# HELP {name} Латентность запросов по маршрутам", f"# TYPE {name} histogram"]
+    for (method, route, status), h in sorted(m.latency.items()):
+        labels = f'method="{_label(method)}",route="{_label(route)}",status="{status}"'
+        lines += _histogram_lines(name, labels, h)
+
+    name = "padelsense_event_loop_lag_seconds"
+    lines += [f"# HELP {name} Задержка пробуждения event loop", f"# TYPE {name} histogram"]
+    lines += _histogram_lines(name, "", m.loop_lag)
+    return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, labels: str, h: Histogram) -> list:
+    prefix = f"{labels}," if labels else ""
+    lines = []
+    cumulative = 0
+    for bound, n in zip(h.buckets, h.counts):
+        cumulative += n
+        lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {h.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {h.sum}")
+    lines.append(f"{name}_count{suffix} {h.count}")
+    return lines
 
 # Обработчик ошибок
 async def global_exception_handler(request: Request, exc: Exception):
@@ -180,7 +665,7 @@ def init_sentry(dsn: Optional[str] = None):
 async def health_check() -> Dict[str, Any]:
     """Проверка здоровья системы"""
     try:
-        stats = metrics.get_stats()
+        stats = collect_metrics().get_stats()
         
         return {
             "status": "healthy",
@@ -191,7 +676,7 @@ async def health_check() -> Dict[str, Any]:
                 "success_rate": round(stats.get("success_rate", 100), 2),
                 "cache_hit_rate": round(stats.get("cache_hit_rate", 0), 2),
                 "db_queries": stats.get("db_queries", 0),
-                "recent_errors": len(stats.get("errors", []))
+                "errors_total": stats.get("errors_total", 0)
             }
         }
     except Exception as e:
@@ -204,7 +689,7 @@ async def health_check() -> Dict[str, Any]:
                 "success_rate": 100,
                 "cache_hit_rate": 0,
                 "db_queries": 0,
-                "recent_errors": 0
+                "errors_total": 0
             },
             "monitoring_error": str(e)
         }
@@ -227,8 +712,11 @@ class EventLogger:
         logger.warning(f"🚨 Security: {event}", extra=details or {})
     
     @staticmethod
-    def performance_warning(component: str, metric: str, value: float, threshold: float):
-        """Логирование предупреждений производительности"""
-        logger.warning(
-            f"⚠️ Performance: {component} {metric}={value} (threshold={threshold})"
-        )
+    def performance_warning(
+        component: str, metric: str, value: float, threshold: float, stack: Optional[str] = None
+    ):
+        """Логирование предупреждений производительности (stack — где стоял код в момент проблемы)"""
+        message = f"⚠️ Performance: {component} {metric}={value} (threshold={threshold})"
+        if stack:
+            message += f"\n{stack.rstrip()}"
+        logger.warning(message)
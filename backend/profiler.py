@@ -0,0 +1,91 @@
+"""
+Профилирование работающего процесса без перезапуска
+
+sample_stacks — статистический семплер: поток раз в interval снимает стеки
+всех потоков (sys._current_frames) и считает одинаковые стеки. Результат —
+collapsed stacks («кадр;кадр;кадр N»), их понимают flamegraph.pl и speedscope.
+
+task_stacks — срез asyncio-задач: цепочка await каждой корутины
+(cr_await) до объекта, которого она ждёт (Future, sleep, чтение сокета).
+"""
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+_labels: Dict[tuple, str] = {}
+
+
+def _frame_label(code, lineno: int) -> str:
+    key = (code, lineno)
+    label = _labels.get(key)
+    if label is None:
+        path = code.co_filename.replace("\\", "/").rsplit("/", 2)
+        label = f"{code.co_qualname} ({'/'.join(path[-2:])}:{lineno})".replace(";", ",")
+        if len(_labels) < 100_000:
+            _labels[key] = label
+    return label
+
+
+def _collapse(frame) -> List[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame.f_code, frame.f_lineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def sample_stacks(seconds: float, interval: float = 0.01) -> Counter:
+    """Семплировать стеки всех потоков (кроме своего) seconds секунд; блокирует вызывающий поток"""
+    own = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    samples: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frames = sys._current_frames()
+        for thread_id, frame in frames.items():
+            if thread_id == own:
+                continue
+            name = names.get(thread_id) or str(thread_id)
+            samples[";".join([name, *_collapse(frame)])] += 1
+        frames = frame = None  # не держать кадры чужих потоков между семплами
+        time.sleep(interval)
+    return samples
+
+
+def format_collapsed(samples: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+def _await_chain(coro) -> List[str]:
+    chain = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            # Не корутина (Future и т.п.) или корутина уже завершилась
+            if not hasattr(coro, "cr_code"):
+                # await future в C-реализации asyncio даёт FutureIter
+                name = type(coro).__name__
+                chain.append("<Future>" if name == "FutureIter" else f"<{name}>")
+            break
+        chain.append(_frame_label(frame.f_code, frame.f_lineno))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return chain
+
+
+def task_stacks(loop: Optional[asyncio.AbstractEventLoop] = None) -> List[dict]:
+    """Задачи loop и цепочки их await: внешняя корутина первой, ожидаемый объект последним"""
+    current = asyncio.current_task(loop)
+    tasks = []
+    for task in asyncio.all_tasks(loop):
+        if task is current:
+            continue
+        tasks.append({
+            "name": task.get_name(),
+            "awaiting": _await_chain(task.get_coro()),
+        })
+    tasks.sort(key=lambda t: t["awaiting"])
+    return tasks
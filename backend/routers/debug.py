@@ -0,0 +1,61 @@
+"""Debug API: профилирование и трассировки работающего воркера. Доступ — по X-Debug-Token."""
+import asyncio
+import secrets
+import time
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from backend.config import get_settings
+from backend.profiler import format_collapsed, sample_stacks, task_stacks
+from backend.tracing import exporter
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+# Один профиль за раз: параллельные семплеры только искажают друг друга
+_profile_lock = asyncio.Lock()
+
+
+async def require_debug_token(x_debug_token: str | None = Header(None, alias="X-Debug-Token")) -> None:
+    expected = get_settings().debug_token
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_debug_token or not secrets.compare_digest(x_debug_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+
+
+@router.get("/profile", dependencies=[Depends(require_debug_token)], response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0, le=60),
+    hz: int = Query(100, ge=1, le=1000),
+):
+    """Семплирующий профиль процесса за seconds секунд — collapsed stacks (flamegraph.pl, speedscope)"""
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="Profile already running")
+    async with _profile_lock:
+        samples = await asyncio.to_thread(sample_stacks, seconds, 1 / hz)
+    filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+    return PlainTextResponse(
+        format_collapsed(samples),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/tasks", dependencies=[Depends(require_debug_token)])
+async def tasks(format: str = "json"):
+    """asyncio-задачи воркера и что каждая ждёт; format=collapsed — для flamegraph"""
+    stacks = task_stacks()
+    if format == "collapsed":
+        counts: dict = {}
+        for task in stacks:
+            key = ";".join(task["awaiting"]) or "<no frames>"
+            counts[key] = counts.get(key, 0) + 1
+        return PlainTextResponse("".join(f"{k} {n}\n" for k, n in sorted(counts.items(), key=lambda kv: -kv[1])))
+    return {"count": len(stacks), "tasks": stacks}
+
+
+@router.get("/traces", dependencies=[Depends(require_debug_token)])
+async def traces(limit: int = Query(20, ge=1, le=200), streams: bool = False):
+    """Самые медленные запросы этого воркера со span'ами (сервисы, БД, уведомления);
+    streams=true — потоковые ответы (SSE), они копятся отдельно"""
+    return {"traces": exporter.slowest(limit, streams=streams), "file_dropped": exporter.dropped}
@@ -1,15 +1,38 @@
 """Matches API."""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.db.session import get_session
-from backend.schemas.matches import MatchStartBody, MatchResponse, PointBody
+from backend.db.session import _get_pg_pool, get_db_connection, get_session
+from backend.schemas.matches import (
+    CourtCommand,
+    EventBatchBody,
+    EventBatchResponse,
+    MatchEventOut,
+    MatchPageResponse,
+    MatchResponse,
+    MatchStartBody,
+    PointBody,
+)
 from backend.services import match_service
+from backend.services.broadcaster import broadcaster, format_sse, match_payload
+from backend.services.match_service import MatchWriteConflict
+from backend.tracing import span
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/matches", tags=["matches"])
 
+SSE_PING_INTERVAL = 15.0  # секунды; держит соединение через прокси
+
 
 def _match_to_response(m):
     return MatchResponse(
@@ -24,6 +47,16 @@ def _match_to_response(m):
     )
 
 
+def _row_to_response(row: dict):
+    return MatchResponse(
+        **{
+            **row,
+            "started_at": row["started_at"].isoformat(),
+            "ended_at": row["ended_at"].isoformat() if row["ended_at"] else None,
+        }
+    )
+
+
 @router.post("/start", response_model=MatchResponse)
 async def start_match(
     body: MatchStartBody,
@@ -35,28 +68,89 @@ async def start_match(
 
 
 @router.get("/{match_id}", response_model=MatchResponse)
-async def get_match(
+async def get_match(match_id: UUID):
+    """Через кэш (read-through); запись инвалидируется событиями матча."""
+    match = await match_service.get_match_view(match_id)
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+    return match
+
+
+@router.get("/{match_id}/page", response_model=MatchPageResponse)
+async def get_match_page(match_id: UUID):
+    """Матч, игроки и хайлайты для страницы матча — из кэша пачками."""
+    page = await match_service.get_match_page(match_id)
+    if not page:
+        raise HTTPException(status_code=404, detail="Match not found")
+    return page
+
+
+@router.get("/{match_id}/stream")
+async def stream_match(
     match_id: UUID,
     session: AsyncSession = Depends(get_session),
 ):
-    match = await match_service.get_match(session, match_id)
-    if not match:
-        raise HTTPException(status_code=404, detail="Match not found")
-    await session.commit()
-    return _match_to_response(match)
+    """SSE-поток счёта для TV-экрана и mini-app: `score` на каждое изменение, `end` в конце."""
+    # Подписка до чтения счёта: очко, записанное пока идёт запрос к БД, придёт из очереди
+    queue = broadcaster.subscribe(match_id)
+    try:
+        first = broadcaster.last_message(match_id)
+        if first is None:
+            match = await match_service.get_live_match(session, match_id)
+            if not match:
+                raise HTTPException(status_code=404, detail="Match not found")
+            await session.commit()
+            first = format_sse(json.dumps(match_payload(match), default=str))
+            if match.status != "active":
+                broadcaster.unsubscribe(match_id, queue)
+                return StreamingResponse(iter([first]), media_type="text/event-stream")
+    except BaseException:
+        broadcaster.unsubscribe(match_id, queue)
+        raise
+
+    async def events():
+        try:
+            yield first
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield message
+                if message.startswith("event: end"):
+                    return
+        finally:
+            broadcaster.unsubscribe(match_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{match_id}/events", response_model=list[MatchEventOut])
+async def match_events(
+    match_id: UUID,
+    session: AsyncSession = Depends(get_session),
+):
+    """Лог событий матча; у завершённых матчей распаковывается из event_log."""
+    events = await match_service.get_match_events(session, match_id)
+    return [MatchEventOut(seq=e.seq, kind=e.kind, payload=e.payload) for e in events]
 
 
 @router.post("/{match_id}/point", response_model=MatchResponse)
 async def add_point(
     match_id: UUID,
     body: PointBody,
-    session: AsyncSession = Depends(get_session),
+    conn: asyncpg.Connection = Depends(get_db_connection),
 ):
-    match = await match_service.add_point(session, match_id, body.team)
+    """Самый частый запрос (кнопка пульта) — быстрый путь через asyncpg."""
+    match = await match_service.add_point_fast(conn, match_id, body.team)
     if not match:
         raise HTTPException(status_code=404, detail="Match not found or not active")
-    await session.commit()
-    return _match_to_response(match)
+    return _row_to_response(match)
 
 
 @router.post("/{match_id}/undo", response_model=MatchResponse)
@@ -96,6 +190,20 @@ async def side_change(
     return _match_to_response(match)
 
 
+@router.post("/{match_id}/events:batch", response_model=EventBatchResponse)
+async def events_batch(
+    match_id: UUID,
+    body: EventBatchBody,
+    session: AsyncSession = Depends(get_session),
+):
+    """Офлайн-очередь планшета одним запросом; повторная отправка идемпотентна."""
+    match, applied, skipped = await match_service.apply_event_batch(session, match_id, body.events)
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found or not active")
+    await session.commit()
+    return EventBatchResponse(match=_match_to_response(match), applied=applied, skipped=skipped)
+
+
 @router.post("/{match_id}/end", response_model=MatchResponse)
 async def end_match(
     match_id: UUID,
@@ -104,7 +212,13 @@ async def end_match(
     match = await match_service.end_match(session, match_id)
     if not match:
         raise HTTPException(status_code=404, detail="Match not found or not active")
-    await session.commit()
+    with span("db.commit"):
+        await session.commit()
+    await _notify_end(session, match)
+    return _match_to_response(match)
+
+
+async def _notify_end(session: AsyncSession, match) -> None:
     try:
         from backend.config import get_settings
         from backend.services.notify_service import notify_match_end
@@ -112,4 +226,156 @@ async def end_match(
         await notify_match_end(session, match, court_name=s.court_name, club_name=s.club_name)
     except Exception:
         pass
-    return _match_to_response(match)
+
+
+# --- WebSocket планшета корта ---
+#
+# Клиент -> {"seq": 12, "type": "point", "match_id": "...", "team": "A"}
+#   type: point | undo | highlight (timestamp_sec) | side_change | end
+# Сервер -> {"type": "ack", "seq": 12, "ok": true, "match": {...MatchResponse}}
+#           {"type": "ack", "seq": 12, "ok": false, "error": "..."}
+# seq нумеруется заново в каждом матче. При подключении сервер шлёт
+# {"type": "hello", "last_seq": {"<match_id>": N}}: команды матча с seq <= N
+# уже применены (повторная отправка после обрыва не задвоит очко).
+# Ошибка в команде (невалидный JSON, чужой корт, конфликт записи) приходит
+# ack'ом с ok=false, соединение не закрывается. После конфликта или ошибки БД
+# seq не считается применённым — команду можно повторить.
+
+
+class _MatchSeq:
+    __slots__ = ("court_id", "last_seq", "last_ack", "lock")
+
+    def __init__(self, court_id: str):
+        self.court_id = court_id
+        self.last_seq = 0
+        self.last_ack: dict | None = None
+        self.lock = asyncio.Lock()
+
+
+# Дедупликация по матчу: новый матч — новый счётчик seq. LRU, чтобы не расти бесконечно
+_MAX_TRACKED_MATCHES = 1024
+_match_seqs: "OrderedDict[UUID, _MatchSeq]" = OrderedDict()
+_background: set[asyncio.Task] = set()
+
+
+async def _match_court(match_id: UUID) -> str | None:
+    pool = await _get_pg_pool()
+    async with pool.acquire() as conn:
+        return await conn.fetchval("SELECT court_id FROM matches WHERE id = $1", match_id)
+
+
+async def _match_state(court_id: str, match_id: UUID) -> _MatchSeq:
+    """Состояние дедупликации матча; матч должен быть на этом корте."""
+    state = _match_seqs.get(match_id)
+    if state is None:
+        match_court = await _match_court(match_id)
+        if match_court is None:
+            raise LookupError("Match not found")
+        state = _match_seqs.setdefault(match_id, _MatchSeq(match_court))
+        while len(_match_seqs) > _MAX_TRACKED_MATCHES:
+            _match_seqs.popitem(last=False)
+    _match_seqs.move_to_end(match_id)
+    if state.court_id != court_id:
+        raise LookupError("Match belongs to another court")
+    return state
+
+
+async def _run_command(command: CourtCommand) -> tuple[dict | None, object | None]:
+    """Выполнить команду планшета: (MatchResponse в JSON или None, завершённый матч для уведомления)."""
+    match_id = command.match_id
+    if command.type == "point":
+        pool = await _get_pg_pool()
+        async with pool.acquire() as conn:
+            row = await match_service.add_point_fast(conn, match_id, command.team)
+        return (_row_to_response(row).model_dump(mode="json") if row else None), None
+
+    from backend.db.session import async_session_maker
+    async with async_session_maker() as session:
+        if command.type == "undo":
+            match = await match_service.undo_point(session, match_id)
+        elif command.type == "highlight":
+            match = await match_service.add_highlight(session, match_id, command.timestamp_sec)
+        elif command.type == "side_change":
+            match = await match_service.side_change(session, match_id)
+        else:
+            match = await match_service.end_match(session, match_id)
+        if not match:
+            return None, None
+        await session.commit()
+        return _match_to_response(match).model_dump(mode="json"), (match if command.type == "end" else None)
+
+
+async def _notify_end_later(match) -> None:
+    from backend.db.session import async_session_maker
+    async with async_session_maker() as session:
+        await _notify_end(session, match)
+
+
+def _ack(seq: int | None, ok: bool, **fields) -> dict:
+    return {"type": "ack", "seq": seq, "ok": ok, **fields}
+
+
+def _raw_seq(text: str) -> int | None:
+    """seq из невалидной команды — чтобы клиент сопоставил ошибку с запросом."""
+    try:
+        seq = json.loads(text).get("seq")
+    except (ValueError, AttributeError):
+        return None
+    return seq if isinstance(seq, int) and not isinstance(seq, bool) else None
+
+
+async def _handle_command(court_id: str, text: str) -> dict:
+    try:
+        command = CourtCommand.model_validate_json(text)
+    except ValidationError as e:
+        error = "; ".join(err["msg"] for err in e.errors()) or "Invalid command"
+        return _ack(_raw_seq(text), False, error=error)
+    seq = command.seq
+    try:
+        state = await _match_state(court_id, command.match_id)
+    except LookupError as e:
+        return _ack(seq, False, error=str(e))
+
+    finished = None
+    async with state.lock:
+        if seq <= state.last_seq:
+            if state.last_ack and state.last_ack["seq"] == seq:
+                return state.last_ack
+            return _ack(seq, True, duplicate=True)
+        try:
+            match, finished = await _run_command(command)
+        except ValueError as e:
+            ack = _ack(seq, False, error=str(e))
+        except MatchWriteConflict:
+            return _ack(seq, False, error="Match was modified concurrently, retry")
+        except Exception as e:
+            logger.error(f"❌ Команда корта {court_id} seq={seq} не выполнена: {e}", exc_info=True)
+            return _ack(seq, False, error="Internal error, retry")
+        else:
+            if match is None:
+                ack = _ack(seq, False, error="Match not found or not active")
+            else:
+                ack = _ack(seq, True, match=match)
+        state.last_seq = seq
+        state.last_ack = ack
+
+    if finished is not None:
+        # Уведомление игроков (HTTP к боту) — вне блокировки и не задерживая ack
+        task = asyncio.create_task(_notify_end_later(finished))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+    return ack
+
+
+@router.websocket("/court/{court_id}/ws")
+async def court_ws(websocket: WebSocket, court_id: str):
+    """Постоянный канал команд пульта/планшета корта с подтверждениями и новым счётом."""
+    await websocket.accept()
+    last_seq = {str(mid): st.last_seq for mid, st in _match_seqs.items() if st.court_id == court_id}
+    await websocket.send_json({"type": "hello", "last_seq": last_seq})
+    try:
+        while True:
+            text = await websocket.receive_text()
+            await websocket.send_json(await _handle_command(court_id, text))
+    except WebSocketDisconnect:
+        pass
@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.cache import invalidate_on_commit, telegram_tag, user_tag
 from backend.db.session import get_session
 from backend.db.models import User
 
@@ -43,5 +44,6 @@ async def subscription_webhook(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.is_pro = True
+    invalidate_on_commit(session, user_tag(user.id), telegram_tag(user.telegram_id))
     await session.commit()
     return {"ok": True}
@@ -7,40 +7,33 @@ from fastapi import APIRouter, Depends, HTTPException
 
 logger = logging.getLogger(__name__)
 
-from backend.db.session import get_db_connection, get_session
+from backend.db.session import get_db_connection
 from backend.schemas.users import UserCreate, UserResponse
 from backend.services.user_service import (
     create_user,
     create_user_pg,
-    get_user,
     get_user_by_telegram_id,
-    get_user_by_telegram_id_pg,
+    get_user_by_telegram_id_cached,
+    get_user_cached,
 )
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.get("/by-telegram/{telegram_id}", response_model=UserResponse)
-async def get_user_by_telegram(
-    telegram_id: int,
-    conn: asyncpg.Connection = Depends(get_db_connection),
-):
-    """Поиск пользователя по Telegram ID — через asyncpg, без greenlet."""
-    user = await get_user_by_telegram_id_pg(conn, telegram_id)
+async def get_user_by_telegram(telegram_id: int):
+    """Поиск пользователя по Telegram ID — кэш, затем asyncpg (без greenlet)."""
+    user = await get_user_by_telegram_id_cached(telegram_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user_by_id(
-    user_id: UUID,
-    session=Depends(get_session),
-):
-    user = await get_user(session, user_id)
+async def get_user_by_id(user_id: UUID):
+    user = await get_user_cached(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    await session.commit()
     return user
 
 
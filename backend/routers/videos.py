@@ -2,33 +2,20 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, File, Header, HTTPException, UploadFile
-from pydantic import BaseModel
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.db.session import get_session
-from backend.db.models import Highlight, Match
+from backend.db.models import Match
+from backend.schemas.matches import HighlightItem
+from backend.services import match_service
 
 router = APIRouter(prefix="/videos", tags=["videos"])
 
 
-class HighlightItem(BaseModel):
-    match_id: UUID
-    timestamp_sec: float
-    url: str | None
-
-
 @router.get("/{match_id}/highlights")
-async def get_highlights(
-    match_id: UUID,
-    session: AsyncSession = Depends(get_session),
-):
-    result = await session.execute(
-        select(Highlight).where(Highlight.match_id == match_id).order_by(Highlight.timestamp_sec)
-    )
-    items = result.scalars().all()
-    await session.commit()
-    return [HighlightItem(match_id=m.match_id, timestamp_sec=m.timestamp_sec, url=m.url) for m in items]
+async def get_highlights(match_id: UUID):
+    items = await match_service.get_highlights_cached(match_id)
+    return [HighlightItem(**item) for item in items]
 
 
 @router.get("/{match_id}/full")
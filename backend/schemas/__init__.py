@@ -1,6 +1,10 @@
 """Pydantic schemas."""
 from .users import UserCreate, UserResponse
 from .matches import (
+    BatchEvent,
+    EventBatchBody,
+    EventBatchResponse,
+    MatchEventOut,
     MatchStartBody,
     MatchResponse,
     PointBody,
@@ -9,6 +13,10 @@ from .matches import (
 __all__ = [
     "UserCreate",
     "UserResponse",
+    "BatchEvent",
+    "EventBatchBody",
+    "EventBatchResponse",
+    "MatchEventOut",
     "MatchStartBody",
     "MatchResponse",
     "PointBody",
@@ -1,7 +1,10 @@
 """Match schemas."""
+from typing import Literal
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+
+from backend.schemas.users import UserResponse
 
 
 class MatchStartBody(BaseModel):
@@ -10,10 +13,11 @@ class MatchStartBody(BaseModel):
     position_3_user_id: UUID
     position_4_user_id: UUID
     court_id: str | None = None
+    rules: Literal["advantage", "golden", "tiebreak", "golden_tiebreak"] = "advantage"
 
 
 class PointBody(BaseModel):
-    team: str  # "A" | "B"
+    team: Literal["A", "B"]
 
 
 class MatchResponse(BaseModel):
@@ -27,3 +31,59 @@ class MatchResponse(BaseModel):
     score: dict
 
     model_config = {"from_attributes": True}
+
+
+class HighlightItem(BaseModel):
+    match_id: UUID
+    timestamp_sec: float
+    url: str | None
+
+
+class MatchPageResponse(BaseModel):
+    match: MatchResponse
+    players: list[UserResponse | None]  # позиции 1–4; None — профиль удалён
+    highlights: list[HighlightItem]
+
+
+class MatchEventOut(BaseModel):
+    seq: int
+    kind: str
+    payload: dict
+
+
+class BatchEvent(BaseModel):
+    seq: int  # порядковый номер события на планшете
+    kind: Literal["point", "undo", "highlight", "side_change"]
+    team: Literal["A", "B"] | None = None  # для point
+    timestamp_sec: float = 0  # для highlight
+
+    @model_validator(mode="after")
+    def _point_needs_team(self):
+        if self.kind == "point" and self.team is None:
+            raise ValueError("point event requires team")
+        return self
+
+
+class CourtCommand(BaseModel):
+    """Команда планшета по WebSocket корта."""
+    seq: int = Field(gt=0)  # порядковый номер команды в матче
+    type: Literal["point", "undo", "highlight", "side_change", "end"]
+    match_id: UUID
+    team: Literal["A", "B"] | None = None  # для point
+    timestamp_sec: float = 0  # для highlight
+
+    @model_validator(mode="after")
+    def _point_needs_team(self):
+        if self.type == "point" and self.team is None:
+            raise ValueError("point command requires team")
+        return self
+
+
+class EventBatchBody(BaseModel):
+    events: list[BatchEvent] = Field(max_length=1000)
+
+
+class EventBatchResponse(BaseModel):
+    match: MatchResponse
+    applied: int
+    skipped: int
@@ -0,0 +1,109 @@
+"""In-process pub/sub счёта матчей для SSE (TV-экран и mini-app).
+
+Каждое изменение счёта сериализуется один раз и раскладывается по очередям
+всех подписчиков матча — зрители не делают запросов в БД. Изменения через
+сессию рассылаются после её commit (publish_on_commit), чтобы зрители не
+увидели счёт, который потом откатится.
+"""
+import asyncio
+import json
+from collections import defaultdict
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+def format_sse(data: str, event: str = "score") -> str:
+    """Сообщение SSE: `score` — новый счёт, `end` — матч завершён (поток закрывается)."""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def match_payload(match) -> dict:
+    """Снимок матча для зрителей: Match, LiveMatch или строка asyncpg (dict)."""
+    get = match.get if isinstance(match, dict) else lambda name: getattr(match, name)
+    return {
+        "id": str(get("id")),
+        "status": get("status"),
+        "team_a_player_ids": [str(p) for p in get("team_a_player_ids")],
+        "team_b_player_ids": [str(p) for p in get("team_b_player_ids")],
+        "score": get("score"),
+    }
+
+
+class ScoreBroadcaster:
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._subscribers: dict[UUID, set[asyncio.Queue]] = defaultdict(set)
+        self._last: dict[UUID, str] = {}
+
+    def subscribe(self, match_id: UUID) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[match_id].add(queue)
+        return queue
+
+    def unsubscribe(self, match_id: UUID, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(match_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[match_id]
+            # Без зрителей последний счёт не храним: следующий возьмёт его из БД
+            self._last.pop(match_id, None)
+
+    def last_message(self, match_id: UUID) -> str | None:
+        """Последнее опубликованное сообщение (пока у матча есть подписчики)."""
+        return self._last.get(match_id)
+
+    def subscriber_count(self, match_id: UUID) -> int:
+        return len(self._subscribers.get(match_id, ()))
+
+    def publish(self, match) -> None:
+        self.publish_payload(match_payload(match))
+
+    def publish_payload(self, payload: dict) -> None:
+        match_id = UUID(payload["id"])
+        subscribers = self._subscribers.get(match_id)
+        if not subscribers:
+            return
+        if payload["status"] == "active":
+            message = format_sse(json.dumps(payload, default=str))
+            self._last[match_id] = message
+        else:
+            message = format_sse(json.dumps(payload, default=str), event="end")
+            self._last.pop(match_id, None)
+        for queue in subscribers:
+            if queue.full():
+                # Медленный зритель: старый счёт не нужен, оставляем свежий
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+
+broadcaster = ScoreBroadcaster()
+
+
+# --- Рассылка после commit сессии ---
+
+_SESSION_PAYLOADS = "broadcast_payloads"
+
+
+def publish_on_commit(session, match) -> None:
+    """Разослать матч, когда сессия (Session или AsyncSession) закоммитит изменения.
+
+    Снимок берётся сейчас: после commit атрибуты ORM-объекта истекают.
+    """
+    payload = match_payload(match)
+    session.info.setdefault(_SESSION_PAYLOADS, {})[payload["id"]] = payload
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    payloads = session.info.pop(_SESSION_PAYLOADS, None)
+    for payload in (payloads or {}).values():
+        broadcaster.publish_payload(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_PAYLOADS, None)
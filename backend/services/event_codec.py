@@ -0,0 +1,121 @@
+"""Компактная бинарная упаковка лога событий завершённого матча.
+
+После окончания матча его события больше не меняются, поэтому сотни строк
+match_events упаковываются в одно поле matches.event_log:
+
+    version: u8 | n_points: varint | n_markers: varint
+    points:  n_points бит (0 — очко A, 1 — очко B), младший бит первым
+    markers: kind: u8 | delta: varint [| timestamp_sec: f64 для highlight]
+
+Маркеры — все события кроме очков (start, undo, highlight, side_change, end);
+delta — сколько очков прошло с предыдущего маркера. seq восстанавливается
+по порядку (1..N), команда в undo — по стеку эффективных очков. Время
+отдельных событий не хранится (остаются started_at/ended_at матча).
+"""
+import struct
+from typing import Iterable, NamedTuple
+
+CODEC_VERSION = 1
+
+_MARKER_KINDS = ("start", "undo", "highlight", "side_change", "end")
+_MARKER_CODES = {kind: code for code, kind in enumerate(_MARKER_KINDS)}
+_F64 = struct.Struct("<d")
+
+
+class DecodedEvent(NamedTuple):
+    seq: int
+    kind: str
+    payload: dict
+
+
+class UnsupportedEventLog(ValueError):
+    """Лог нельзя упаковать без потерь (старый формат событий)."""
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_events(events: Iterable) -> bytes:
+    """События матча (kind, payload, seq; по возрастанию seq) -> bytes."""
+    bits = bytearray()
+    markers = bytearray()
+    n_points = n_markers = last_marker_at = 0
+    expected_seq = 1
+    for event in events:
+        if event.seq != expected_seq:
+            raise UnsupportedEventLog(f"non-contiguous seq {event.seq}, expected {expected_seq}")
+        expected_seq += 1
+        payload = event.payload or {}
+        if event.kind == "point":
+            if n_points % 8 == 0:
+                bits.append(0)
+            if payload["team"] == "B":
+                bits[-1] |= 1 << (n_points % 8)
+            n_points += 1
+            continue
+        if event.kind not in _MARKER_CODES or (event.kind == "undo" and "event_id" in payload):
+            raise UnsupportedEventLog(f"unsupported event {event.kind}: {payload}")
+        markers.append(_MARKER_CODES[event.kind])
+        _write_varint(markers, n_points - last_marker_at)
+        if event.kind == "highlight":
+            markers += _F64.pack(float(payload.get("timestamp_sec", 0)))
+        last_marker_at = n_points
+        n_markers += 1
+
+    out = bytearray([CODEC_VERSION])
+    _write_varint(out, n_points)
+    _write_varint(out, n_markers)
+    return bytes(out + bits + markers)
+
+
+def decode_events(data: bytes) -> list[DecodedEvent]:
+    """bytes -> та же последовательность событий, что была в match_events."""
+    if not data or data[0] != CODEC_VERSION:
+        raise ValueError("unknown event log version")
+    n_points, pos = _read_varint(data, 1)
+    n_markers, pos = _read_varint(data, pos)
+    bits = data[pos:pos + (n_points + 7) // 8]
+    pos += len(bits)
+
+    events: list[DecodedEvent] = []
+    effective: list[str] = []
+    point = 0
+
+    def emit_points(until: int) -> None:
+        nonlocal point
+        while point < until:
+            team = "B" if bits[point >> 3] >> (point & 7) & 1 else "A"
+            effective.append(team)
+            events.append(DecodedEvent(len(events) + 1, "point", {"team": team}))
+            point += 1
+
+    for _ in range(n_markers):
+        kind = _MARKER_KINDS[data[pos]]
+        delta, pos = _read_varint(data, pos + 1)
+        emit_points(point + delta)
+        if kind == "highlight":
+            (timestamp_sec,) = _F64.unpack_from(data, pos)
+            pos += _F64.size
+            payload = {"timestamp_sec": timestamp_sec}
+        elif kind == "undo":
+            payload = {"team": effective.pop()} if effective else {}
+        else:
+            payload = {}
+        events.append(DecodedEvent(len(events) + 1, kind, payload))
+    emit_points(n_points)
+    return events
@@ -0,0 +1,358 @@
+"""Реестр активных матчей в памяти воркера с отложенной записью в БД.
+
+На корте один активный матч и все записи идут с одного планшета, поэтому
+состояние live-матча держим в памяти: чтения и изменения не ходят в Postgres.
+События и новые счета копятся в очереди и пачками пишутся фоновым flusher'ом
+(executemany в одной транзакции). При промахе матч загружается из БД.
+После записи сбрасываются теги кэша записанных матчей — GET /matches/{id}
+и хайлайты из кэша не отстают от БД дольше одного flush.
+
+Если матч не удаётся записать LIVE_FLUSH_MAX_ATTEMPTS раз подряд, его
+очередь отбрасывается с ошибкой в логе, а матч выгружается из памяти —
+иначе один сбойный матч копил бы события бесконечно.
+
+Новый матч попадает в реестр только после commit сессии (register_on_commit):
+иначе откаченный старт оставил бы в памяти матч, которого нет в БД.
+
+Включается LIVE_REGISTRY_ENABLED=true — только при одном воркере или
+sticky-роутинге корта на воркер, иначе воркеры разойдутся в счёте.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.cache import cache, court_tag, match_tag
+from backend.config import get_settings
+from backend.db.session import _get_pg_pool
+from backend.services.score_engine import ScoreEngine
+
+logger = logging.getLogger(__name__)
+
+
+class LiveMatch:
+    """Состояние активного матча. Атрибуты совпадают с моделью Match."""
+
+    __slots__ = (
+        "id",
+        "court_id",
+        "started_at",
+        "ended_at",
+        "status",
+        "team_a_player_ids",
+        "team_b_player_ids",
+        "engine",
+        "last_seq",
+    )
+
+    def __init__(self, match):
+        self.id = match.id
+        self.court_id = match.court_id
+        self.started_at = match.started_at
+        self.ended_at = match.ended_at
+        self.status = match.status
+        self.team_a_player_ids = list(match.team_a_player_ids)
+        self.team_b_player_ids = list(match.team_b_player_ids)
+        self.engine = ScoreEngine.from_match(match)
+        self.last_seq = match.last_seq or 0
+
+    @property
+    def score(self) -> dict:
+        return self.engine.score
+
+    def row(self) -> tuple:
+        """Параметры UPDATE matches для flush."""
+        return (
+            self.id,
+            self.engine.score,
+            self.engine.points,
+            list(self.engine.snapshots),
+            self.last_seq,
+            self.team_a_player_ids,
+            self.team_b_player_ids,
+        )
+
+
+class _MatchRow:
+    """Строка matches из asyncpg с доступом по атрибутам (для LiveMatch)."""
+
+    __slots__ = ("_row",)
+
+    def __init__(self, row):
+        self._row = row
+
+    def __getattr__(self, name):
+        return self._row[name]
+
+
+_LOAD_SQL = """
+SELECT id, court_id, started_at, ended_at, status, team_a_player_ids, team_b_player_ids,
+       score, point_log, snapshots, last_seq
+FROM matches WHERE id = $1 AND status = 'active'
+"""
+
+_UPDATE_MATCH_SQL = """
+UPDATE matches
+SET score = $2::jsonb, point_log = $3, snapshots = $4::jsonb, last_seq = $5,
+    team_a_player_ids = $6, team_b_player_ids = $7, version = version + 1
+WHERE id = $1
+"""
+
+_INSERT_EVENT_SQL = """
+INSERT INTO match_events (id, match_id, seq, kind, payload, created_at)
+VALUES ($1, $2, $3, $4, $5::jsonb, $6)
+"""
+
+_INSERT_HIGHLIGHT_SQL = """
+INSERT INTO highlights (id, match_id, timestamp_sec, created_at)
+VALUES ($1, $2, $3, $4)
+"""
+
+
+class MatchRegistry:
+    def __init__(self, flush_interval: float = 0.5, max_attempts: int = 20):
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._matches: dict[UUID, LiveMatch] = {}
+        self._events: list[tuple] = []
+        self._highlights: list[tuple] = []
+        self._dirty: set[UUID] = set()
+        self._failures: dict[UUID, int] = {}  # неудачные записи подряд по матчу
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    # --- Чтение ---
+
+    def lookup(self, match_id: UUID) -> LiveMatch | None:
+        """Матч из памяти, без обращения к БД."""
+        return self._matches.get(match_id)
+
+    async def get(self, match_id: UUID) -> LiveMatch | None:
+        """Активный матч: из памяти, при промахе — загрузка из БД."""
+        live = self._matches.get(match_id)
+        if live is not None:
+            return live
+        pool = await _get_pg_pool()
+        row = await pool.fetchrow(_LOAD_SQL, match_id)
+        if not row:
+            return None
+        # Пока шёл запрос, матч мог загрузить параллельный вызов
+        return self._matches.setdefault(match_id, LiveMatch(_MatchRow(row)))
+
+    def register(self, match) -> LiveMatch:
+        live = LiveMatch(match)
+        self._matches[live.id] = live
+        return live
+
+    def _adopt(self, live: LiveMatch) -> None:
+        # После commit матч мог уже загрузить get() — его состояние новее
+        self._matches.setdefault(live.id, live)
+
+    async def evict(self, match_id: UUID) -> None:
+        """Сбросить изменения матча в БД и убрать его из памяти."""
+        await self.flush(match_id)
+        self._matches.pop(match_id, None)
+
+    # --- Изменения ---
+
+    def _append_event(self, live: LiveMatch, kind: str, payload: dict) -> None:
+        live.last_seq += 1
+        self._events.append(
+            (uuid.uuid4(), live.id, live.last_seq, kind, payload, datetime.now(timezone.utc))
+        )
+        self._dirty.add(live.id)
+        self._ensure_flusher()
+
+    async def add_point(self, match_id: UUID, team: str) -> LiveMatch | None:
+        live = await self.get(match_id)
+        if live is None:
+            return None
+        live.engine.apply(team)
+        self._append_event(live, "point", {"team": team})
+        return live
+
+    async def undo_point(self, match_id: UUID) -> LiveMatch | None:
+        live = await self.get(match_id)
+        if live is None:
+            return None
+        team = live.engine.undo()
+        if team is not None:
+            self._append_event(live, "undo", {"team": team})
+        return live
+
+    async def add_highlight(self, match_id: UUID, timestamp_sec: float) -> LiveMatch | None:
+        live = await self.get(match_id)
+        if live is None:
+            return None
+        self._highlights.append(
+            (uuid.uuid4(), live.id, timestamp_sec, datetime.now(timezone.utc))
+        )
+        self._append_event(live, "highlight", {"timestamp_sec": timestamp_sec})
+        return live
+
+    async def side_change(self, match_id: UUID) -> LiveMatch | None:
+        live = await self.get(match_id)
+        if live is None:
+            return None
+        live.team_a_player_ids, live.team_b_player_ids = (
+            live.team_b_player_ids,
+            live.team_a_player_ids,
+        )
+        self._append_event(live, "side_change", {})
+        return live
+
+    # --- Отложенная запись ---
+
+    async def flush(self, match_id: UUID | None = None) -> int:
+        """Записать накопленные события и счета одной транзакцией. Возвращает число событий.
+
+        Если какой-то матч записать не удалось, остальные всё равно пишутся.
+        С match_id ошибка пробрасывается, только если не записан этот матч
+        (evict не выгрузит его незаписанным), без него — при любой неудаче.
+        """
+        flushed = await self._write_queued()
+        if not flushed:
+            return 0
+        events, written, failed = flushed
+        tags = set()
+        for written_id in written:
+            tags.add(match_tag(written_id))
+            live = self._matches.get(written_id)
+            if live is not None:
+                tags.add(court_tag(live.court_id))
+        if tags:
+            await cache.invalidate_tags(*tags)
+        if match_id is not None:
+            if match_id in failed:
+                raise failed[match_id]
+        elif failed:
+            raise next(iter(failed.values()))
+        return len(events)
+
+    async def _write_queued(self) -> tuple[list[tuple], set[UUID], dict[UUID, Exception]] | None:
+        """Транзакция flush; возвращает записанные события, матчи и ошибки незаписанных."""
+        async with self._flush_lock:
+            if not self._events and not self._dirty:
+                return None
+            events, self._events = self._events, []
+            highlights, self._highlights = self._highlights, []
+            dirty, self._dirty = self._dirty, set()
+            match_ids = dirty | {e[1] for e in events}
+            # Строки снимаются вместе с событиями: пока идёт запись, матч меняется дальше
+            rows = {mid: self._matches[mid].row() for mid in match_ids if mid in self._matches}
+            failed: dict[UUID, Exception] = {}
+            try:
+                await self._write(list(rows.values()), events, highlights)
+            except Exception as e:
+                if len(match_ids) == 1:
+                    failed[next(iter(match_ids))] = e
+                else:
+                    # Пачка откатилась целиком: пишем матчи по одному, чтобы сбойный не держал остальные
+                    for mid in match_ids:
+                        try:
+                            await self._write(
+                                [rows[mid]] if mid in rows else [],
+                                [ev for ev in events if ev[1] == mid],
+                                [h for h in highlights if h[1] == mid],
+                            )
+                        except Exception as e:
+                            failed[mid] = e
+            for mid in match_ids:
+                if mid in failed:
+                    self._requeue_or_drop(
+                        mid,
+                        [ev for ev in events if ev[1] == mid],
+                        [h for h in highlights if h[1] == mid],
+                        failed[mid],
+                    )
+                else:
+                    self._failures.pop(mid, None)
+            written = match_ids - failed.keys()
+            return [ev for ev in events if ev[1] in written], written, failed
+
+    async def _write(self, rows: list[tuple], events: list[tuple], highlights: list[tuple]) -> None:
+        pool = await _get_pg_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            if rows:
+                await conn.executemany(_UPDATE_MATCH_SQL, rows)
+            if events:
+                await conn.executemany(_INSERT_EVENT_SQL, events)
+            if highlights:
+                await conn.executemany(_INSERT_HIGHLIGHT_SQL, highlights)
+
+    def _requeue_or_drop(self, match_id: UUID, events: list[tuple], highlights: list[tuple], error: Exception) -> None:
+        attempts = self._failures.get(match_id, 0) + 1
+        if attempts >= self.max_attempts:
+            self._failures.pop(match_id, None)
+            self._matches.pop(match_id, None)
+            logger.error(
+                f"❌ Live-матч {match_id} не записан за {attempts} попыток, "
+                f"отброшено событий: {len(events)} ({error})"
+            )
+            return
+        self._failures[match_id] = attempts
+        # Вернуть в начало очереди — запишем следующим flush
+        self._events[:0] = events
+        self._highlights[:0] = highlights
+        self._dirty.add(match_id)
+
+    def _ensure_flusher(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи live-матчей в БД: {e}")
+
+    def start(self) -> None:
+        self._ensure_flusher()
+
+    async def stop(self) -> None:
+        """Остановить flusher и записать всё, что осталось (вызывается из lifespan)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+_settings = get_settings()
+enabled = _settings.live_registry_enabled
+registry = MatchRegistry(
+    flush_interval=_settings.live_flush_interval,
+    max_attempts=_settings.live_flush_max_attempts,
+)
+
+# --- Регистрация нового матча после commit сессии ---
+
+_SESSION_MATCHES = "live_matches"
+
+
+def register_on_commit(session, match) -> None:
+    """Добавить матч в реестр, когда сессия закоммитит его создание.
+
+    Снимок берётся сейчас: после commit атрибуты ORM-объекта истекают.
+    """
+    session.info.setdefault(_SESSION_MATCHES, []).append(LiveMatch(match))
+
+
+@event.listens_for(Session, "after_commit")
+def _register_after_commit(session: Session) -> None:
+    for live in session.info.pop(_SESSION_MATCHES, ()):
+        registry._adopt(live)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_MATCHES, None)
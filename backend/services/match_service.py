@@ -1,117 +1,122 @@
 """Match CRUD and score logic."""
-from uuid import UUID
+import asyncio
+import logging
+import random
+import uuid
 from datetime import datetime, timezone
+from functools import wraps
+from uuid import UUID
 
-from sqlalchemy import select
+import asyncpg
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
+from backend.cache import cache, cache_key, cached_many, court_tag, invalidate_on_commit, match_tag
 from backend.config import get_settings
 from backend.db.models import Match, MatchEvent
-from backend.schemas.matches import MatchStartBody
+from backend.db.session import _get_pg_pool
+from backend.monitoring import metrics
+from backend.schemas.matches import BatchEvent, MatchResponse, MatchStartBody
+from backend.services import live_registry
+from backend.services.broadcaster import broadcaster, publish_on_commit
+from backend.services.event_codec import DecodedEvent, UnsupportedEventLog, decode_events, encode_events
+from backend.services.score_engine import SNAPSHOT_INTERVAL, ScoreEngine, add_point as apply_point, initial_score
+from backend.services.scoring_table import DEFAULT_RULES
+from backend.services.user_service import get_user_cached
+from backend.tracing import traced
 
+logger = logging.getLogger(__name__)
 
-def _initial_score() -> dict:
-    return {
-        "sets_a": 0,
-        "sets_b": 0,
-        "games_a": [0],
-        "games_b": [0],
-        "points_a": 0,
-        "points_b": 0,
-    }
 
+def _append_event(
+    session: AsyncSession,
+    match: Match,
+    kind: str,
+    payload: dict,
+    client_seq: int | None = None,
+) -> MatchEvent:
+    """Добавить событие в append-only лог матча со следующим seq."""
+    invalidate_on_commit(session, match_tag(match.id), court_tag(match.court_id))
+    match.last_seq = (match.last_seq or 0) + 1
+    event = MatchEvent(
+        match_id=match.id, seq=match.last_seq, kind=kind, payload=payload, client_seq=client_seq
+    )
+    session.add(event)
+    return event
 
-def _point_val(p) -> int:
-    if p == "adv":
-        return 41
-    return int(p) if p is not None else 0
-
-
-def _add_point(score: dict, team: str) -> dict:
-    s = dict(score)
-    pa = s["points_a"]
-    pb = s["points_b"]
-    ga = s["games_a"][-1]
-    gb = s["games_b"][-1]
-    sa = s["sets_a"]
-    sb = s["sets_b"]
-    games_a = list(s["games_a"])
-    games_b = list(s["games_b"])
-    va, vb = _point_val(pa), _point_val(pb)
-
-    if team == "A":
-        if va < 30:
-            pa += 15
-        elif va == 30:
-            pa = 40
-        else:
-            if vb < 40:
-                pa, pb = 0, 0
-                ga += 1
-            elif vb == 40 and va == 40:
-                pa = "adv"
-            elif va == 41:
-                pa, pb = 0, 0
-                ga += 1
-            else:
-                pb = 40
-                pa = 40
-        s["points_a"] = pa
-        s["points_b"] = pb
-    else:
-        if vb < 30:
-            pb += 15
-        elif vb == 30:
-            pb = 40
-        else:
-            if va < 40:
-                pa, pb = 0, 0
-                gb += 1
-            elif va == 40 and vb == 40:
-                pb = "adv"
-            elif vb == 41:
-                pa, pb = 0, 0
-                gb += 1
-            else:
-                pa = 40
-                pb = 40
-        s["points_a"] = pa
-        s["points_b"] = pb
-
-    s["games_a"] = games_a
-    s["games_b"] = games_b
-    if ga >= 6 and ga - gb >= 2:
-        s["sets_a"] = sa + 1
-        s["games_a"] = [0]
-        s["games_b"] = [0]
-        s["points_a"] = 0
-        s["points_b"] = 0
-    elif gb >= 6 and gb - ga >= 2:
-        s["sets_b"] = sb + 1
-        s["games_a"] = [0]
-        s["games_b"] = [0]
-        s["points_a"] = 0
-        s["points_b"] = 0
-    else:
-        s["games_a"][-1] = ga
-        s["games_b"][-1] = gb
-    return s
 
+_CONFLICT_RETRIES = 3
+_CONFLICT_BACKOFF = 0.01  # секунды; пауза перед повтором — случайная в [0, base * 2^попытка]
 
+
+class MatchWriteConflict(Exception):
+    """Матч менялся конкурентно и повторы не помогли."""
+
+
+async def _conflict_backoff(attempt: int) -> None:
+    """Разнести повторы конкурирующих писателей, чтобы они не столкнулись снова."""
+    if attempt < _CONFLICT_RETRIES - 1:
+        await asyncio.sleep(random.uniform(0, _CONFLICT_BACKOFF * 2 ** attempt))
+
+
+def _retry_on_conflict(func):
+    """Оптимистичная блокировка: при конкурентной записи матча — повтор со свежим состоянием."""
+    @wraps(func)
+    async def wrapper(session: AsyncSession, *args, **kwargs):
+        for attempt in range(_CONFLICT_RETRIES):
+            try:
+                return await func(session, *args, **kwargs)
+            except StaleDataError:
+                metrics.record_write_conflict()
+                await session.rollback()
+                await _conflict_backoff(attempt)
+        raise MatchWriteConflict(f"{func.__name__}: match changed concurrently")
+    return wrapper
+
+
+def _publishes(func):
+    """Разослать новый счёт подписчикам SSE после изменения матча.
+
+    ORM-матч — после commit сессии; LiveMatch из реестра и строка быстрого
+    пути (уже закоммиченная одной инструкцией) — сразу.
+    """
+    @wraps(func)
+    async def wrapper(session, *args, **kwargs):
+        match = await func(session, *args, **kwargs)
+        if isinstance(match, Match):
+            publish_on_commit(session, match)
+        elif match is not None:
+            broadcaster.publish(match)
+        return match
+    return wrapper
+
+
+def _store_engine(match: Match, engine: ScoreEngine) -> None:
+    match.score = engine.score
+    match.point_log = engine.points
+    match.snapshots = list(engine.snapshots)
+
+
+@traced()
 async def start_match(session: AsyncSession, body: MatchStartBody) -> Match:
     court_id = body.court_id or get_settings().court_id
     match = Match(
         court_id=court_id,
         team_a_player_ids=[body.position_1_user_id, body.position_2_user_id],
         team_b_player_ids=[body.position_3_user_id, body.position_4_user_id],
-        score=_initial_score(),
+        score=initial_score(body.rules),
+        point_log="",
+        snapshots=[initial_score(body.rules)],
+        last_seq=0,
     )
     session.add(match)
     await session.flush()
-    event = MatchEvent(match_id=match.id, kind="start", payload={})
-    session.add(event)
+    _append_event(session, match, "start", {})
     await session.flush()
     await session.refresh(match)
+    if live_registry.enabled:
+        live_registry.register_on_commit(session, match)
     return match
 
 
@@ -120,54 +125,98 @@ async def get_match(session: AsyncSession, match_id: UUID) -> Match | None:
     return result.scalar_one_or_none()
 
 
+async def get_live_match(session: AsyncSession, match_id: UUID):
+    """Матч для чтения: live-состояние из реестра, иначе строка из БД."""
+    if live_registry.enabled:
+        live = live_registry.registry.lookup(match_id)
+        if live is not None:
+            return live
+    return await get_match(session, match_id)
+
+
+async def get_match_events(session: AsyncSession, match_id: UUID) -> list[DecodedEvent]:
+    """События матча по порядку seq: из упакованного event_log или из match_events."""
+    if live_registry.enabled:
+        await live_registry.registry.flush(match_id)
+    match = await session.get(Match, match_id)
+    if match and match.event_log:
+        return decode_events(match.event_log)
+    result = await session.execute(
+        select(MatchEvent).where(MatchEvent.match_id == match_id).order_by(MatchEvent.seq)
+    )
+    return [DecodedEvent(e.seq, e.kind, e.payload or {}) for e in result.scalars()]
+
+
+@traced()
+async def replay_match(session: AsyncSession, match_id: UUID) -> ScoreEngine:
+    """Пересобрать счёт матча из лога событий (для аналитики)."""
+    match = await session.get(Match, match_id)
+    events = await get_match_events(session, match_id)
+    rules = (match.score or {}).get("rules", DEFAULT_RULES) if match else DEFAULT_RULES
+    return ScoreEngine.replay(events, rules)
+
+
+@traced()
+@_publishes
+@_retry_on_conflict
 async def add_point(session: AsyncSession, match_id: UUID, team: str) -> Match | None:
+    if live_registry.enabled:
+        return await live_registry.registry.add_point(match_id, team)
     match = await get_match(session, match_id)
     if not match or match.status != "active":
         return None
-    new_score = _add_point(match.score, team)
-    match.score = new_score
-    session.add(MatchEvent(match_id=match_id, kind="point", payload={"team": team}))
+    engine = ScoreEngine.from_match(match)
+    engine.apply(team)
+    _store_engine(match, engine)
+    _append_event(session, match, "point", {"team": team})
     await session.flush()
     await session.refresh(match)
     return match
 
 
+@traced()
+@_publishes
+@_retry_on_conflict
 async def undo_point(session: AsyncSession, match_id: UUID) -> Match | None:
+    if live_registry.enabled:
+        return await live_registry.registry.undo_point(match_id)
     match = await get_match(session, match_id)
     if not match or match.status != "active":
         return None
-    events_result = await session.execute(
-        select(MatchEvent).where(MatchEvent.match_id == match_id).order_by(MatchEvent.created_at.desc()).limit(1)
-    )
-    last = events_result.scalar_one_or_none()
-    if not last or last.kind != "point":
-        return match
-    payload = last.payload or {}
-    team = payload.get("team")
-    if not team:
+    engine = ScoreEngine.from_match(match)
+    team = engine.undo()
+    if team is None:
         return match
-    rev_score = _add_point(match.score, "B" if team == "A" else "A")
-    match.score = rev_score
-    session.add(MatchEvent(match_id=match_id, kind="undo", payload={"event_id": str(last.id)}))
-    await session.delete(last)
+    _store_engine(match, engine)
+    # Лог append-only: отмена — отдельное событие, очко из match_events не удаляется
+    _append_event(session, match, "undo", {"team": team})
     await session.flush()
     await session.refresh(match)
     return match
 
 
+@traced()
+@_retry_on_conflict
 async def add_highlight(session: AsyncSession, match_id: UUID, timestamp_sec: float) -> Match | None:
+    if live_registry.enabled:
+        return await live_registry.registry.add_highlight(match_id, timestamp_sec)
     match = await get_match(session, match_id)
     if not match or match.status != "active":
         return None
     from backend.db.models import Highlight
     session.add(Highlight(match_id=match_id, timestamp_sec=timestamp_sec))
-    session.add(MatchEvent(match_id=match_id, kind="highlight", payload={"timestamp_sec": timestamp_sec}))
+    _append_event(session, match, "highlight", {"timestamp_sec": timestamp_sec})
     await session.flush()
     await session.refresh(match)
     return match
 
 
+@traced()
+@_publishes
+@_retry_on_conflict
 async def side_change(session: AsyncSession, match_id: UUID) -> Match | None:
+    if live_registry.enabled:
+        return await live_registry.registry.side_change(match_id)
     match = await get_match(session, match_id)
     if not match or match.status != "active":
         return None
@@ -177,19 +226,252 @@ async def side_change(session: AsyncSession, match_id: UUID) -> Match | None:
     )
     match.team_a_player_ids = [p3, p4]
     match.team_b_player_ids = [p1, p2]
-    session.add(MatchEvent(match_id=match_id, kind="side_change", payload={}))
+    _append_event(session, match, "side_change", {})
     await session.flush()
     await session.refresh(match)
     return match
 
 
+@traced()
+@_publishes
+@_retry_on_conflict
 async def end_match(session: AsyncSession, match_id: UUID) -> Match | None:
+    if live_registry.enabled:
+        # Сначала дописать в БД всё накопленное по матчу
+        await live_registry.registry.evict(match_id)
     match = await get_match(session, match_id)
     if not match or match.status != "active":
         return None
     match.status = "finished"
     match.ended_at = datetime.now(timezone.utc)
-    session.add(MatchEvent(match_id=match_id, kind="end", payload={}))
+    _append_event(session, match, "end", {})
     await session.flush()
+    if get_settings().compact_finished_events:
+        await _compact_events(session, match)
     await session.refresh(match)
     return match
+
+
+@traced()
+async def _compact_events(session: AsyncSession, match: Match) -> None:
+    """Упаковать лог завершённого матча в event_log и удалить его строки из match_events."""
+    result = await session.execute(
+        select(MatchEvent).where(MatchEvent.match_id == match.id).order_by(MatchEvent.seq)
+    )
+    events = [DecodedEvent(e.seq, e.kind, e.payload or {}) for e in result.scalars()]
+    try:
+        packed = encode_events(events)
+    except UnsupportedEventLog as e:
+        logger.info("Лог матча %s не упакован: %s", match.id, e)
+        return
+    if decode_events(packed) != events:
+        # Матч начат до движка счёта: undo не восстанавливается по стеку очков
+        logger.info("Лог матча %s не упакован: не совпадает после распаковки", match.id)
+        return
+    match.event_log = packed
+    await session.execute(
+        delete(MatchEvent).where(MatchEvent.match_id == match.id),
+        execution_options={"synchronize_session": False},
+    )
+    await session.flush()
+
+
+@traced()
+@_retry_on_conflict
+async def apply_event_batch(
+    session: AsyncSession, match_id: UUID, events: list[BatchEvent]
+) -> tuple[Match | None, int, int]:
+    """Применить офлайн-очередь планшета за одну транзакцию.
+
+    События с seq <= last_client_seq матча уже применены и пропускаются.
+    Возвращает (матч, применено, пропущено).
+    """
+    if live_registry.enabled:
+        # Пишем мимо реестра: сначала сбросить live-состояние в БД
+        await live_registry.registry.evict(match_id)
+    match = await get_match(session, match_id)
+    if not match or match.status != "active":
+        return None, 0, 0
+    from backend.db.models import Highlight
+    engine = ScoreEngine.from_match(match)
+    applied = skipped = 0
+    for event in sorted(events, key=lambda e: e.seq):
+        if event.seq <= match.last_client_seq:
+            skipped += 1
+            continue
+        if event.kind == "point":
+            engine.apply(event.team)
+            payload = {"team": event.team}
+        elif event.kind == "undo":
+            team = engine.undo()
+            payload = {"team": team} if team else {}
+        elif event.kind == "highlight":
+            session.add(Highlight(match_id=match_id, timestamp_sec=event.timestamp_sec))
+            payload = {"timestamp_sec": event.timestamp_sec}
+        else:
+            match.team_a_player_ids, match.team_b_player_ids = (
+                list(match.team_b_player_ids),
+                list(match.team_a_player_ids),
+            )
+            payload = {}
+        _append_event(session, match, event.kind, payload, client_seq=event.seq)
+        match.last_client_seq = event.seq
+        applied += 1
+    if applied:
+        _store_engine(match, engine)
+        await session.flush()
+        publish_on_commit(session, match)
+    return match, applied, skipped
+
+
+# --- Быстрый путь через asyncpg (POST /matches/{id}/point) ---
+
+_MATCH_COLUMNS = "id, court_id, started_at, ended_at, status, team_a_player_ids, team_b_player_ids, score"
+
+# Одна атомарная инструкция: обновить счёт, дописать очко в лог и событие в match_events.
+# Условие version = $2 — оптимистичная блокировка: при параллельной записи — повтор.
+_APPLY_POINT_SQL = f"""
+WITH upd AS (
+    UPDATE matches
+    SET score = $3::jsonb,
+        point_log = point_log || $4,
+        snapshots = snapshots || $5::jsonb,
+        last_seq = last_seq + 1,
+        version = version + 1
+    WHERE id = $1 AND status = 'active' AND version = $2
+    RETURNING {_MATCH_COLUMNS}, last_seq
+), ev AS (
+    INSERT INTO match_events (id, match_id, seq, kind, payload, created_at)
+    SELECT $6, id, last_seq, 'point', $7::jsonb, NOW() FROM upd
+)
+SELECT {_MATCH_COLUMNS} FROM upd
+"""
+
+
+
+def _live_to_row(live) -> dict:
+    return {
+        "id": live.id,
+        "court_id": live.court_id,
+        "started_at": live.started_at,
+        "ended_at": live.ended_at,
+        "status": live.status,
+        "team_a_player_ids": live.team_a_player_ids,
+        "team_b_player_ids": live.team_b_player_ids,
+        "score": live.score,
+    }
+
+
+@traced()
+@_publishes
+async def add_point_fast(conn: asyncpg.Connection, match_id: UUID, team: str) -> dict | None:
+    """Очко за два запроса без ORM: чтение счёта + одна атомарная запись.
+
+    Вместо SELECT + UPDATE + INSERT + flush + refresh + COMMIT в add_point.
+    """
+    if live_registry.enabled:
+        live = await live_registry.registry.add_point(match_id, team)
+        return _live_to_row(live) if live else None
+    for attempt in range(_CONFLICT_RETRIES):
+        row = await conn.fetchrow(
+            """
+            SELECT status, score, version, length(point_log) AS n_points,
+                   jsonb_array_length(snapshots) AS n_snapshots
+            FROM matches WHERE id = $1
+            """,
+            match_id,
+        )
+        if not row or row["status"] != "active":
+            return None
+        score = apply_point(row["score"], team)
+        new_snapshots = []
+        if row["n_snapshots"] == 0:
+            # Матч начат до движка счёта: текущий счёт — базовый снапшот.
+            new_snapshots.append(row["score"])
+        if (row["n_points"] + 1) % SNAPSHOT_INTERVAL == 0:
+            new_snapshots.append(score)
+        result = await conn.fetchrow(
+            _APPLY_POINT_SQL,
+            match_id,
+            row["version"],
+            score,
+            team,
+            new_snapshots,
+            uuid.uuid4(),
+            {"team": team},
+        )
+        if result:
+            cache.invalidate_tags_soon(match_tag(match_id), court_tag(result["court_id"]))
+            return dict(result)
+        metrics.record_write_conflict()
+        await _conflict_backoff(attempt)
+    raise MatchWriteConflict("add_point_fast: match changed concurrently")
+
+
+# --- Чтение через кэш (GET /matches/{id}, GET /videos/{id}/highlights) ---
+#
+# Записи помечены тегом match:{id}; любое событие матча (_append_event,
+# add_point_fast) инвалидирует его после commit.
+
+MATCH_CACHE_TTL = 300
+
+
+def _response_payload(row: dict) -> dict:
+    """Матч в JSON-виде MatchResponse — одинаковый из кэша и из БД."""
+    return MatchResponse(
+        **{
+            **row,
+            "started_at": row["started_at"].isoformat(),
+            "ended_at": row["ended_at"].isoformat() if row["ended_at"] else None,
+        }
+    ).model_dump(mode="json")
+
+
+@cache_key("match", expire=MATCH_CACHE_TTL, tags=["match:{match_id}"])
+async def get_match_cached(match_id: UUID) -> dict | None:
+    pool = await _get_pg_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(f"SELECT {_MATCH_COLUMNS} FROM matches WHERE id = $1", match_id)
+    return _response_payload(dict(row)) if row else None
+
+
+@traced()
+async def get_match_view(match_id: UUID) -> dict | None:
+    """Матч для GET /matches/{id}: live-состояние из реестра, иначе кэш / БД."""
+    if live_registry.enabled:
+        live = live_registry.registry.lookup(match_id)
+        if live is not None:
+            return _response_payload(_live_to_row(live))
+    return await get_match_cached(match_id)
+
+
+@traced()
+@cache_key("highlights", expire=MATCH_CACHE_TTL, tags=["match:{match_id}"])
+async def get_highlights_cached(match_id: UUID) -> list[dict]:
+    pool = await _get_pg_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT match_id, timestamp_sec, url FROM highlights WHERE match_id = $1 ORDER BY timestamp_sec",
+            match_id,
+        )
+    return [{"match_id": str(r["match_id"]), "timestamp_sec": r["timestamp_sec"], "url": r["url"]} for r in rows]
+
+
+@traced()
+async def get_match_page(match_id: UUID) -> dict | None:
+    """Страница матча: матч, хайлайты и четыре игрока.
+
+    Два MGET вместо шести GET: матч с хайлайтами, затем игроки (их id
+    известны только из матча). Промахи дочитываются из БД параллельно.
+    """
+    live = live_registry.registry.lookup(match_id) if live_registry.enabled else None
+    if live is not None:
+        match = _response_payload(_live_to_row(live))
+        (highlights,) = await cached_many((get_highlights_cached, match_id))
+    else:
+        match, highlights = await cached_many((get_match_cached, match_id), (get_highlights_cached, match_id))
+    if match is None:
+        return None
+    player_ids = [*match["team_a_player_ids"], *match["team_b_player_ids"]]
+    players = await cached_many(*((get_user_cached, UUID(player_id)) for player_id in player_ids))
+    return {"match": match, "players": players, "highlights": highlights}
@@ -6,6 +6,7 @@ import httpx
 
 from backend.config import get_settings
 from backend.db.models import User
+from backend.tracing import span, traced
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -20,6 +21,7 @@ async def get_telegram_ids_for_match(session: AsyncSession, match) -> list[int]:
     return [u.telegram_id for u in users if u.telegram_id is not None]
 
 
+@traced()
 async def notify_match_end(
     session: AsyncSession,
     match,
@@ -45,11 +47,14 @@ async def notify_match_end(
         f"[🎬 Хайлайты]  [📊 Аналитика 👑]"
     )
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.post(
-                url.rstrip("/") + "/notify-match-end",
-                json={"telegram_ids": telegram_ids, "text": text},
-            )
+        with span("notify.http", recipients=len(telegram_ids)) as http_span:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                r = await client.post(
+                    url.rstrip("/") + "/notify-match-end",
+                    json={"telegram_ids": telegram_ids, "text": text},
+                )
+            if http_span is not None:
+                http_span.attrs["status"] = r.status_code
             if r.status_code != 200:
                 logger.warning("Bot notify failed: %s %s", r.status_code, r.text)
     except Exception as e:
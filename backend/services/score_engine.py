@@ -0,0 +1,89 @@
+"""Event-sourced движок счёта: лог очков матча + периодические снапшоты.
+
+Эффективные (не отменённые) очки матча хранятся строкой команд ("ABBA..."),
+каждые SNAPSHOT_INTERVAL очков запоминается снапшот счёта. Счёт после любого
+очка восстанавливается от ближайшего снапшота не более чем за SNAPSHOT_INTERVAL
+шагов, поэтому undo и реконструкция не зависят от длины матча и не требуют
+перечитывать match_events.
+"""
+from typing import Iterable
+
+from backend.services.scoring_table import DEFAULT_RULES, initial_score
+from backend.services.scoring_table import apply_point as add_point
+
+SNAPSHOT_INTERVAL = 16
+
+
+def copy_score(score: dict) -> dict:
+    s = dict(score)
+    s["games_a"] = list(s["games_a"])
+    s["games_b"] = list(s["games_b"])
+    return s
+
+
+class ScoreEngine:
+    """Состояние счёта одного матча.
+
+    points    — команды эффективных очков по порядку ("A"/"B");
+    snapshots — snapshots[i] = счёт после i * SNAPSHOT_INTERVAL очков;
+    score     — текущий счёт (= state_at(len(points))).
+    """
+
+    __slots__ = ("points", "snapshots", "score")
+
+    def __init__(
+        self,
+        points: str = "",
+        snapshots: list[dict] | None = None,
+        score: dict | None = None,
+    ):
+        self.points = points
+        self.snapshots = list(snapshots) if snapshots else [initial_score()]
+        self.score = score if score is not None else self.state_at(len(points))
+
+    @classmethod
+    def from_match(cls, match) -> "ScoreEngine":
+        if not match.snapshots:
+            # Матч начат до появления движка: текущий счёт — базовый снапшот.
+            base = copy_score(match.score or initial_score())
+            return cls("", [base], match.score or base)
+        return cls(match.point_log or "", match.snapshots, match.score)
+
+    def state_at(self, n: int) -> dict:
+        """Счёт после первых n эффективных очков."""
+        idx = min(n // SNAPSHOT_INTERVAL, len(self.snapshots) - 1)
+        score = copy_score(self.snapshots[idx])
+        for team in self.points[idx * SNAPSHOT_INTERVAL:n]:
+            score = add_point(score, team)
+        return score
+
+    def apply(self, team: str) -> dict:
+        self.score = add_point(self.score, team)
+        self.points += team
+        n = len(self.points)
+        if n % SNAPSHOT_INTERVAL == 0:
+            del self.snapshots[n // SNAPSHOT_INTERVAL:]
+            self.snapshots.append(copy_score(self.score))
+        return self.score
+
+    def undo(self) -> str | None:
+        """Отменить последнее очко. Возвращает команду отменённого очка или None."""
+        if not self.points:
+            return None
+        team = self.points[-1]
+        self.points = self.points[:-1]
+        del self.snapshots[len(self.points) // SNAPSHOT_INTERVAL + 1:]
+        self.score = self.state_at(len(self.points))
+        return team
+
+    @classmethod
+    def replay(cls, events: Iterable, rules: str = DEFAULT_RULES) -> "ScoreEngine":
+        """Восстановить движок из событий match_events (отсортированных по seq)."""
+        engine = cls(snapshots=[initial_score(rules)])
+        for event in events:
+            payload = event.payload or {}
+            if event.kind == "point":
+                engine.apply(payload["team"])
+            elif event.kind == "undo" and "team" in payload:
+                engine.undo()
+        return engine
@@ -0,0 +1,253 @@
+"""Табличный автомат счёта падела + пакетный пересчёт матчей на NumPy.
+
+Розыгрыш внутри гейма — конечный автомат: состояние (очки A, очки B) из
+0/15/30/40/adv кодируется индексом a * 5 + b, а переход по выигранному очку
+заранее вычислен в таблице POINT_TABLES для каждого варианта правил
+(преимущество / золотой мяч). Геймы, сеты и тай-брейк — счётчики поверх.
+
+Варианты правил хранятся в счёте матча ключом "rules" (по умолчанию —
+"advantage": игра на больше-меньше, сет без тай-брейка).
+"""
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+POINT_VALUES = (0, 15, 30, 40, "adv")
+_POINT_INDEX = {value: i for i, value in enumerate(POINT_VALUES)}
+ADV = 4
+
+GAME_A = -1  # очко выиграло гейм для A
+GAME_B = -2  # очко выиграло гейм для B
+
+N_POINT_STATES = len(POINT_VALUES) ** 2
+
+
+@dataclass(frozen=True)
+class ScoringRules:
+    golden_point: bool = False  # при 40:40 следующее очко выигрывает гейм
+    tiebreak: bool = False  # при 6:6 — тай-брейк до 7 очков
+    games_per_set: int = 6
+    tiebreak_points: int = 7
+
+
+RULESETS = {
+    "advantage": ScoringRules(),
+    "golden": ScoringRules(golden_point=True),
+    "tiebreak": ScoringRules(tiebreak=True),
+    "golden_tiebreak": ScoringRules(golden_point=True, tiebreak=True),
+}
+DEFAULT_RULES = "advantage"
+
+
+def _build_point_table(golden_point: bool) -> tuple[tuple[int, int], ...]:
+    """table[a * 5 + b] = (следующее состояние, если очко A; если очко B)."""
+
+    def win(me: int, other: int) -> tuple[int, int] | None:
+        """Новые (me, other) или None, если гейм выигран."""
+        if me < 3:
+            return me + 1, other
+        if me == ADV or other < 3 or golden_point:
+            return None
+        if other == ADV:
+            return 3, 3  # снова «ровно»
+        return ADV, other  # 40:40 -> больше
+
+    table = []
+    for a in range(len(POINT_VALUES)):
+        for b in range(len(POINT_VALUES)):
+            to_a = win(a, b)
+            to_b = win(b, a)
+            table.append((
+                GAME_A if to_a is None else to_a[0] * 5 + to_a[1],
+                GAME_B if to_b is None else to_b[1] * 5 + to_b[0],
+            ))
+    return tuple(table)
+
+
+POINT_TABLES = {golden: _build_point_table(golden) for golden in (False, True)}
+
+
+def initial_score(rules: str = DEFAULT_RULES) -> dict:
+    score = {
+        "sets_a": 0,
+        "sets_b": 0,
+        "games_a": [0],
+        "games_b": [0],
+        "points_a": 0,
+        "points_b": 0,
+    }
+    if rules != DEFAULT_RULES:
+        score["rules"] = rules
+    return score
+
+
+def apply_point(score: dict, team: str) -> dict:
+    """Новый счёт после очка команды team ("A"/"B"). Исходный dict не меняется."""
+    if team not in ("A", "B"):
+        # Иначе очко ушло бы B, а в point_log — чужая буква, и пересчёт разойдётся со счётом
+        raise ValueError(f"Unknown team: {team!r}")
+    s = dict(score)
+    rules = RULESETS[s.get("rules", DEFAULT_RULES)]
+    ga = s["games_a"][-1]
+    gb = s["games_b"][-1]
+    in_tiebreak = s.get("tiebreak", False)
+    game_winner = None
+
+    if in_tiebreak:
+        pa = s["points_a"] + (team == "A")
+        pb = s["points_b"] + (team != "A")
+        if max(pa, pb) >= rules.tiebreak_points and abs(pa - pb) >= 2:
+            game_winner = "A" if pa > pb else "B"
+        s["points_a"], s["points_b"] = pa, pb
+    else:
+        state = _POINT_INDEX[s["points_a"]] * 5 + _POINT_INDEX[s["points_b"]]
+        nxt = POINT_TABLES[rules.golden_point][state][team != "A"]
+        if nxt == GAME_A:
+            game_winner = "A"
+        elif nxt == GAME_B:
+            game_winner = "B"
+        else:
+            s["points_a"] = POINT_VALUES[nxt // 5]
+            s["points_b"] = POINT_VALUES[nxt % 5]
+
+    if game_winner is None:
+        s["games_a"] = list(s["games_a"])
+        s["games_b"] = list(s["games_b"])
+        return s
+
+    s["points_a"] = 0
+    s["points_b"] = 0
+    s.pop("tiebreak", None)
+    if game_winner == "A":
+        ga += 1
+    else:
+        gb += 1
+    lead = ga - gb if game_winner == "A" else gb - ga
+    if in_tiebreak or (max(ga, gb) >= rules.games_per_set and lead >= 2):
+        s["sets_a" if game_winner == "A" else "sets_b"] += 1
+        s["games_a"] = [0]
+        s["games_b"] = [0]
+        return s
+    s["games_a"] = list(s["games_a"])
+    s["games_b"] = list(s["games_b"])
+    s["games_a"][-1] = ga
+    s["games_b"][-1] = gb
+    if rules.tiebreak and ga == gb == rules.games_per_set:
+        s["tiebreak"] = True
+    return s
+
+
+# --- Пакетный пересчёт ---
+
+_NP_POINT_TABLE = np.array([POINT_TABLES[False], POINT_TABLES[True]], dtype=np.int16)
+
+
+def replay_point_logs(
+    logs: Sequence[str],
+    rules: Sequence[str] | str = DEFAULT_RULES,
+) -> dict[str, np.ndarray]:
+    """Пересчитать итоговый счёт сразу для многих матчей.
+
+    logs — point_log матчей (строки "ABBA..."), rules — один вариант правил или
+    по варианту на матч. Все матчи идут по таблице синхронно, по одному очку
+    за шаг, поэтому цикл Python — по длине самого длинного матча, а не по
+    суммарному числу событий.
+
+    Возвращает массивы sets_a, sets_b, games_a, games_b, tiebreak и point_a,
+    point_b (индексы POINT_VALUES, в тай-брейке — сами очки).
+    """
+    n = len(logs)
+    if isinstance(rules, str):
+        rules = [rules] * n
+    rule_objs = [RULESETS[r] for r in rules]
+    golden = np.array([r.golden_point for r in rule_objs], dtype=np.intp)
+    tiebreak_allowed = np.array([r.tiebreak for r in rule_objs], dtype=bool)
+    games_per_set = np.array([r.games_per_set for r in rule_objs], dtype=np.int16)
+    tiebreak_points = np.array([r.tiebreak_points for r in rule_objs], dtype=np.int16)
+
+    length = max((len(log) for log in logs), default=0)
+    teams = np.full((n, length), -1, dtype=np.int8)  # 0 — очко A, 1 — очко B, -1 — матч закончился
+    for i, log in enumerate(logs):
+        teams[i, :len(log)] = np.frombuffer(log.encode("ascii"), dtype=np.uint8) == ord("B")
+
+    state = np.zeros(n, dtype=np.intp)
+    point_a = np.zeros(n, dtype=np.int16)
+    point_b = np.zeros(n, dtype=np.int16)
+    games_a = np.zeros(n, dtype=np.int16)
+    games_b = np.zeros(n, dtype=np.int16)
+    sets_a = np.zeros(n, dtype=np.int16)
+    sets_b = np.zeros(n, dtype=np.int16)
+    in_tiebreak = np.zeros(n, dtype=bool)
+
+    for step in range(length):
+        team = teams[:, step]
+        active = team >= 0
+        by_b = team == 1
+        by_a = active & ~by_b
+
+        regular = active & ~in_tiebreak
+        nxt = _NP_POINT_TABLE[golden, state, np.maximum(team, 0)]
+        game_a = regular & (nxt == GAME_A)
+        game_b = regular & (nxt == GAME_B)
+        state = np.where(regular & (nxt >= 0), nxt, state)
+
+        tb = active & in_tiebreak
+        point_a += tb & by_a
+        point_b += tb & by_b
+        tb_won = tb & (np.maximum(point_a, point_b) >= tiebreak_points) & (np.abs(point_a - point_b) >= 2)
+        game_a |= tb_won & (point_a > point_b)
+        game_b |= tb_won & (point_b > point_a)
+
+        game_won = game_a | game_b
+        games_a += game_a
+        games_b += game_b
+        state[game_won] = 0
+        point_a[game_won] = 0
+        point_b[game_won] = 0
+
+        set_a = game_a & (tb_won | ((games_a >= games_per_set) & (games_a - games_b >= 2)))
+        set_b = game_b & (tb_won | ((games_b >= games_per_set) & (games_b - games_a >= 2)))
+        sets_a += set_a
+        sets_b += set_b
+        set_won = set_a | set_b
+        games_a[set_won] = 0
+        games_b[set_won] = 0
+
+        in_tiebreak = (in_tiebreak & ~tb_won) | (
+            game_won & ~set_won & tiebreak_allowed
+            & (games_a == games_per_set) & (games_b == games_per_set)
+        )
+
+    return {
+        "sets_a": sets_a,
+        "sets_b": sets_b,
+        "games_a": games_a,
+        "games_b": games_b,
+        "point_a": np.where(in_tiebreak, point_a, state // 5),
+        "point_b": np.where(in_tiebreak, point_b, state % 5),
+        "tiebreak": in_tiebreak,
+    }
+
+
+def scores_from_replay(result: dict[str, np.ndarray], rules: Sequence[str] | str = DEFAULT_RULES) -> list[dict]:
+    """Результат replay_point_logs -> счета в формате Match.score."""
+    n = len(result["sets_a"])
+    if isinstance(rules, str):
+        rules = [rules] * n
+    scores = []
+    for i in range(n):
+        score = initial_score(rules[i])
+        score["sets_a"] = int(result["sets_a"][i])
+        score["sets_b"] = int(result["sets_b"][i])
+        score["games_a"] = [int(result["games_a"][i])]
+        score["games_b"] = [int(result["games_b"][i])]
+        if result["tiebreak"][i]:
+            score["points_a"] = int(result["point_a"][i])
+            score["points_b"] = int(result["point_b"][i])
+            score["tiebreak"] = True
+        else:
+            score["points_a"] = POINT_VALUES[result["point_a"][i]]
+            score["points_b"] = POINT_VALUES[result["point_b"][i]]
+        scores.append(score)
+    return scores
@@ -1,12 +1,20 @@
 """User CRUD. Через asyncpg (без greenlet) и через SQLAlchemy session."""
+import asyncio
+import logging
 from uuid import UUID
 
 import asyncpg
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.cache import cache, cache_key, invalidate_on_commit, telegram_tag
 from backend.db.models import User
-from backend.schemas.users import UserCreate
+from backend.config import get_settings
+from backend.db.session import USER_REGISTERED_CHANNEL, _get_pg_pool, _parse_pg_url
+from backend.schemas.users import UserCreate, UserResponse
+from backend.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 
 # --- Через asyncpg (для user-роутов, без greenlet) ---
@@ -21,6 +29,15 @@ async def get_user_by_telegram_id_pg(conn: asyncpg.Connection, telegram_id: int)
     return {k: row[k] for k in ("id", "telegram_id", "name", "phone", "photo_url", "is_pro")}
 
 
+async def get_user_by_id_pg(conn: asyncpg.Connection, user_id: UUID) -> dict | None:
+    row = await conn.fetchrow(
+        "SELECT id, telegram_id, name, phone, photo_url, is_pro FROM users WHERE id = $1",
+        user_id,
+    )
+    return dict(row) if row else None
+
+
+@traced()
 async def create_user_pg(conn: asyncpg.Connection, data: UserCreate) -> dict:
     import uuid
     from datetime import datetime
@@ -36,6 +53,9 @@ async def create_user_pg(conn: asyncpg.Connection, data: UserCreate) -> dict:
         data.phone,
         data.photo_url,
     )
+    if data.telegram_id is not None:
+        # Синхронно: сразу после регистрации mini-app запрашивает пользователя
+        await cache.invalidate_tags(telegram_tag(data.telegram_id))
     return {
         "id": uid,
         "telegram_id": data.telegram_id,
@@ -47,18 +67,76 @@ async def create_user_pg(conn: asyncpg.Connection, data: UserCreate) -> dict:
     }
 
 
+# --- Чтение через кэш: профили меняются редко (регистрация, оплата PRO) ---
+
+USER_CACHE_TTL = 600
+
+
+@traced()
+@cache_key("user", expire=USER_CACHE_TTL, tags=["user:{user_id}"])
+async def get_user_cached(user_id: UUID) -> dict | None:
+    pool = await _get_pg_pool()
+    async with pool.acquire() as conn:
+        user = await get_user_by_id_pg(conn, user_id)
+    return UserResponse(**user).model_dump(mode="json") if user else None
+
+
+# Большинство открывающих mini-app ещё не зарегистрированы: «нет такого
+# telegram_id» тоже кэшируется (negative_ttl) и сбрасывается тегом telegram:{id}
+# при регистрации — здесь, в create_user и по NOTIFY из бота.
+@traced()
+@cache_key(
+    "user_tg",
+    expire=USER_CACHE_TTL,
+    tags=["telegram:{telegram_id}"],
+    negative_ttl=get_settings().user_absent_ttl,
+)
+async def get_user_by_telegram_id_cached(telegram_id: int) -> dict | None:
+    pool = await _get_pg_pool()
+    async with pool.acquire() as conn:
+        user = await get_user_by_telegram_id_pg(conn, telegram_id)
+    return UserResponse(**user).model_dump(mode="json") if user else None
+
+
+async def registration_listener() -> None:
+    """Фоновая задача: LISTEN user_registered -> сброс негативного кэша telegram_id.
+
+    Уведомление шлёт триггер на users, поэтому видны и регистрации через бота.
+    """
+    def on_registered(conn, pid, channel, payload: str) -> None:
+        cache.invalidate_tags_soon(telegram_tag(int(payload)))
+
+    while True:
+        try:
+            conn = await asyncpg.connect(**_parse_pg_url(get_settings().database_url))
+            try:
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(USER_REGISTERED_CHANNEL, on_registered)
+                await closed.wait()
+                logger.warning("⚠️ Соединение LISTEN user_registered закрыто, переподключение")
+            finally:
+                await conn.close()
+        except Exception as e:
+            logger.error(f"❌ Ошибка подписки на регистрации: {e}")
+        await asyncio.sleep(5)
+
+
 # --- Через SQLAlchemy (для остальных роутов, требует greenlet) ---
 
+@traced()
 async def get_user(session: AsyncSession, user_id: UUID) -> User | None:
     result = await session.execute(select(User).where(User.id == user_id))
     return result.scalar_one_or_none()
 
 
+@traced()
 async def get_user_by_telegram_id(session: AsyncSession, telegram_id: int) -> User | None:
     result = await session.execute(select(User).where(User.telegram_id == telegram_id))
     return result.scalar_one_or_none()
 
 
+@traced()
 async def create_user(session: AsyncSession, data: UserCreate) -> User:
     user = User(
         telegram_id=data.telegram_id,
@@ -69,4 +147,6 @@ async def create_user(session: AsyncSession, data: UserCreate) -> User:
     session.add(user)
     await session.flush()
     await session.refresh(user)
+    if data.telegram_id is not None:
+        invalidate_on_commit(session, telegram_tag(data.telegram_id))
     return user
@@ -0,0 +1,124 @@
+"""
+Общие метрики воркеров одного хоста через mmap-файлы
+
+Каждый воркер пишет в свой файл {dir}/metrics-{pid}-{time_ns}.db — один писатель
+на файл (метка времени отличает воркер, получивший PID завершившегося),
+поэтому без блокировок и без IPC на каждый запрос: запись — это pack_into
+в отображённую память. /metrics читает все файлы каталога и суммирует значения.
+
+Формат файла: заголовок (uint32 занято байт, uint32 резерв), затем записи
+[uint32 длина ключа][ключ JSON, выровнен до 8][float64 значение].
+Файлы завершившихся воркеров не удаляются — иначе счётчики пойдут назад;
+каталог очищают перед стартом сервера.
+"""
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+_HEADER = 8
+_INITIAL_SIZE = 64 * 1024
+_DOUBLE = struct.Struct("<d")
+
+
+def _entry(key_bytes: bytes) -> tuple:
+    """(размер записи, смещение значения от начала записи)"""
+    value_at = 4 + len(key_bytes)
+    value_at += -value_at % 8
+    return value_at + 8, value_at
+
+
+class MmapMetrics:
+    """Значения метрик воркера (ключ — кортеж) в mmap-файле"""
+
+    def __init__(self, directory: str, pid: Optional[int] = None):
+        self.directory = Path(directory)
+        self._pid = pid
+        self._mm: Optional[mmap.mmap] = None
+        self._offsets: Dict[tuple, int] = {}
+        self._values: Dict[tuple, float] = {}
+        self._used = _HEADER
+        if pid is None:
+            # gunicorn --preload: модуль импортирован до fork, у ребёнка — свой файл
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._mm = None
+        self._offsets.clear()
+        self._values.clear()
+        self._used = _HEADER
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # PID переиспользуются: файл завершившегося воркера с тем же PID не трогаем
+        path = self.directory / f"metrics-{self._pid or os.getpid()}-{time.time_ns()}.db"
+        with open(path, "xb") as f:
+            f.truncate(_INITIAL_SIZE)
+        self._file = open(path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), _INITIAL_SIZE)
+        self._mm[:_HEADER] = self._used.to_bytes(4, "little") + bytes(4)
+
+    def _grow(self, needed: int):
+        size = len(self._mm)
+        while size < needed:
+            size *= 2
+        self._mm.close()
+        self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), size)
+
+    def _add_key(self, key: tuple) -> int:
+        key_bytes = json.dumps(key, ensure_ascii=False).encode()
+        size, value_at = _entry(key_bytes)
+        start = self._used
+        if start + size > len(self._mm):
+            self._grow(start + size)
+        self._mm[start:start + 4] = len(key_bytes).to_bytes(4, "little")
+        self._mm[start + 4:start + 4 + len(key_bytes)] = key_bytes
+        self._mm[start + value_at:start + size] = bytes(8)
+        # Читатель видит запись только после обновления заголовка
+        self._used = start + size
+        self._mm[0:4] = self._used.to_bytes(4, "little")
+        self._offsets[key] = start + value_at
+        self._values[key] = 0.0
+        return start + value_at
+
+    def inc(self, key: tuple, amount: float = 1.0):
+        if self._mm is None:
+            self._open()
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._add_key(key)
+        value = self._values[key] + amount
+        self._values[key] = value
+        _DOUBLE.pack_into(self._mm, offset, value)
+
+
+def read_file(path: Path) -> Dict[tuple, float]:
+    data = path.read_bytes()
+    used = min(int.from_bytes(data[:4], "little"), len(data))
+    values = {}
+    pos = _HEADER
+    while pos < used:
+        key_len = int.from_bytes(data[pos:pos + 4], "little")
+        key_bytes = data[pos + 4:pos + 4 + key_len]
+        size, value_at = _entry(key_bytes)
+        values[tuple(json.loads(key_bytes))] = _DOUBLE.unpack_from(data, pos + value_at)[0]
+        pos += size
+    return values
+
+
+def read_directory(directory: str) -> Dict[tuple, float]:
+    """Сумма значений по всем файлам воркеров"""
+    totals: Dict[tuple, float] = {}
+    for path in Path(directory).glob("metrics-*.db"):
+        try:
+            values = read_file(path)
+        except (OSError, ValueError):
+            continue
+        for key, value in values.items():
+            totals[key] = totals.get(key, 0.0) + value
+    return totals
+
@@ -0,0 +1,112 @@
+"""SSE broadcaster: one serialization per event, fan-out, slow subscribers, publish after commit."""
+from types import SimpleNamespace
+from uuid import uuid4
+
+from backend.services import broadcaster as broadcaster_module
+from backend.services.broadcaster import ScoreBroadcaster
+from backend.services.score_engine import initial_score
+
+
+def _match(match_id, status="active"):
+    return SimpleNamespace(
+        id=match_id,
+        status=status,
+        team_a_player_ids=[uuid4(), uuid4()],
+        team_b_player_ids=[uuid4(), uuid4()],
+        score=initial_score(),
+    )
+
+
+async def test_publish_fans_out_same_message():
+    broadcaster = ScoreBroadcaster()
+    match_id = uuid4()
+    queues = [broadcaster.subscribe(match_id) for _ in range(3)]
+    broadcaster.publish(_match(match_id))
+    messages = [q.get_nowait() for q in queues]
+    assert messages[0].startswith("event: score\n")
+    assert all(m is messages[0] for m in messages)
+    assert broadcaster.last_message(match_id) is messages[0]
+
+
+async def test_slow_subscriber_keeps_latest_and_end_clears_last():
+    broadcaster = ScoreBroadcaster(queue_size=1)
+    match_id = uuid4()
+    queue = broadcaster.subscribe(match_id)
+    broadcaster.publish(_match(match_id))
+    broadcaster.publish(_match(match_id, status="finished"))
+    assert queue.get_nowait().startswith("event: end\n")
+    assert broadcaster.last_message(match_id) is None
+    broadcaster.unsubscribe(match_id, queue)
+    assert broadcaster.subscriber_count(match_id) == 0
+
+
+async def test_last_message_kept_only_while_subscribed():
+    broadcaster = ScoreBroadcaster()
+    match_id = uuid4()
+    broadcaster.publish(_match(match_id))
+    assert broadcaster.last_message(match_id) is None
+    queue = broadcaster.subscribe(match_id)
+    broadcaster.publish(_match(match_id))
+    assert broadcaster.last_message(match_id) is not None
+    broadcaster.unsubscribe(match_id, queue)
+    assert broadcaster.last_message(match_id) is None
+
+
+async def test_publish_on_commit_waits_for_commit(monkeypatch):
+    from sqlalchemy.orm import Session
+
+    broadcaster = ScoreBroadcaster()
+    monkeypatch.setattr(broadcaster_module, "broadcaster", broadcaster)
+    match_id = uuid4()
+    queue = broadcaster.subscribe(match_id)
+    session = Session()
+
+    broadcaster_module.publish_on_commit(session, _match(match_id))
+    broadcaster_module._forget_after_rollback(session)
+    broadcaster_module._publish_after_commit(session)
+    assert queue.empty()
+
+    broadcaster_module.publish_on_commit(session, _match(match_id))
+    assert queue.empty()
+    broadcaster_module._publish_after_commit(session)
+    assert queue.get_nowait().startswith("event: score\n")
+
+
+async def test_stream_gets_score_published_while_reading_initial_state(monkeypatch):
+    import pytest
+    from fastapi import HTTPException
+
+    from backend.routers import matches
+    from backend.services import match_service
+
+    broadcaster = ScoreBroadcaster()
+    monkeypatch.setattr(matches, "broadcaster", broadcaster)
+    match_id = uuid4()
+    stale = _match(match_id)
+
+    async def get_live_match(session, requested_id):
+        if requested_id != match_id:
+            return None
+        # Очко записано и разослано, пока зритель читает счёт из БД
+        fresh = _match(match_id)
+        fresh.score = {**fresh.score, "points_a": 15}
+        broadcaster.publish(fresh)
+        return stale
+
+    class _Session:
+        async def commit(self):
+            pass
+
+    monkeypatch.setattr(match_service, "get_live_match", get_live_match)
+    response = await matches.stream_match(match_id, session=_Session())
+    body = response.body_iterator
+    assert '"points_a": 0' in await body.__anext__()
+    assert '"points_a": 15' in await body.__anext__()
+    broadcaster.publish(_match(match_id, status="finished"))
+    assert (await body.__anext__()).startswith("event: end")
+    await body.aclose()
+    assert broadcaster.subscriber_count(match_id) == 0
+
+    with pytest.raises(HTTPException):
+        await matches.stream_match(uuid4(), session=_Session())
+    assert broadcaster._subscribers == {}
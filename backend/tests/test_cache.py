@@ -0,0 +1,405 @@
+"""Cache tests: local LRU tier, cache_key decorator, tag invalidation of cached match reads."""
+import time
+
+import pytest
+
+from backend.cache import _GENERATION_SLOTS, _MISSING, LocalCache, RedisCache
+
+
+def test_lru_evicts_least_recently_used():
+    local = LocalCache(maxsize=2)
+    local.set("a", 1)
+    local.set("b", 2)
+    assert local.get("a") == 1  # "a" становится свежим
+    local.set("c", 3)
+    assert local.get("b") is _MISSING
+    assert local.get("a") == 1 and local.get("c") == 3
+
+
+def test_ttl_is_capped_by_local_ttl(monkeypatch):
+    local = LocalCache(ttl=10)
+    now = time.monotonic()
+    local.set("a", 1, ttl=3600)
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert local.get("a") is _MISSING
+    assert len(local) == 0
+
+
+def test_delete_pattern():
+    local = LocalCache()
+    for key in ("match:1", "match:2", "user:1"):
+        local.set(key, key)
+    local.delete_pattern("match:*")
+    assert local.get("match:1") is _MISSING
+    assert local.get("user:1") == "user:1"
+
+
+def test_tags_are_invalidated_only_after_commit(monkeypatch):
+    from sqlalchemy.orm import Session
+
+    from backend import cache as cache_module
+
+    invalidated = []
+    monkeypatch.setattr(cache_module.cache, "invalidate_tags_soon", lambda *tags: invalidated.append(set(tags)))
+    session = Session()
+    cache_module.invalidate_on_commit(session, cache_module.match_tag(1), cache_module.court_tag("c1"))
+    cache_module._forget_tags_after_rollback(session)
+    cache_module._invalidate_after_commit(session)
+    assert invalidated == []
+
+    cache_module.invalidate_on_commit(session, cache_module.match_tag(1))
+    cache_module._invalidate_after_commit(session)
+    assert invalidated == [{"match:1"}]
+
+
+class _MemoryCache:
+    """Redis в памяти; shared — «Redis» другого воркера (поколения в процессе свои)"""
+
+    def __init__(self, shared=None):
+        self.data = shared.data if shared else {}
+        self.tags = shared.tags if shared else {}
+        self.versions = shared.versions if shared else {}
+        self.invalidated = []
+        self._generations = [0] * _GENERATION_SLOTS
+
+    tag_generations = RedisCache.tag_generations
+    _bump_generations = RedisCache._bump_generations
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def tag_versions(self, tags):
+        return tuple(self.versions.get(tag, 0) for tag in tags)
+
+    async def set(self, key, value, expire=3600, tags=(), versions=None):
+        if versions and versions != await self.tag_versions(tags):
+            return False
+        self.data[key] = value
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(key)
+        return True
+
+    async def invalidate_tags(self, *tags):
+        self._bump_generations(tags)
+        self.invalidated.append(set(tags))
+        for tag in tags:
+            self.versions[tag] = self.versions.get(tag, 0) + 1
+            for key in self.tags.pop(tag, ()):
+                self.data.pop(key, None)
+
+
+async def test_cache_key_single_flight_and_stable_keys(monkeypatch):
+    import asyncio
+
+    from backend import cache as cache_module
+
+    monkeypatch.setattr(cache_module, "cache", _MemoryCache())
+    calls = []
+
+    @cache_module.cache_key("match", key_params=["match_id"])
+    async def load(session, match_id):
+        calls.append(match_id)
+        await asyncio.sleep(0.01)
+        return {"id": match_id}
+
+    results = await asyncio.gather(*(load(object(), 7) for _ in range(10)))
+    assert results == [{"id": 7}] * 10
+    assert calls == [7]
+    # Ключ не зависит от сессии и от способа передачи аргументов
+    assert load.cache_key_for(object(), 7) == load.cache_key_for(session=None, match_id=7)
+
+
+async def test_cache_key_serves_stale_while_refreshing(monkeypatch):
+    import asyncio
+
+    from backend import cache as cache_module
+
+    memory = _MemoryCache()
+    monkeypatch.setattr(cache_module, "cache", memory)
+    version = [1]
+
+    @cache_module.cache_key("user", expire=60, stale_ttl=60)
+    async def load(user_id):
+        return {"v": version[0]}
+
+    assert await load(1) == {"v": 1}
+    key = load.cache_key_for(1)
+    memory.data[key]["exp"] = time.time() - 1  # запись устарела
+    version[0] = 2
+    assert await load(1) == {"v": 1}  # отдаём устаревшее, обновление в фоне
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert await load(1) == {"v": 2}
+
+
+async def test_cache_key_remembers_absent_only_with_negative_ttl(monkeypatch):
+    from backend import cache as cache_module
+
+    monkeypatch.setattr(cache_module, "cache", _MemoryCache())
+    calls = []
+
+    @cache_module.cache_key("user_tg", negative_ttl=60)
+    async def lookup(telegram_id):
+        calls.append(telegram_id)
+        return None
+
+    @cache_module.cache_key("user")
+    async def plain(user_id):
+        calls.append(user_id)
+        return None
+
+    assert await lookup(1) is None and await lookup(1) is None
+    assert await plain(2) is None and await plain(2) is None
+    assert calls == [1, 2, 2]
+
+
+class _FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+        self.reads = 0
+        self.writes = []
+        self.on_read = None
+
+    async def fetchrow(self, sql, match_id):
+        self.reads += 1
+        if self.on_read:
+            await self.on_read()
+        return self.rows.get(match_id)
+
+    async def executemany(self, sql, args):
+        self.writes.append(args)
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return self.conn
+
+
+def _match_row(match_id, points_a=0):
+    from datetime import datetime, timezone
+    from uuid import uuid4
+
+    return {
+        "id": match_id,
+        "court_id": "court-1",
+        "started_at": datetime.now(timezone.utc),
+        "ended_at": None,
+        "status": "active",
+        "team_a_player_ids": [uuid4()],
+        "team_b_player_ids": [uuid4()],
+        "score": {"points_a": points_a},
+    }
+
+
+@pytest.fixture
+def cached_matches(monkeypatch):
+    from uuid import uuid4
+
+    from backend import cache as cache_module
+    from backend.services import match_service
+
+    memory = _MemoryCache()
+    match_id = uuid4()
+    conn = _FakeConn({match_id: _match_row(match_id)})
+
+    async def get_pool():
+        return _FakePool(conn)
+
+    monkeypatch.setattr(cache_module, "cache", memory)
+    monkeypatch.setattr(match_service, "_get_pg_pool", get_pool)
+    return match_service, memory, conn, match_id
+
+
+async def test_match_read_is_cached_until_tag_invalidated(cached_matches):
+    from backend.cache import match_tag
+
+    match_service, memory, conn, match_id = cached_matches
+    assert (await match_service.get_match_cached(match_id))["score"] == {"points_a": 0}
+    await match_service.get_match_cached(match_id)
+    assert conn.reads == 1
+
+    conn.rows[match_id] = _match_row(match_id, points_a=15)
+    await memory.invalidate_tags(match_tag(match_id))
+    assert (await match_service.get_match_cached(match_id))["score"] == {"points_a": 15}
+    assert conn.reads == 2
+
+
+async def test_read_racing_invalidation_is_not_cached(cached_matches):
+    from backend.cache import match_tag
+
+    match_service, memory, conn, match_id = cached_matches
+
+    async def commit_during_read():
+        # Читатель уже получил старую строку; запись коммитится и сбрасывает тег
+        conn.on_read = None
+        await memory.invalidate_tags(match_tag(match_id))
+
+    conn.on_read = commit_during_read
+    await match_service.get_match_cached(match_id)
+    assert memory.data == {}
+    await match_service.get_match_cached(match_id)
+    assert conn.reads == 2 and len(memory.data) == 1
+
+
+async def test_read_racing_invalidation_in_another_worker_is_not_cached(cached_matches):
+    from backend.cache import match_tag
+
+    match_service, memory, conn, match_id = cached_matches
+    other_worker = _MemoryCache(shared=memory)
+
+    async def commit_in_other_worker():
+        # Сообщение pub/sub до этого воркера ещё не дошло: его поколения в памяти прежние
+        conn.on_read = None
+        await other_worker.invalidate_tags(match_tag(match_id))
+
+    conn.on_read = commit_in_other_worker
+    await match_service.get_match_cached(match_id)
+    assert memory.tag_generations([match_tag(match_id)]) == (0,)
+    assert memory.data == {}
+
+
+async def test_registry_flush_invalidates_flushed_matches(monkeypatch):
+    from types import SimpleNamespace
+    from uuid import uuid4
+
+    from backend.cache import court_tag, match_tag
+    from backend.services import live_registry
+    from backend.services.score_engine import initial_score
+
+    memory = _MemoryCache()
+    conn = _FakeConn({})
+
+    async def get_pool():
+        return _FakePool(conn)
+
+    monkeypatch.setattr(live_registry, "cache", memory)
+    monkeypatch.setattr(live_registry, "_get_pg_pool", get_pool)
+    registry = live_registry.MatchRegistry(flush_interval=3600)
+    row = {**_match_row(uuid4()), "score": initial_score(), "point_log": "", "snapshots": [initial_score()], "last_seq": 0}
+    registry.register(SimpleNamespace(**row))
+    await registry.add_point(row["id"], "A")
+    registry._task.cancel()
+
+    assert await registry.flush() == 1
+    assert memory.invalidated == [{match_tag(row["id"]), court_tag("court-1")}]
+    assert await registry.flush() == 0
+    assert len(memory.invalidated) == 1
+
+
+class _FakeRedis:
+    """Хранилище Redis в памяти: SETEX через pipeline, MGET с подсчётом обращений."""
+
+    def __init__(self):
+        self.store = {}
+        self.mget_calls = 0
+        self.ops = []
+
+    def pipeline(self, transaction=False):
+        self.ops = []
+        return self
+
+    def setex(self, key, expire, payload):
+        self.ops.append(lambda: self.store.__setitem__(key, payload))
+
+    def sadd(self, *args):
+        pass
+
+    def expire(self, *args, **kwargs):
+        pass
+
+    def publish(self, *args):
+        pass
+
+    async def execute(self):
+        for op in self.ops:
+            op()
+        return []
+
+    async def mget(self, keys):
+        self.mget_calls += 1
+        return [self.store.get(key) for key in keys]
+
+
+async def test_get_many_round_trip_uses_one_mget():
+    redis_cache = RedisCache()
+    redis_cache.redis = _FakeRedis()
+    await redis_cache.set("a", {"v": 1})
+    await redis_cache.set("b", [1, 2, 3])
+    redis_cache.local.clear()
+
+    assert await redis_cache.get_many(["a", "b", "missing", "a"]) == {"a": {"v": 1}, "b": [1, 2, 3]}
+    assert redis_cache.redis.mget_calls == 1
+    # Найденные попали в локальный уровень: повтор без Redis
+    assert await redis_cache.get_many(["a", "b"]) == {"a": {"v": 1}, "b": [1, 2, 3]}
+    assert redis_cache.redis.mget_calls == 1
+
+
+@pytest.fixture
+def batched_memory(monkeypatch):
+    from backend import cache as cache_module
+
+    memory = _MemoryCache()
+    memory.batches, memory.gets, memory.set_batches = [], [], []
+
+    async def get_many(keys):
+        memory.batches.append(list(keys))
+        return {key: memory.data[key] for key in keys if key in memory.data}
+
+    async def get(key):
+        memory.gets.append(key)
+        return memory.data.get(key)
+
+    async def set_many(entries):
+        entries = list(entries)
+        memory.set_batches.append([entry[0] for entry in entries])
+        return sum([await memory.set(*entry) for entry in entries])
+
+    memory.get_many, memory.get, memory.set_many = get_many, get, set_many
+    monkeypatch.setattr(cache_module, "cache", memory)
+    return cache_module, memory
+
+
+async def test_cached_many_reads_hits_in_one_call_and_loads_misses(batched_memory):
+    cache_module, memory = batched_memory
+    calls = []
+
+    @cache_module.cache_key("user", tags=["user:{user_id}"])
+    async def load_user(user_id):
+        calls.append(user_id)
+        return {"id": user_id}
+
+    await load_user(1)
+    calls.clear()
+    memory.gets.clear()
+    assert await cache_module.cached_many((load_user, 1), (load_user, 2), (load_user, 3)) == [
+        {"id": 1}, {"id": 2}, {"id": 3},
+    ]
+    # Промахи не ходят в кэш второй раз и записываются одной пачкой
+    assert len(memory.batches) == 1 and memory.gets == [] and calls == [2, 3]
+    assert memory.set_batches == [[load_user.cache_key_for(2), load_user.cache_key_for(3)]]
+    assert memory.tags["user:3"] == {load_user.cache_key_for(3)}
+
+
+async def test_cached_many_skips_write_back_for_invalidated_tags(batched_memory):
+    cache_module, memory = batched_memory
+
+    @cache_module.cache_key("user", tags=["user:{user_id}"])
+    async def load_user(user_id):
+        if user_id == 2:
+            await memory.invalidate_tags("user:2")
+        return {"id": user_id}
+
+    assert await cache_module.cached_many((load_user, 1), (load_user, 2)) == [{"id": 1}, {"id": 2}]
+    assert set(memory.data) == {load_user.cache_key_for(1)}
@@ -0,0 +1,29 @@
+"""Cache value codec tests: formats, compression threshold, legacy values."""
+import json
+import uuid
+
+import pytest
+
+from backend.cache_codec import CacheCodec
+
+
+@pytest.mark.parametrize("serializer", ["json", "orjson"])
+def test_round_trip(serializer):
+    codec = CacheCodec(serializer)
+    value = {"id": str(uuid.uuid4()), "score": {"games_a": [6, 3]}, "is_pro": True}
+    assert codec.loads(codec.dumps(value)) == value
+
+
+def test_compresses_only_large_values():
+    codec = CacheCodec("json", "zlib", min_compress_size=100)
+    small = {"a": 1}
+    large = {"events": ["point A"] * 200}
+    assert codec.dumps(small)[1:] == json.dumps(small).encode()
+    assert len(codec.dumps(large)) < len(json.dumps(large))
+    assert codec.loads(codec.dumps(large)) == large
+
+
+def test_reads_other_formats_and_legacy_json():
+    written = CacheCodec("orjson", "zlib", min_compress_size=0).dumps({"a": [1, 2]})
+    assert CacheCodec("json").loads(written) == {"a": [1, 2]}
+    assert CacheCodec("orjson").loads(b'{"a": 1}') == {"a": 1}
@@ -0,0 +1,85 @@
+"""Court WebSocket channel: validation, per-match dedupe, errors as acks."""
+import json
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import matches
+from backend.services.match_service import MatchWriteConflict
+
+MATCH_1 = uuid4()
+MATCH_2 = uuid4()
+OTHER_COURT_MATCH = uuid4()
+
+
+@pytest.fixture
+def ws(monkeypatch):
+    courts = {MATCH_1: "court-1", MATCH_2: "court-1", OTHER_COURT_MATCH: "court-2"}
+    calls = []
+
+    async def match_court(match_id):
+        return courts.get(match_id)
+
+    async def run_command(command):
+        calls.append(command)
+        if command.type == "undo":
+            raise MatchWriteConflict("busy")
+        return {"id": str(command.match_id), "points": len(calls)}, None
+
+    monkeypatch.setattr(matches, "_match_court", match_court)
+    monkeypatch.setattr(matches, "_run_command", run_command)
+    monkeypatch.setattr(matches, "_match_seqs", matches.OrderedDict())
+    app = FastAPI()
+    app.include_router(matches.router)
+    with TestClient(app).websocket_connect("/matches/court/court-1/ws") as socket:
+        assert socket.receive_json() == {"type": "hello", "last_seq": {}}
+        yield socket, calls
+
+
+def _send(socket, payload):
+    socket.send_text(payload if isinstance(payload, str) else json.dumps(payload))
+    return socket.receive_json()
+
+
+def _point(match_id, seq, team="A"):
+    return {"seq": seq, "type": "point", "match_id": str(match_id), "team": team}
+
+
+def test_bad_input_gets_error_ack_and_socket_stays_open(ws):
+    socket, calls = ws
+    assert _send(socket, "{not json")["ok"] is False
+    assert _send(socket, "[1, 2]")["ok"] is False
+    assert _send(socket, {"seq": "x", "type": "point", "match_id": str(MATCH_1), "team": "A"})["ok"] is False
+    bad_team = _send(socket, _point(MATCH_1, 1, team="Z"))
+    assert bad_team == {"type": "ack", "seq": 1, "ok": False, "error": bad_team["error"]}
+    assert _send(socket, _point(OTHER_COURT_MATCH, 1))["error"] == "Match belongs to another court"
+    assert _send(socket, _point(uuid4(), 1))["error"] == "Match not found"
+    assert calls == []
+    assert _send(socket, _point(MATCH_1, 1))["ok"] is True
+
+
+def test_duplicate_seq_returns_previous_ack(ws):
+    socket, calls = ws
+    first = _send(socket, _point(MATCH_1, 1))
+    assert _send(socket, _point(MATCH_1, 1)) == first
+    assert _send(socket, _point(MATCH_1, 1, team="B")) == first
+    assert len(calls) == 1
+
+
+def test_seq_restarts_for_new_match(ws):
+    socket, calls = ws
+    for seq in (1, 2, 3):
+        _send(socket, _point(MATCH_1, seq))
+    ack = _send(socket, _point(MATCH_2, 1))
+    assert ack["ok"] is True and "duplicate" not in ack
+    assert len(calls) == 4
+
+
+def test_conflict_is_not_recorded_as_applied(ws):
+    socket, calls = ws
+    undo = {"seq": 1, "type": "undo", "match_id": str(MATCH_1)}
+    assert _send(socket, undo)["ok"] is False
+    assert _send(socket, _point(MATCH_1, 1))["ok"] is True
+    assert len(calls) == 2
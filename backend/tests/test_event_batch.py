@@ -0,0 +1,152 @@
+"""Offline event batch: idempotent re-send, all-or-nothing batch, conflict as 409 (no DB)."""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm.exc import StaleDataError
+
+from backend.db.session import get_session
+from backend.main import match_conflict_handler
+from backend.routers import matches
+from backend.services import match_service
+from backend.services.match_service import MatchWriteConflict
+from backend.services.score_engine import initial_score
+
+
+class _FakeSession:
+    """Матч из «БД» копируется при чтении и сохраняется только при commit."""
+
+    def __init__(self, stored: dict):
+        self.stored = stored
+        self.loaded = None
+        self.info = {}
+        self.added = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.flush_error = None
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def flush(self):
+        if self.flush_error is not None:
+            raise self.flush_error
+
+    async def get_match(self, match_id):
+        if match_id != self.stored["id"]:
+            return None
+        self.loaded = SimpleNamespace(**self.stored)
+        return self.loaded
+
+    async def commit(self):
+        self.commits += 1
+        if self.loaded is not None:
+            self.stored.update(vars(self.loaded))
+
+    async def rollback(self):
+        self.rollbacks += 1
+        self.added.clear()
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    match = dict(
+        id=uuid4(),
+        court_id="court-1",
+        started_at=datetime.now(timezone.utc),
+        ended_at=None,
+        status="active",
+        team_a_player_ids=[uuid4(), uuid4()],
+        team_b_player_ids=[uuid4(), uuid4()],
+        score=initial_score(),
+        point_log="",
+        snapshots=[initial_score()],
+        last_seq=0,
+        last_client_seq=0,
+    )
+    session = _FakeSession(match)
+    monkeypatch.setattr(match_service, "get_match", lambda _session, match_id: session.get_match(match_id))
+    app = FastAPI()
+    app.include_router(matches.router)
+    app.add_exception_handler(MatchWriteConflict, match_conflict_handler)
+    app.dependency_overrides[get_session] = lambda: session
+    client = TestClient(app, raise_server_exceptions=False)
+
+    def post(*events):
+        return client.post(f"/matches/{match['id']}/events:batch", json={"events": list(events)})
+
+    return post, match, session
+
+
+def _point(seq, team="A"):
+    return {"seq": seq, "kind": "point", "team": team}
+
+
+def test_resent_events_are_skipped(batch):
+    post, match, session = batch
+    first = post(_point(1), _point(2), _point(3, "B"))
+    assert first.status_code == 200
+    assert (first.json()["applied"], first.json()["skipped"]) == (3, 0)
+    score = first.json()["match"]["score"]
+
+    again = post(_point(1), _point(2), _point(3, "B"))
+    assert (again.json()["applied"], again.json()["skipped"]) == (0, 3)
+    assert again.json()["match"]["score"] == score
+
+    overlap = post(_point(3, "B"), _point(4))
+    assert (overlap.json()["applied"], overlap.json()["skipped"]) == (1, 1)
+    assert match["last_client_seq"] == 4 and match["point_log"] == "AABA"
+    assert session.commits == 3
+
+
+def test_bad_event_mid_batch_rejects_whole_batch(batch):
+    post, match, session = batch
+    response = post(_point(1), {"seq": 2, "kind": "point", "team": "Z"}, _point(3))
+    assert response.status_code == 422
+    assert match["last_client_seq"] == 0 and match["point_log"] == ""
+    assert session.added == [] and session.commits == 0
+
+
+def test_failed_write_mid_batch_is_not_committed(batch):
+    post, match, session = batch
+    session.flush_error = RuntimeError("insert failed")
+    response = post(_point(1), _point(2))
+    assert response.status_code == 500
+    assert session.commits == 0
+    assert match["last_client_seq"] == 0 and match["point_log"] == ""
+
+
+def test_version_conflict_returns_409(batch, monkeypatch):
+    post, match, session = batch
+    backoffs = []
+
+    async def backoff(attempt):
+        backoffs.append(attempt)
+
+    monkeypatch.setattr(match_service, "_conflict_backoff", backoff)
+    session.flush_error = StaleDataError("version mismatch")
+    response = post(_point(1))
+    assert response.status_code == 409
+    assert backoffs == list(range(match_service._CONFLICT_RETRIES))
+    assert session.rollbacks == match_service._CONFLICT_RETRIES
+    assert session.commits == 0
+    assert match["last_client_seq"] == 0
+
+
+async def test_conflict_backoff_is_jittered_and_grows(monkeypatch):
+    import asyncio
+
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    monkeypatch.setattr(match_service.random, "uniform", lambda low, high: high)
+    for attempt in range(match_service._CONFLICT_RETRIES):
+        await match_service._conflict_backoff(attempt)
+    base = match_service._CONFLICT_BACKOFF
+    assert delays == [base * 2 ** attempt for attempt in range(match_service._CONFLICT_RETRIES - 1)]
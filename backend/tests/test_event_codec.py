@@ -0,0 +1,59 @@
+"""Event log codec tests: round trip, size, legacy logs."""
+import random
+
+import pytest
+
+from backend.services.event_codec import (
+    DecodedEvent,
+    UnsupportedEventLog,
+    decode_events,
+    encode_events,
+)
+from backend.services.score_engine import ScoreEngine
+
+
+def _match_log(n_points: int, seed: int = 1) -> list[DecodedEvent]:
+    rnd = random.Random(seed)
+    events = [DecodedEvent(1, "start", {})]
+    effective = []
+
+    def add(kind, payload):
+        events.append(DecodedEvent(len(events) + 1, kind, payload))
+
+    for _ in range(n_points):
+        team = rnd.choice("AB")
+        effective.append(team)
+        add("point", {"team": team})
+        roll = rnd.random()
+        if roll < 0.05:
+            add("undo", {"team": effective.pop()})
+        elif roll < 0.08:
+            add("highlight", {"timestamp_sec": rnd.uniform(0, 5400)})
+        elif roll < 0.1:
+            add("side_change", {})
+    add("end", {})
+    return events
+
+
+def test_round_trip_reproduces_sequence():
+    events = _match_log(300)
+    packed = encode_events(events)
+    assert decode_events(packed) == events
+    assert ScoreEngine.replay(decode_events(packed)).score == ScoreEngine.replay(events).score
+
+
+def test_points_take_one_bit():
+    events = _match_log(300)
+    # ~300 бит очков + несколько байт на каждый маркер
+    assert len(encode_events(events)) < 300 // 8 + 10 * sum(e.kind != "point" for e in events)
+
+
+def test_undo_on_empty_log_has_no_team():
+    events = [DecodedEvent(1, "start", {}), DecodedEvent(2, "undo", {}), DecodedEvent(3, "end", {})]
+    assert decode_events(encode_events(events)) == events
+
+
+def test_legacy_undo_is_rejected():
+    events = [DecodedEvent(1, "point", {"team": "A"}), DecodedEvent(2, "undo", {"event_id": "x"})]
+    with pytest.raises(UnsupportedEventLog):
+        encode_events(events)
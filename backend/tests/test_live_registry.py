@@ -0,0 +1,169 @@
+"""Live match registry: in-memory mutations and write-behind queue (no DB)."""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+import pytest
+
+from backend.services.live_registry import MatchRegistry
+from backend.services.score_engine import initial_score
+
+
+def _match():
+    return SimpleNamespace(
+        id=uuid4(),
+        court_id="court-1",
+        started_at=datetime.now(timezone.utc),
+        ended_at=None,
+        status="active",
+        team_a_player_ids=[uuid4(), uuid4()],
+        team_b_player_ids=[uuid4(), uuid4()],
+        score=initial_score(),
+        point_log="",
+        snapshots=[initial_score()],
+        last_seq=1,
+    )
+
+
+async def test_mutations_are_queued_with_sequence_numbers():
+    registry = MatchRegistry(flush_interval=3600)
+    match = _match()
+    registry.register(match)
+
+    await registry.add_point(match.id, "A")
+    await registry.add_point(match.id, "A")
+    await registry.undo_point(match.id)
+    await registry.add_highlight(match.id, 12.5)
+    live = await registry.side_change(match.id)
+    registry._task.cancel()
+
+    assert live.score["points_a"] == 15
+    assert live.team_a_player_ids == match.team_b_player_ids
+    assert [(e[2], e[3]) for e in registry._events] == [
+        (2, "point"),
+        (3, "point"),
+        (4, "undo"),
+        (5, "highlight"),
+        (6, "side_change"),
+    ]
+    assert len(registry._highlights) == 1
+    assert registry._dirty == {match.id}
+    assert live.row()[2] == "A"
+
+
+class _FailingConn:
+    """asyncpg-соединение, которое падает на любой записи матча из failing."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.written = []
+        self.on_write = None
+
+    async def executemany(self, sql, rows):
+        if self.on_write is not None:
+            await self.on_write()
+        # UPDATE matches: id первым; события и хайлайты: match_id вторым
+        if any(isinstance(value, UUID) and value in self.failing for row in rows for value in row[:2]):
+            raise RuntimeError("constraint violation")
+        self.written.extend(rows)
+
+    def transaction(self):
+        return self
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    from backend.services import live_registry
+
+    conn = _FailingConn()
+
+    async def get_pool():
+        return conn
+
+    async def invalidate_tags(*tags):
+        return 0
+
+    monkeypatch.setattr(live_registry, "_get_pg_pool", get_pool)
+    monkeypatch.setattr(live_registry.cache, "invalidate_tags", invalidate_tags)
+    return conn
+
+
+async def test_failing_match_is_isolated_and_dropped_after_max_attempts(fake_db):
+    good, bad = _match(), _match()
+    conn = fake_db
+    conn.failing.add(bad.id)
+    registry = MatchRegistry(flush_interval=3600, max_attempts=3)
+    registry.register(good)
+    registry.register(bad)
+    await registry.add_point(good.id, "A")
+    await registry.add_point(bad.id, "B")
+    registry._task.cancel()
+
+    with pytest.raises(RuntimeError):
+        await registry.flush()
+    written = {value for row in conn.written for value in row[:2] if isinstance(value, UUID)}
+    assert good.id in written and bad.id not in written
+    assert {e[1] for e in registry._events} == {bad.id}
+    assert registry.lookup(bad.id) is not None
+
+    # Сбойный матч не мешает завершать здоровые
+    await registry.add_point(good.id, "A")
+    await registry.evict(good.id)
+    assert registry.lookup(good.id) is None
+    with pytest.raises(RuntimeError):
+        await registry.evict(bad.id)
+    assert registry.lookup(bad.id) is None  # третья неудача — матч отброшен
+    assert registry._events == [] and registry._dirty == set()
+    assert registry.lookup(bad.id) is None
+    assert await registry.flush() == 0
+
+
+async def test_flushed_row_matches_flushed_events(fake_db):
+    match, bad = _match(), _match()
+    fake_db.failing.add(bad.id)
+    registry = MatchRegistry(flush_interval=3600)
+    registry.register(match)
+    registry.register(bad)
+    await registry.add_point(match.id, "A")
+    await registry.add_point(bad.id, "A")
+    registry._task.cancel()
+
+    async def point_during_write():
+        # Очко приходит, пока пачка пишется и откатывается до записи по одному матчу
+        fake_db.on_write = None
+        await registry.add_point(match.id, "B")
+
+    fake_db.on_write = point_during_write
+    await registry.flush(match.id)
+    match_row = next(row for row in fake_db.written if row[0] == match.id)
+    written_seqs = [row[2] for row in fake_db.written if row[1] == match.id]
+    assert match_row[4] == max(written_seqs) == 2
+    assert [(e[1], e[2]) for e in registry._events if e[1] == match.id] == [(match.id, 3)]
+
+
+def test_new_match_is_registered_only_after_commit(monkeypatch):
+    from sqlalchemy.orm import Session
+
+    from backend.services import live_registry
+
+    registry = MatchRegistry(flush_interval=3600)
+    monkeypatch.setattr(live_registry, "registry", registry)
+    session = Session()
+    rolled_back, committed = _match(), _match()
+
+    live_registry.register_on_commit(session, rolled_back)
+    live_registry._forget_after_rollback(session)
+    live_registry.register_on_commit(session, committed)
+    assert registry.lookup(committed.id) is None
+    live_registry._register_after_commit(session)
+    assert registry.lookup(committed.id) is not None
+    assert registry.lookup(rolled_back.id) is None
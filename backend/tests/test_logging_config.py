@@ -0,0 +1,71 @@
+"""Logging pipeline tests: JSON formatter and non-blocking queue handler."""
+import json
+import logging
+import queue
+import sys
+
+from backend.logging_config import JsonFormatter, NonBlockingQueueHandler
+
+
+def _record(msg, *args, **extra):
+    record = logging.makeLogRecord({"name": "backend.access", "levelno": logging.INFO,
+                                    "levelname": "INFO", "msg": msg, "args": args})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(_record("%s done", "GET", route="/matches/{match_id}", status=200))
+    data = json.loads(line)
+    assert data["msg"] == "GET done"
+    assert data["logger"] == "backend.access"
+    assert data["route"] == "/matches/{match_id}" and data["status"] == 200
+    assert "args" not in data and "levelno" not in data
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record("first %d", 1))
+    handler.handle(_record("second"))
+    assert handler.dropped == 1
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "first 1" and queued.args is None
+
+
+def test_prepare_leaves_callers_record_untouched():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = _record("%s failed", "GET", exc_info=sys.exc_info())
+    handler.handle(record)
+    queued = handler.queue.get_nowait()
+    assert queued is not record
+    assert queued.msg == "GET failed" and queued.exc_info is None and "ValueError" in queued.exc_text
+    assert record.msg == "%s failed" and record.args == ("GET",) and record.exc_info is not None
+
+
+def test_dropped_records_are_reported_once_queue_has_room():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for i in range(4):
+        handler.handle(_record("line %d", i))
+    assert handler.dropped == 2
+    handler.queue.get_nowait()
+    handler.queue.get_nowait()
+
+    handler.handle(_record("after"))
+    assert handler.queue.get_nowait().msg == "after"
+    warning = handler.queue.get_nowait()
+    assert warning.levelno == logging.WARNING and warning.dropped == 2
+
+    handler.handle(_record("quiet"))
+    assert handler.queue.get_nowait().msg == "quiet"
+    assert handler.queue.empty()
+
+
+def test_dropped_records_exported_to_prometheus(monkeypatch):
+    from backend import monitoring
+
+    monkeypatch.setattr(monitoring, "dropped_records", lambda: 7)
+    text = monitoring.render_prometheus(monitoring.PerformanceMetrics())
+    assert "padelsense_log_records_dropped_total 7" in text
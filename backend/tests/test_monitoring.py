@@ -0,0 +1,269 @@
+"""Monitoring tests: latency histograms, Prometheus exposition and the ASGI middleware."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend import monitoring
+from backend.monitoring import Histogram, PerformanceMetrics, render_prometheus
+
+
+def test_histogram_quantiles_follow_buckets():
+    h = Histogram()
+    for _ in range(95):
+        h.observe(0.002)
+    for _ in range(5):
+        h.observe(0.5)
+    assert 0.001 <= h.quantile(0.5) <= 0.002
+    assert h.quantile(0.99) > 0.25
+    assert h.count == 100 and sum(h.counts) == 100
+
+
+def test_requests_are_keyed_by_route_template_and_status_class():
+    m = PerformanceMetrics()
+    m.record_request(True, 0.003, "POST", "/matches/{match_id}/point", 200)
+    m.record_request(True, 0.004, "POST", "/matches/{match_id}/point", 201)
+    m.record_request(False, 0.2, "POST", "/matches/{match_id}/point", 503)
+    assert set(m.latency) == {
+        ("POST", "/matches/{match_id}/point", "2xx"),
+        ("POST", "/matches/{match_id}/point", "5xx"),
+    }
+    text = render_prometheus(m)
+    assert (
+        'padelsense_http_request_duration_seconds_count{method="POST",'
+        'route="/matches/{match_id}/point",status="2xx"} 2'
+    ) in text
+    assert 'le="+Inf"} 1' in text
+    assert "padelsense_requests_total 3" in text
+
+
+def test_normalize_sql_strips_literals_and_params():
+    from backend.monitoring import normalize_sql
+
+    a = normalize_sql("SELECT * FROM users  WHERE telegram_id = $1 AND name = 'x'")
+    b = normalize_sql("SELECT * FROM users WHERE telegram_id = 42 AND name = 'it''s'")
+    assert a == b == "SELECT * FROM users WHERE telegram_id = ? AND name = ?"
+    assert normalize_sql("SELECT 1 FROM t WHERE id IN (1, 2, 3)") == "SELECT ? FROM t WHERE id IN (...)"
+    assert normalize_sql("SELECT * FROM match_events_2026_10") == "SELECT * FROM match_events_2026_10"
+
+
+def test_queries_are_attributed_to_current_request():
+    from backend.monitoring import RequestQueries, _request_queries, record_query
+
+    outside = RequestQueries()
+    queries = RequestQueries()
+    token = _request_queries.set(queries)
+    try:
+        for user_id in range(3):
+            record_query(f"SELECT * FROM users WHERE id = {user_id}", 0.001)
+    finally:
+        _request_queries.reset(token)
+    record_query("SELECT 1", 0.001)
+    assert queries.count == 3
+    assert queries.by_sql == {"SELECT * FROM users WHERE id = ?": 3}
+    assert outside.count == 0
+
+
+def test_failed_statement_does_not_skew_next_query_timing(monkeypatch):
+    from sqlalchemy import create_engine, text
+
+    from backend.db import session as db_session
+
+    now = [0.0]
+
+    def perf_counter():
+        now[0] += 0.001
+        return now[0]
+
+    recorded = []
+    monkeypatch.setattr(db_session, "time", SimpleNamespace(perf_counter=perf_counter))
+    monkeypatch.setattr(db_session, "record_query", lambda sql, seconds: recorded.append((sql, seconds)))
+    engine = create_engine("sqlite://")
+    db_session._instrument_engine(SimpleNamespace(sync_engine=engine))
+    with engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.execute(text("SELECT * FROM missing_table"))
+        now[0] += 5  # между упавшим и следующим запросом прошло 5 секунд
+        conn.execute(text("SELECT 1"))
+    assert [sql for sql, _ in recorded] == ["SELECT 1"]
+    # Отсчёт от начала упавшего statement дал бы больше 5 секунд
+    assert recorded[0][1] == pytest.approx(0.001)
+
+
+async def test_loop_lag_monitor_reports_blocking_stack(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(
+        monitoring.EventLogger, "performance_warning",
+        staticmethod(lambda component, metric, value, threshold, stack=None: warnings.append((value, stack))),
+    )
+    stalls = monitoring.metrics.metrics["loop_stalls"]
+    task = asyncio.create_task(monitoring.LoopLagMonitor(interval=0.01, threshold=0.05).run())
+    await asyncio.sleep(0.05)
+
+    def blocking_qr_render():
+        time.sleep(0.2)
+
+    blocking_qr_render()
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert monitoring.metrics.metrics["loop_stalls"] == stalls + 1
+    lag, stack = warnings[0]
+    assert lag >= 0.1
+    assert "blocking_qr_render" in stack
+
+
+def test_shared_metrics_are_summed_across_workers(tmp_path):
+    from backend.shared_metrics import MmapMetrics, read_directory
+
+    workers = [PerformanceMetrics(MmapMetrics(str(tmp_path), pid=pid)) for pid in (101, 102)]
+    for i, worker in enumerate(workers):
+        for _ in range(3 + i):
+            worker.record_request(True, 0.003, "GET", "/matches/{match_id}", 200)
+        worker.record_cache_hit("local")
+    workers[1].record_request(False, 2.0, "POST", "/matches/{match_id}/end", 500)
+
+    view = monitoring.aggregate_metrics(read_directory(str(tmp_path)), workers[0])
+    assert view.metrics["requests_total"] == 8
+    assert view.metrics["requests_error"] == 1
+    assert view.metrics["cache_tier_hits"]["local"] == 2
+    histogram = view.latency[("GET", "/matches/{match_id}", "2xx")]
+    assert histogram.count == 7 and abs(histogram.sum - 0.021) < 1e-9
+    assert ("POST", "/matches/{match_id}/end", "5xx") in view.latency
+
+
+def test_reused_pid_does_not_overwrite_exited_worker_metrics(tmp_path):
+    from backend.shared_metrics import MmapMetrics, read_directory
+
+    exited = MmapMetrics(str(tmp_path), pid=101)
+    exited.inc(("c", "requests_total"), 5)
+    successor = MmapMetrics(str(tmp_path), pid=101)
+    successor.inc(("c", "requests_total"), 2)
+    assert len(list(tmp_path.glob("metrics-101-*.db"))) == 2
+    assert read_directory(str(tmp_path))[("c", "requests_total")] == 7
+
+
+def test_errors_are_grouped_by_fingerprint():
+    m = PerformanceMetrics()
+
+    def fail(n):
+        raise ConnectionRefusedError(f"db down, attempt {n}")
+
+    for n in range(50):
+        try:
+            fail(n)
+        except ConnectionRefusedError as e:
+            m.record_error(e, "POST /matches/{match_id}/point")
+    try:
+        {}["missing"]
+    except KeyError as e:
+        m.record_error(e, "GET /health")
+
+    assert m.metrics["errors_total"] == 51
+    groups = m.errors.summary()
+    assert len(groups) == 2
+    db_down = next(g for g in groups if g["type"] == "ConnectionRefusedError")
+    assert db_down["count"] == 50
+    assert db_down["message"] == "db down, attempt 0"
+    assert "in fail" in db_down["traceback"]
+
+
+def test_error_formatting_is_rate_limited():
+    stats = monitoring.ErrorStats(samples_per_second=1)
+    for exc_type in (ValueError, TypeError, KeyError):
+        try:
+            raise exc_type("boom")
+        except Exception as e:
+            stats.record(e)
+    formatted = [g for g in stats.groups.values() if g["traceback"]]
+    assert len(stats.groups) == 3 and len(formatted) == 1
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    from backend import tracing
+
+    m = PerformanceMetrics()
+    monkeypatch.setattr(monitoring, "metrics", m)
+    monkeypatch.setattr(tracing, "exporter", tracing.TraceExporter(keep=2))
+    return m
+
+
+def _http_scope(path="/matches/1", route=None):
+    scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+    if route is not None:
+        scope["route"] = SimpleNamespace(path=route)
+    return scope
+
+
+async def test_middleware_sets_response_time_header(fresh_metrics):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await monitoring.MonitoringMiddleware(app)(_http_scope(route="/matches/{match_id}"), None, send)
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-type"] == b"application/json"
+    assert float(headers[b"x-response-time"]) >= 0
+    assert fresh_metrics.latency[("GET", "/matches/{match_id}", "2xx")].count == 1
+
+
+async def test_middleware_passes_stream_chunks_through_unbuffered(fresh_metrics):
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "body": b"data: 1\n\n", "more_body": True})
+        await release.wait()
+        await send({"type": "http.response.body", "body": b"data: 2\n\n"})
+
+    chunks = []
+    first_chunk = asyncio.Event()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message["body"])
+            first_chunk.set()
+
+    task = asyncio.create_task(monitoring.MonitoringMiddleware(app)(_http_scope("/matches/1/stream"), None, send))
+    await asyncio.wait_for(first_chunk.wait(), 1)
+    # Первое событие уже у клиента, хотя приложение ещё не закончило ответ
+    assert chunks == [b"data: 1\n\n"] and not task.done()
+    release.set()
+    await task
+    assert chunks == [b"data: 1\n\n", b"data: 2\n\n"]
+
+
+async def test_middleware_records_500_and_latency_when_app_raises(fresh_metrics):
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await monitoring.MonitoringMiddleware(app)(_http_scope(route="/matches/{match_id}"), None, None)
+    histogram = fresh_metrics.latency[("GET", "/matches/{match_id}", "5xx")]
+    assert histogram.count == 1 and histogram.sum >= 0.01
+    assert fresh_metrics.metrics["requests_error"] == 1
+    assert fresh_metrics.metrics["errors_total"] == 1
+
+
+@pytest.mark.parametrize("scope_type", ["websocket", "lifespan"])
+async def test_middleware_passes_non_http_scopes_untouched(fresh_metrics, scope_type):
+    calls = []
+    scope, receive = {"type": scope_type, "path": "/ws"}, object()
+
+    async def send(message):
+        pass
+
+    async def app(app_scope, app_receive, app_send):
+        calls.append((app_scope, app_receive, app_send))
+
+    await monitoring.MonitoringMiddleware(app)(scope, receive, send)
+    assert calls == [(scope, receive, send)]
+    assert fresh_metrics.metrics["requests_total"] == 0
@@ -0,0 +1,117 @@
+"""Monthly partitions: month arithmetic, generated DDL, listing and safe archiving (no DB)."""
+import gzip
+from datetime import date
+
+import pytest
+
+from backend.db import partitions
+from backend.db.partitions import _add_months, archive_old_partitions, ensure_partitions, list_partitions
+
+
+class _FakeConn:
+    def __init__(self, existing=(), attached=()):
+        self.existing = set(existing)
+        self.attached = list(attached)
+        self.executed = []
+        self.committed = []
+        self.copy_error = None
+        self._tx = None
+
+    async def fetchval(self, sql, arg):
+        if "relkind" in sql:
+            return "p"
+        return arg in self.existing
+
+    async def fetch(self, sql, table):
+        return [{"relname": name} for name in self.attached]
+
+    async def execute(self, sql):
+        (self._tx if self._tx is not None else self.committed).append(sql)
+        self.executed.append(sql)
+
+    async def copy_from_table(self, name, output, **kwargs):
+        await output(b"id,match_id\n")
+        if self.copy_error:
+            raise self.copy_error
+        await output(b"1,2\n")
+
+    def transaction(self):
+        conn = self
+
+        class _Tx:
+            async def __aenter__(self):
+                conn._tx = []
+
+            async def __aexit__(self, exc_type, *exc):
+                if exc_type is None:
+                    conn.committed.extend(conn._tx)
+                conn._tx = None
+                return False
+
+        return _Tx()
+
+
+def test_add_months_rolls_over_years():
+    assert _add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert _add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert _add_months(date(2026, 10, 1), -12) == date(2025, 10, 1)
+
+
+async def test_ensure_partitions_creates_missing_months():
+    conn = _FakeConn(existing={"match_events_2026_12"})
+    created = await ensure_partitions(conn, months_ahead=1, today=date(2026, 12, 15))
+    assert created == ["match_events_2027_01", "highlights_2026_12", "highlights_2027_01"]
+    assert "CREATE TABLE IF NOT EXISTS match_events_default PARTITION OF match_events DEFAULT" in conn.executed
+    assert (
+        "CREATE TABLE match_events_2027_01 PARTITION OF match_events "
+        "FOR VALUES FROM ('2027-01-01 00:00+00') TO ('2027-02-01 00:00+00')"
+    ) in conn.executed
+
+
+async def test_list_partitions_parses_months_and_skips_others():
+    conn = _FakeConn(attached=["highlights_2026_02", "highlights_default", "highlights_2025_12", "highlights_x_2026_01"])
+    assert await list_partitions(conn, "highlights") == [
+        ("highlights_2025_12", date(2025, 12, 1)),
+        ("highlights_2026_02", date(2026, 2, 1)),
+    ]
+
+
+async def test_archive_exports_before_detach_and_drop(tmp_path, monkeypatch):
+    monkeypatch.setattr(partitions, "PARTITIONED_TABLES", ("highlights",))
+    conn = _FakeConn(attached=["highlights_2025_01", "highlights_2026_10"])
+    archived = await archive_old_partitions(conn, keep_months=6, archive_dir=tmp_path, today=date(2026, 10, 18))
+    assert archived == [tmp_path / "highlights_2025_01.csv.gz"]
+    assert gzip.decompress(archived[0].read_bytes()) == b"id,match_id\n1,2\n"
+    assert conn.committed == [
+        "LOCK TABLE highlights_2025_01 IN SHARE MODE",
+        "ALTER TABLE highlights DETACH PARTITION highlights_2025_01",
+        "DROP TABLE highlights_2025_01",
+    ]
+
+
+@pytest.mark.parametrize("failure", ["copy", "file"])
+async def test_failed_export_leaves_partition_attached(tmp_path, monkeypatch, failure):
+    monkeypatch.setattr(partitions, "PARTITIONED_TABLES", ("highlights",))
+    conn = _FakeConn(attached=["highlights_2025_01"])
+    if failure == "copy":
+        conn.copy_error = ConnectionError("connection lost")
+    else:
+        class _FullDisk:
+            def __init__(self, path, mode):
+                self.file = open(path, mode)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self.file.close()
+
+            def write(self, chunk):
+                raise OSError("No space left on device")
+
+        monkeypatch.setattr(partitions.gzip, "open", _FullDisk)
+
+    with pytest.raises((ConnectionError, OSError)):
+        await archive_old_partitions(conn, keep_months=6, archive_dir=tmp_path, today=date(2026, 10, 18))
+    assert not any("DETACH" in sql or "DROP" in sql for sql in conn.committed)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,43 @@
+"""Profiler tests: stack sampler and asyncio task view."""
+import asyncio
+import threading
+
+from backend.profiler import format_collapsed, sample_stacks, task_stacks
+
+
+def test_sampler_collapses_busy_thread_stacks():
+    stop = threading.Event()
+
+    def busy_scoring_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_scoring_loop, name="scorer")
+    worker.start()
+    try:
+        samples = sample_stacks(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    scorer = {stack: n for stack, n in samples.items() if stack.startswith("scorer;")}
+    assert sum(scorer.values()) >= 10
+    assert all("busy_scoring_loop (tests/test_profiler.py:" in stack for stack in scorer)
+    line = format_collapsed(samples).splitlines()[0]
+    assert line.rsplit(" ", 1)[1].isdigit()
+
+
+async def test_task_view_shows_await_chain():
+    async def wait_for_point():
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(wait_for_point(), name="court-1")
+    await asyncio.sleep(0)
+    try:
+        view = {t["name"]: t["awaiting"] for t in task_stacks()}
+    finally:
+        task.cancel()
+    chain = view["court-1"]
+    assert chain[0].startswith("test_task_view_shows_await_chain.<locals>.wait_for_point")
+    assert chain[1].startswith("sleep (asyncio/tasks.py:")
+    assert chain[-1] == "<Future>"
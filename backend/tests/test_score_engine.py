@@ -0,0 +1,79 @@
+"""Score engine tests: snapshots, undo across game/set rollovers, replay."""
+from types import SimpleNamespace
+
+from backend.services.score_engine import (
+    SNAPSHOT_INTERVAL,
+    ScoreEngine,
+    add_point,
+    initial_score,
+)
+
+
+def _naive(points: str) -> dict:
+    score = initial_score()
+    for team in points:
+        score = add_point(score, team)
+    return score
+
+
+def test_apply_matches_naive_replay_and_keeps_snapshots():
+    engine = ScoreEngine()
+    points = "AAAABBBBABABAB" * 20
+    for team in points:
+        engine.apply(team)
+    assert engine.score == _naive(points)
+    assert len(engine.snapshots) == len(points) // SNAPSHOT_INTERVAL + 1
+    assert engine.state_at(37) == _naive(points[:37])
+
+
+def test_undo_reverses_set_rollover():
+    engine = ScoreEngine()
+    points = "AAAA" * 6  # 6:0 — сет команды A
+    for team in points[:-1]:
+        engine.apply(team)
+    before = engine.score
+    engine.apply("A")
+    assert engine.score["sets_a"] == 1
+    assert engine.undo() == "A"
+    assert engine.score == before
+    assert engine.score["games_a"] == [5]
+
+
+def test_undo_past_snapshot_then_reapply():
+    engine = ScoreEngine()
+    for team in "A" * SNAPSHOT_INTERVAL:
+        engine.apply(team)
+    engine.undo()
+    engine.undo()
+    assert len(engine.snapshots) == 1
+    engine.apply("B")
+    engine.apply("B")
+    expected = "A" * (SNAPSHOT_INTERVAL - 2) + "BB"
+    assert engine.points == expected
+    assert engine.snapshots[-1] == _naive(expected)
+
+
+def test_undo_on_empty_log():
+    engine = ScoreEngine()
+    assert engine.undo() is None
+    assert engine.score == initial_score()
+
+
+def test_replay_events():
+    events = [
+        SimpleNamespace(kind="start", payload={}),
+        SimpleNamespace(kind="point", payload={"team": "A"}),
+        SimpleNamespace(kind="point", payload={"team": "B"}),
+        SimpleNamespace(kind="undo", payload={"team": "B"}),
+        SimpleNamespace(kind="highlight", payload={"timestamp_sec": 1.0}),
+        SimpleNamespace(kind="point", payload={"team": "A"}),
+    ]
+    assert ScoreEngine.replay(events).score == _naive("AA")
+
+
+def test_from_legacy_match_uses_score_as_base():
+    legacy = SimpleNamespace(score=_naive("AAB"), point_log="", snapshots=[])
+    engine = ScoreEngine.from_match(legacy)
+    engine.apply("A")
+    assert engine.undo() == "A"
+    assert engine.score == _naive("AAB")
@@ -0,0 +1,64 @@
+"""Table-driven scoring: rule variants and NumPy bulk replay."""
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from backend.schemas.matches import PointBody
+from backend.services.scoring_table import (
+    RULESETS,
+    apply_point,
+    initial_score,
+    replay_point_logs,
+    scores_from_replay,
+)
+
+
+def _play(points: str, rules: str = "advantage") -> dict:
+    score = initial_score(rules)
+    for team in points:
+        score = apply_point(score, team)
+    return score
+
+
+def test_advantage_deuce_cycle():
+    score = _play("AAABBB")
+    assert (score["points_a"], score["points_b"]) == (40, 40)
+    score = apply_point(score, "A")
+    assert score["points_a"] == "adv"
+    score = apply_point(score, "B")
+    assert (score["points_a"], score["points_b"]) == (40, 40)
+    assert _play("AAABBBAA")["games_a"] == [1]
+
+
+def test_golden_point_wins_game_at_deuce():
+    score = _play("AAABBBB", "golden")
+    assert score["games_b"] == [1]
+    assert score["rules"] == "golden"
+
+
+def test_tiebreak_at_six_all():
+    game_a, game_b = "AAAA", "BBBB"
+    score = _play((game_a + game_b) * 6, "tiebreak")
+    assert score["tiebreak"] is True
+    assert (score["games_a"], score["games_b"]) == ([6], [6])
+    score = _play((game_a + game_b) * 6 + "A" * 7, "tiebreak")
+    assert score["sets_a"] == 1
+    assert "tiebreak" not in score
+    # Без тай-брейка сет продолжается на больше-меньше
+    assert _play((game_a + game_b) * 6 + game_a)["games_a"] == [7]
+
+
+def test_bulk_replay_matches_scalar():
+    rng = random.Random(7)
+    logs = ["".join(rng.choice("AAB" if i % 2 else "AB") for _ in range(rng.randint(0, 300))) for i in range(200)]
+    rules = [rng.choice(list(RULESETS)) for _ in logs]
+    bulk = scores_from_replay(replay_point_logs(logs, rules), rules)
+    assert bulk == [_play(log, r) for log, r in zip(logs, rules)]
+
+
+def test_unknown_team_is_rejected():
+    with pytest.raises(ValueError):
+        apply_point(initial_score(), "Z")
+    with pytest.raises(ValidationError):
+        PointBody(team="Z")
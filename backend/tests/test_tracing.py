@@ -0,0 +1,85 @@
+"""Tracing tests: span nesting through await, the slowest-trace exporter, SSE kept apart."""
+import asyncio
+
+import pytest
+
+from backend import tracing
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = tracing.TraceExporter(keep=2)
+    monkeypatch.setattr(tracing, "exporter", exporter)
+    return exporter
+
+
+@tracing.traced()
+async def end_match():
+    with tracing.span("db.flush"):
+        tracing.record_span("db", 0.002, sql="UPDATE matches SET status = ?")
+        await asyncio.sleep(0)
+
+
+async def test_spans_nest_across_await(exporter):
+    root = tracing.start_trace("POST /matches/{match_id}/end")
+    await end_match()
+    with pytest.raises(RuntimeError):
+        with tracing.span("notify.http"):
+            raise RuntimeError("bot down")
+    tracing.end_trace(root)
+
+    trace = exporter.slowest()[0]
+    spans = {s["name"]: s for s in trace["spans"]}
+    assert set(spans) == {"POST /matches/{match_id}/end", "test_tracing.end_match", "db.flush", "db", "notify.http"}
+    assert spans["test_tracing.end_match"]["parent_id"] == spans["POST /matches/{match_id}/end"]["span_id"]
+    assert spans["db"]["parent_id"] == spans["db.flush"]["span_id"]
+    assert spans["db"]["attrs"] == {"sql": "UPDATE matches SET status = ?"}
+    assert spans["notify.http"]["error"] == "RuntimeError"
+
+
+async def test_spans_outside_request_are_ignored(exporter):
+    await end_match()
+    assert exporter.slowest() == []
+
+
+def test_exporter_keeps_only_slowest(exporter):
+    for name, seconds in [("a", 0.3), ("b", 0.1), ("c", 0.5)]:
+        trace = tracing.Trace(max_spans=10)
+        root = tracing.Span(trace, None, name, {})
+        root.duration = seconds
+        trace.spans.append(root)
+        exporter.export(trace)
+    assert [t["name"] for t in exporter.slowest()] == ["c", "a"]
+
+
+def test_long_stream_does_not_evict_slow_request(exporter):
+    def finished(name, seconds, **attrs):
+        trace = tracing.Trace(max_spans=10)
+        root = tracing.Span(trace, None, name, attrs)
+        root.duration = seconds
+        trace.spans.append(root)
+        return trace
+
+    exporter.export(finished("POST /matches/{match_id}/end", 1.5))
+    for _ in range(5):
+        exporter.export(finished("GET /matches/{match_id}/stream", 3600, stream=True))
+    assert [t["name"] for t in exporter.slowest()] == ["POST /matches/{match_id}/end"]
+    assert len(exporter.slowest(streams=True)) == 5
+
+
+async def test_middleware_marks_sse_responses_as_streams(exporter):
+    from backend.monitoring import MonitoringMiddleware
+
+    async def app(scope, receive, send):
+        content_type = b"text/event-stream" if scope["path"] == "/stream" else b"application/json"
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = MonitoringMiddleware(app)
+    for path in ("/stream", "/end"):
+        await middleware({"type": "http", "method": "GET", "path": path, "headers": []}, None, send)
+    assert [t["spans"][0]["attrs"]["path"] for t in exporter.slowest()] == ["/end"]
+    assert [t["spans"][0]["attrs"]["path"] for t in exporter.slowest(streams=True)] == ["/stream"]
@@ -0,0 +1,220 @@
+"""
+Лёгкая трассировка запросов внутри процесса
+
+Корневой span открывает MonitoringMiddleware (start_trace/end_trace), дочерние —
+span()/traced() в сервисах, record_span() для уже замеренных запросов к БД.
+Текущий span живёт в ContextVar, поэтому вложенность сохраняется через await,
+greenlet SQLAlchemy и asyncio.create_task. Вне запроса span() ничего не делает.
+
+Завершённый trace уходит в TraceExporter: в памяти — самые медленные (для
+/debug/traces), в файл — JSONL по строке на span, запись в фоновом потоке.
+Потоковые ответы (SSE) живут часами и копятся отдельно, иначе они вытеснили
+бы из «самых медленных» обычные запросы.
+"""
+import heapq
+import itertools
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from backend.config import get_settings
+
+logger = logging.getLogger(__name__)
+_settings = get_settings()
+
+
+class Trace:
+    __slots__ = ("trace_id", "started_at", "spans", "finished", "dropped", "max_spans")
+
+    def __init__(self, max_spans: int):
+        self.trace_id = f"{random.getrandbits(64):016x}"
+        self.started_at = time.time()
+        self.spans: List["Span"] = []
+        self.finished = False
+        self.dropped = 0
+        self.max_spans = max_spans
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "duration", "attrs", "error", "_token")
+
+    def __init__(self, trace: Trace, parent: Optional["Span"], name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(32):08x}"
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attrs = attrs
+        self.error: Optional[str] = None
+        self._token = None
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.duration = time.perf_counter() - self.start
+        if error is not None:
+            self.error = type(error).__name__
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _attach(span: Span) -> bool:
+    trace = span.trace
+    if trace.finished:
+        return False
+    if len(trace.spans) >= trace.max_spans:
+        trace.dropped += 1
+        return False
+    trace.spans.append(span)
+    return True
+
+
+def start_trace(name: str, **attrs) -> Span:
+    """Корневой span нового trace; делает его текущим"""
+    trace = Trace(_settings.trace_max_spans)
+    root = Span(trace, None, name, attrs)
+    trace.spans.append(root)
+    root._token = _current_span.set(root)
+    return root
+
+
+def end_trace(root: Span, error: Optional[BaseException] = None):
+    root.finish(error)
+    _current_span.reset(root._token)
+    root.trace.finished = True
+    exporter.export(root.trace)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Дочерний span текущего trace (вне запроса — ничего не делает)"""
+    parent = _current_span.get()
+    if parent is None or parent.trace.finished:
+        yield None
+        return
+    current = Span(parent.trace, parent, name, attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(e)
+        raise
+    else:
+        current.finish()
+    finally:
+        _current_span.reset(token)
+        _attach(current)
+
+
+def traced(name: Optional[str] = None):
+    """Декоратор async-функции: span на каждый вызов (имя — модуль.функция)"""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, seconds: float, **attrs):
+    """Уже замеренная операция (запрос к БД) как завершённый дочерний span"""
+    parent = _current_span.get()
+    if parent is None:
+        return
+    done = Span(parent.trace, parent, name, attrs)
+    done.start -= seconds
+    done.duration = seconds
+    _attach(done)
+
+
+def _span_dict(span: Span, root: Span) -> dict:
+    row = {
+        "span_id": span.span_id,
+        "parent_id": span.parent_id,
+        "name": span.name,
+        "offset_ms": round((span.start - root.start) * 1000, 3),
+        "duration_ms": round((span.duration or 0.0) * 1000, 3),
+    }
+    if span.attrs:
+        row["attrs"] = span.attrs
+    if span.error:
+        row["error"] = span.error
+    return row
+
+
+def trace_dict(trace: Trace) -> dict:
+    root = trace.spans[0]
+    return {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "started_at": trace.started_at,
+        "duration_ms": round(root.duration * 1000, 3),
+        "dropped_spans": trace.dropped,
+        "spans": [_span_dict(s, root) for s in sorted(trace.spans, key=lambda s: s.start)],
+    }
+
+
+class TraceExporter:
+    """Самые медленные trace в памяти + JSONL-файл (поток записи, очередь без ожидания)"""
+
+    def __init__(self, keep: int = 50, path: str = "", queue_size: int = 1000, keep_streams: int = 10):
+        self.keep = keep
+        self.keep_streams = keep_streams
+        self.path = path
+        self._slowest: list = []  # min-heap (длительность, n, trace)
+        self._streams: list = []  # то же для потоковых ответов (root.attrs["stream"])
+        self._seq = itertools.count()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self.dropped = 0
+
+    def export(self, trace: Trace):
+        root = trace.spans[0]
+        item = (root.duration, next(self._seq), trace)
+        heap, keep = (self._streams, self.keep_streams) if root.attrs.get("stream") else (self._slowest, self.keep)
+        if len(heap) < keep:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            heapq.heapreplace(heap, item)
+        if not self.path:
+            return
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write, name="trace-writer", daemon=True)
+            self._writer.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def slowest(self, limit: int = 20, streams: bool = False) -> list:
+        rows = heapq.nlargest(limit, self._streams if streams else self._slowest)
+        return [trace_dict(trace) for _, _, trace in rows]
+
+    def _write(self):
+        handler = RotatingFileHandler(self.path, maxBytes=50 * 1024 * 1024, backupCount=3, encoding="utf-8")
+        while True:
+            trace = self._queue.get()
+            try:
+                data = trace_dict(trace)
+                spans = data.pop("spans")
+                lines = [
+                    json.dumps({"trace_id": data["trace_id"], "trace": data["name"], **row}, ensure_ascii=False, default=str)
+                    for row in spans
+                ]
+                handler.emit(logging.makeLogRecord({"msg": "\n".join(lines), "levelno": logging.INFO}))
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось записать trace: {e}")
+
+
+exporter = TraceExporter(_settings.trace_keep_slowest, _settings.trace_file)
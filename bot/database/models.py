@@ -1,12 +1,69 @@
 """Работа с пользователями в PostgreSQL."""
+import asyncio
+import logging
+import os
+import time
 from typing import Any
 from uuid import UUID
 
+import asyncpg
+
+from bot.config import get_database_url
 from bot.database.connection import get_pool
 
+logger = logging.getLogger(__name__)
+
+# Негативный кэш: telegram_id без регистрации -> время истечения (monotonic).
+# Большинство нажавших /start ещё не зарегистрированы — не ходим за ними в БД
+# повторно. Сбрасывается при регистрации: своей (create_user) и через mini-app
+# (NOTIFY user_registered от триггера на users, см. listen_registrations).
+USER_REGISTERED_CHANNEL = "user_registered"
+ABSENT_TTL = float(os.getenv("USER_ABSENT_TTL", "300"))
+_ABSENT_MAX = 10_000
+_absent: dict[int, float] = {}
+
+
+def _remember_absent(telegram_id: int) -> None:
+    _absent.pop(telegram_id, None)
+    _absent[telegram_id] = time.monotonic() + ABSENT_TTL
+    if len(_absent) > _ABSENT_MAX:
+        del _absent[next(iter(_absent))]  # самая старая запись
+
+
+def forget_absent(telegram_id: int) -> None:
+    _absent.pop(telegram_id, None)
+
+
+async def listen_registrations() -> None:
+    """Фоновая задача: LISTEN user_registered -> forget_absent(telegram_id)."""
+    def on_registered(conn, pid, channel, payload: str) -> None:
+        forget_absent(int(payload))
+
+    while True:
+        try:
+            conn = await asyncpg.connect(get_database_url())
+            try:
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(USER_REGISTERED_CHANNEL, on_registered)
+                # Пока подписки не было, регистрации могли пройти мимо — включая
+                # записи, добавленные во время переподключения
+                _absent.clear()
+                await closed.wait()
+            finally:
+                await conn.close()
+        except Exception as e:
+            logger.error("❌ Ошибка подписки на регистрации: %s", e)
+        await asyncio.sleep(5)
+
 
 async def get_user_by_telegram_id(telegram_id: int) -> dict[str, Any] | None:
     """Получить пользователя по telegram_id."""
+    expires_at = _absent.get(telegram_id)
+    if expires_at is not None:
+        if expires_at > time.monotonic():
+            return None
+        del _absent[telegram_id]
     pool = await get_pool()
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
@@ -14,6 +71,7 @@ async def get_user_by_telegram_id(telegram_id: int) -> dict[str, Any] | None:
             telegram_id,
         )
         if not row:
+            _remember_absent(telegram_id)
             return None
         return {
             "id": str(row["id"]),
@@ -65,6 +123,7 @@ async def create_user(
             phone,
             photo_url,
         )
+        forget_absent(telegram_id)
         return {
             "id": str(row["id"]),
             "telegram_id": row["telegram_id"],
@@ -20,6 +20,7 @@ if not os.path.exists("bot"):
     sys.exit(1)
 
 from bot.config import get_mini_app_url, get_token
+from bot.database.models import listen_registrations
 from bot.handlers import start_router
 
 NOTIFY_PORT = int(os.getenv("NOTIFY_PORT", "8081"))
@@ -51,8 +52,12 @@ async def main() -> None:
     except Exception as e:
         logger.error("❌ Ошибка настройки кнопки: %s", e)
 
+    registrations = asyncio.create_task(listen_registrations())
     logger.info("🤖 Бот запущен! Жду сообщения...")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        registrations.cancel()
 
 
 if __name__ == "__main__":
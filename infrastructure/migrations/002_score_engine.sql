@@ -0,0 +1,10 @@
+-- Event-sourced score engine: append-only match_events with per-match seq,
+-- effective point log and periodic score snapshots on matches.
+
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS last_seq INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS point_log TEXT NOT NULL DEFAULT '';
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS snapshots JSONB NOT NULL DEFAULT '[]';
+
+ALTER TABLE match_events ADD COLUMN IF NOT EXISTS seq INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_match_events_match_seq ON match_events(match_id, seq);
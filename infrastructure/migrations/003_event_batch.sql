@@ -0,0 +1,4 @@
+-- Idempotent batch ingestion of offline tablet events.
+
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS last_client_seq INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE match_events ADD COLUMN IF NOT EXISTS client_seq INTEGER;
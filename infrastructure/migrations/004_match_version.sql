@@ -0,0 +1,3 @@
+-- Optimistic concurrency control for match writes.
+
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
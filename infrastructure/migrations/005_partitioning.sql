@@ -0,0 +1,68 @@
+-- Monthly RANGE (created_at) partitioning of match_events and highlights.
+-- Converts existing tables in place: rename, create partitioned parent,
+-- create monthly partitions covering existing rows, copy, drop the old heap.
+-- Future partitions are created by the backend (backend/db/partitions.py).
+
+BEGIN;
+
+-- Partition bounds are whole months in UTC
+SET LOCAL timezone = 'UTC';
+
+ALTER TABLE match_events RENAME TO match_events_old;
+ALTER TABLE highlights RENAME TO highlights_old;
+
+CREATE TABLE match_events (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    match_id UUID NOT NULL REFERENCES matches(id),
+    seq INTEGER NOT NULL DEFAULT 0,
+    client_seq INTEGER,
+    kind VARCHAR(32) NOT NULL,
+    payload JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE highlights (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    match_id UUID NOT NULL REFERENCES matches(id),
+    timestamp_sec DOUBLE PRECISION NOT NULL,
+    url VARCHAR(512),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE match_events_default PARTITION OF match_events DEFAULT;
+CREATE TABLE highlights_default PARTITION OF highlights DEFAULT;
+
+DO $$
+DECLARE
+    tbl TEXT;
+    month DATE;
+    last_month DATE := date_trunc('month', NOW() + INTERVAL '2 months');
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['match_events', 'highlights'] LOOP
+        EXECUTE format('SELECT date_trunc(''month'', COALESCE(MIN(created_at), NOW())) FROM %I', tbl || '_old')
+            INTO month;
+        WHILE month <= last_month LOOP
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                tbl || '_' || to_char(month, 'YYYY_MM'), tbl, month, month + INTERVAL '1 month'
+            );
+            month := month + INTERVAL '1 month';
+        END LOOP;
+    END LOOP;
+END $$;
+
+INSERT INTO match_events (id, match_id, seq, client_seq, kind, payload, created_at)
+SELECT id, match_id, seq, client_seq, kind, payload, COALESCE(created_at, NOW()) FROM match_events_old;
+
+INSERT INTO highlights (id, match_id, timestamp_sec, url, created_at)
+SELECT id, match_id, timestamp_sec, url, COALESCE(created_at, NOW()) FROM highlights_old;
+
+DROP TABLE match_events_old;
+DROP TABLE highlights_old;
+
+CREATE INDEX IF NOT EXISTS idx_match_events_match_seq ON match_events(match_id, seq);
+CREATE INDEX IF NOT EXISTS idx_highlights_match_id ON highlights(match_id);
+
+COMMIT;
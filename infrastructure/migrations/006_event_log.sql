@@ -0,0 +1,4 @@
+-- Packed event log of finished matches (see backend/services/event_codec.py).
+-- Rows of match_events are deleted once the log is packed into matches.event_log.
+
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS event_log BYTEA;
@@ -0,0 +1,17 @@
+-- NOTIFY user_registered '<telegram_id>' on every new registration.
+-- The backend and the bot listen to drop their "telegram_id is not registered"
+-- negative cache entries, whichever process created the user.
+
+CREATE OR REPLACE FUNCTION notify_user_registered() RETURNS trigger AS $$
+BEGIN
+    IF NEW.telegram_id IS NOT NULL THEN
+        PERFORM pg_notify('user_registered', NEW.telegram_id::text);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_registered_notify ON users;
+CREATE TRIGGER users_registered_notify
+    AFTER INSERT OR UPDATE OF telegram_id ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_user_registered();
@@ -0,0 +1,38 @@
+"""
+Retention для match_events/highlights: партиции старше EVENTS_RETENTION_MONTHS
+выгружаются в EVENTS_ARCHIVE_DIR/<партиция>.csv.gz, отсоединяются и удаляются.
+
+Запуск из корня проекта (например, раз в сутки из cron):
+    python scripts/archive_events.py
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from backend.config import get_settings  # noqa: E402
+from backend.db.partitions import archive_old_partitions, ensure_partitions  # noqa: E402
+from backend.db.session import _get_pg_pool  # noqa: E402
+
+
+async def main() -> None:
+    settings = get_settings()
+    pool = await _get_pg_pool()
+    async with pool.acquire() as conn:
+        created = await ensure_partitions(conn)
+        archived = await archive_old_partitions(
+            conn,
+            keep_months=settings.events_retention_months,
+            archive_dir=Path(settings.events_archive_dir),
+        )
+    if created:
+        print(f"🗂 Созданы партиции: {', '.join(created)}")
+    print(f"📦 Выгружено партиций: {len(archived)}")
+    for path in archived:
+        print(f"   {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
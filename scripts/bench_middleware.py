@@ -0,0 +1,105 @@
+"""
+Бенчмарк накладных расходов middleware мониторинга на пустом эндпоинте:
+без middleware, прежний вариант через app.middleware("http") (BaseHTTPMiddleware)
+и backend.monitoring.MonitoringMiddleware (чистый ASGI).
+
+Приложение вызывается напрямую по ASGI, без сети и сервера:
+    python scripts/bench_middleware.py --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI  # noqa: E402
+
+from backend.monitoring import MonitoringMiddleware, metrics  # noqa: E402
+
+
+def _make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def plain_app() -> FastAPI:
+    return _make_app()
+
+
+def base_http_app() -> FastAPI:
+    """Тот же учёт, что и раньше: таймер, метрики, заголовок — через call_next"""
+    app = _make_app()
+
+    @app.middleware("http")
+    async def timing(request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        elapsed = time.perf_counter() - start
+        route = getattr(request.scope.get("route"), "path", "<unmatched>")
+        metrics.record_request(True, elapsed, request.method, route, response.status_code)
+        response.headers["X-Response-Time"] = f"{elapsed:.3f}"
+        return response
+
+    return app
+
+
+def asgi_app() -> FastAPI:
+    app = _make_app()
+    app.add_middleware(MonitoringMiddleware)
+    return app
+
+
+async def _call(app) -> None:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/ping", "raw_path": b"/ping",
+        "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def bench(name: str, app, requests: int) -> float:
+    for _ in range(200):  # прогрев: сборка middleware stack, кэши роутера
+        await _call(app)
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await _call(app)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    mean = statistics.mean(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:>16}: mean {mean * 1e6:.1f} µs, p95 {p95 * 1e6:.1f} µs")
+    return mean
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"⏱️ {args.requests} запросов GET /ping")
+    base = await bench("без middleware", plain_app(), args.requests)
+    old = await bench("BaseHTTP", base_http_app(), args.requests)
+    new = await bench("ASGI", asgi_app(), args.requests)
+    print(f"Накладные расходы: BaseHTTP +{(old - base) * 1e6:.1f} µs, ASGI +{(new - base) * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Бенчмарк POST /matches/{id}/point: ORM-путь match_service.add_point
+против быстрого пути match_service.add_point_fast (asyncpg).
+
+Запуск из корня проекта (нужен PostgreSQL из docker compose):
+    python scripts/bench_point.py --points 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import event  # noqa: E402
+
+from backend.db import session as db  # noqa: E402
+from backend.schemas.matches import MatchStartBody  # noqa: E402
+from backend.services import match_service  # noqa: E402
+
+
+def _report(name: str, timings: list[float], statements: int) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{name:>10}: mean {statistics.mean(timings) * 1000:.2f} ms, "
+        f"p95 {p95 * 1000:.2f} ms, SQL-запросов на очко {statements / len(timings):.1f}"
+    )
+
+
+async def _new_match(maker) -> uuid.UUID:
+    async with maker() as session:
+        body = MatchStartBody(**{f"position_{i}_user_id": uuid.uuid4() for i in range(1, 5)})
+        match = await match_service.start_match(session, body)
+        await session.commit()
+        return match.id
+
+
+async def bench_orm(points: int) -> None:
+    engine, maker = db._get_engine()
+    statements = 0
+
+    def _count(*_args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    match_id = await _new_match(maker)
+    statements = 0
+    timings = []
+    for i in range(points):
+        start = time.perf_counter()
+        async with maker() as session:
+            await match_service.add_point(session, match_id, "AB"[i % 2])
+            await session.commit()
+        timings.append(time.perf_counter() - start)
+    event.remove(engine.sync_engine, "before_cursor_execute", _count)
+    _report("ORM", timings, statements)
+
+
+async def bench_fast(points: int) -> None:
+    _, maker = db._get_engine()
+    match_id = await _new_match(maker)
+    pool = await db._get_pg_pool()
+    statements = 0
+
+    def _count(_record):
+        nonlocal statements
+        statements += 1
+
+    timings = []
+    async with pool.acquire() as conn:
+        conn.add_query_logger(_count)
+        for i in range(points):
+            start = time.perf_counter()
+            await match_service.add_point_fast(conn, match_id, "AB"[i % 2])
+            timings.append(time.perf_counter() - start)
+        conn.remove_query_logger(_count)
+    _report("asyncpg", timings, statements)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=500)
+    args = parser.parse_args()
+
+    await db.init_db()
+    print(f"🏓 {args.points} очков на матч")
+    await bench_orm(args.points)
+    await bench_fast(args.points)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+Пакетный пересчёт счёта завершённых матчей по point_log (NumPy, табличный автомат).
+
+Сверяет пересчитанный счёт с сохранённым в matches.score и печатает расхождения.
+Матчи, переведённые со старого формата, пропускаются: их point_log начинается
+не с 0:0, а со счёта на момент перевода (snapshots[0]).
+Запуск из корня проекта:
+    python scripts/rescore_matches.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from backend.db.session import _get_pg_pool  # noqa: E402
+from backend.services.scoring_table import (  # noqa: E402
+    DEFAULT_RULES,
+    initial_score,
+    replay_point_logs,
+    scores_from_replay,
+)
+
+
+async def main() -> None:
+    pool = await _get_pg_pool()
+    rows = await pool.fetch(
+        """
+        SELECT id, score, point_log, snapshots->0 AS base FROM matches
+        WHERE status = 'finished' AND jsonb_array_length(snapshots) > 0
+        """
+    )
+    converted = len(rows)
+    rows = [r for r in rows if r["base"] == initial_score(r["score"].get("rules", DEFAULT_RULES))]
+    converted -= len(rows)
+    if converted:
+        print(f"⏭ Пропущено матчей, переведённых со старого формата: {converted}")
+    if not rows:
+        print("Нет завершённых матчей")
+        return
+    logs = [r["point_log"] for r in rows]
+    rules = [r["score"].get("rules", DEFAULT_RULES) for r in rows]
+
+    start = time.perf_counter()
+    scores = scores_from_replay(replay_point_logs(logs, rules), rules)
+    elapsed = time.perf_counter() - start
+
+    mismatched = [r["id"] for r, score in zip(rows, scores) if score != r["score"]]
+    print(f"🎾 Пересчитано матчей: {len(rows)}, очков: {sum(map(len, logs))} за {elapsed:.3f}s")
+    if mismatched:
+        print(f"⚠️ Счёт не совпал у {len(mismatched)} матчей:")
+        for match_id in mismatched:
+            print(f"   {match_id}")
+    else:
+        print("✅ Все счета совпали")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())